@@ -5,7 +5,8 @@ Application Manager - Manages navigation between screens
 """
 
 from PyQt6.QtWidgets import QStackedWidget, QWidget
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from screens.base_screen import BaseScreen
 from screens.welcome_screen import WelcomeScreen
 from screens.rfid_login_screen import RFIDLoginScreen
 from screens.code_login_screen import CodeLoginScreen
@@ -15,12 +16,29 @@ from screens.confirm_action_screen import ConfirmActionScreen
 from screens.countdown_screen import CountdownScreen
 from screens.done_screen import DoneScreen
 from utils.config import Config
+from utils.api_client import APIClient
+from utils.mqtt_client import LockerStatusClient
+from typing import Callable, Dict, Optional
 import logging
+import time
+
+# Where the back button leads from each screen
+BACK_TARGETS = {
+    "rfid_login": "welcome",
+    "code_login": "welcome",
+    "action_select": "welcome",
+    "locker_select_borrow": "action_select",
+    "locker_select_return": "action_select",
+    "countdown": "confirm_action",
+}
 
 class AppManager(QObject):
     """Application manager for screen navigation"""
     
-    def __init__(self, config: Config, parent=None):
+    # Emitted once per screen, right after it is constructed (name, screen)
+    screen_created = pyqtSignal(str, object)
+    
+    def __init__(self, config: Config, api_client=None, parent=None):
         super().__init__(parent)
         self.config = config
         self.logger = logging.getLogger(__name__)
@@ -31,207 +49,142 @@ class AppManager(QObject):
         self.action_data = {}
         self.completion_data = {}
         
+        # One API client (session + connection pool) shared by every screen
+        self.api_client = api_client or APIClient.shared(config)
+        
         # Create stacked widget
         self.stacked_widget = QStackedWidget()
         
-        # Initialize screens
-        self.setup_screens()
-        self.connect_signals()
+        # Live locker status over MQTT (optional, screens fall back to HTTP polling)
+        self.status_client = LockerStatusClient(config, self)
+        self.status_client.start()
+        
+        # Screen registry: screens are built on first use and reused afterwards
+        self.screen_factories: Dict[str, Callable[[], BaseScreen]] = {}
+        self.screens: Dict[str, BaseScreen] = {}
+        self.current_screen_name: Optional[str] = None
+        self.register_screens()
         
         # Start with welcome screen
         self.show_screen("welcome")
-    
-    def setup_screens(self):
-        """Setup all application screens"""
-        # Welcome Screen (P0)
-        self.welcome_screen = WelcomeScreen(self.config)
-        self.welcome_screen.app_manager = self
-        self.stacked_widget.addWidget(self.welcome_screen)
-        
-        # RFID Login Screen (P1)
-        self.rfid_login_screen = RFIDLoginScreen(self.config)
-        self.rfid_login_screen.app_manager = self
-        self.stacked_widget.addWidget(self.rfid_login_screen)
-        
-        # Code Login Screen (P2)
-        self.code_login_screen = CodeLoginScreen(self.config)
-        self.code_login_screen.app_manager = self
-        self.stacked_widget.addWidget(self.code_login_screen)
-        
-        # Action Select Screen (P3)
-        self.action_select_screen = ActionSelectScreen(self.config)
-        self.action_select_screen.app_manager = self
-        self.stacked_widget.addWidget(self.action_select_screen)
-        
-        # Locker Select Screens (P4a/P4b) - will be created dynamically
-        self.locker_select_borrow_screen = None
-        self.locker_select_return_screen = None
-        
-        # Confirm Action Screen (P5)
-        self.confirm_action_screen = ConfirmActionScreen(self.config)
-        self.confirm_action_screen.app_manager = self
-        self.stacked_widget.addWidget(self.confirm_action_screen)
-        
-        # Countdown Screen (P6)
-        self.countdown_screen = CountdownScreen(self.config)
-        self.countdown_screen.app_manager = self
-        self.stacked_widget.addWidget(self.countdown_screen)
-        
-        # Done Screen (P7)
-        self.done_screen = DoneScreen(self.config)
-        self.done_screen.app_manager = self
-        self.stacked_widget.addWidget(self.done_screen)
-    
-    def connect_signals(self):
-        """Connect navigation signals between screens"""
-        # Welcome Screen signals
-        self.welcome_screen.navigate_to.connect(self.handle_navigation)
-        
-        # RFID Login Screen signals
-        self.rfid_login_screen.navigate_to.connect(self.handle_navigation)
-        self.rfid_login_screen.go_back.connect(self.handle_go_back)
-        
-        # Code Login Screen signals
-        self.code_login_screen.navigate_to.connect(self.handle_navigation)
-        self.code_login_screen.go_back.connect(self.handle_go_back)
-        
-        # Action Select Screen signals
-        self.action_select_screen.navigate_to.connect(self.handle_navigation)
-        self.action_select_screen.go_back.connect(self.handle_go_back)
-        
-        # Confirm Action Screen signals
-        self.confirm_action_screen.navigate_to.connect(self.handle_navigation)
-        self.confirm_action_screen.go_back.connect(self.handle_go_back)
         
-        # Countdown Screen signals
-        self.countdown_screen.navigate_to.connect(self.handle_navigation)
-        self.countdown_screen.go_back.connect(self.handle_go_back)
-        
-        # Done Screen signals
-        self.done_screen.navigate_to.connect(self.handle_navigation)
+        # Replay borrow/return writes queued while the backend was unreachable
+        self.replay_request = None
+        self.replay_timer = QTimer(self)
+        self.replay_timer.timeout.connect(self.replay_outbox)
+        if getattr(self.api_client, "store", None) is not None:
+            self.replay_timer.start(int(config.get("storage.replay_interval", 30) * 1000))
+        
+        # Build the remaining screens while the kiosk is idle, one per event loop turn
+        if config.get("ui.prewarm_screens", True):
+            QTimer.singleShot(config.get("ui.prewarm_delay_ms", 500), self.prewarm_screens)
+    
+    def register_screens(self):
+        """Register factories for all application screens"""
+        self.register_screen("welcome", lambda: WelcomeScreen(self.config))  # P0
+        self.register_screen("rfid_login", lambda: RFIDLoginScreen(self.config))  # P1
+        self.register_screen("code_login", lambda: CodeLoginScreen(self.config))  # P2
+        self.register_screen("action_select", lambda: ActionSelectScreen(self.config))  # P3
+        self.register_screen(  # P4a
+            "locker_select_borrow", lambda: LockerSelectScreen(self.config, action_type="borrow")
+        )
+        self.register_screen(  # P4b
+            "locker_select_return", lambda: LockerSelectScreen(self.config, action_type="return")
+        )
+        self.register_screen("confirm_action", lambda: ConfirmActionScreen(self.config))  # P5
+        self.register_screen("countdown", self.create_countdown_screen)  # P6
+        self.register_screen("done", lambda: DoneScreen(self.config))  # P7
+    
+    def register_screen(self, name: str, factory: Callable[[], BaseScreen]):
+        """Register (or replace) the factory used to build a screen on first use"""
+        self.screen_factories[name] = factory
+    
+    def prewarm_screens(self):
+        """Construct the next not-yet-built screen, then yield back to the event loop"""
+        pending = [name for name in self.screen_factories if name not in self.screens]
+        if not pending:
+            return
+        self.get_screen(pending[0])
+        if len(pending) > 1:
+            QTimer.singleShot(0, self.prewarm_screens)
+    
+    def replay_outbox(self):
+        """Replay queued writes in the background (one replay at a time)"""
+        if self.replay_request is not None and self.replay_request.is_pending():
+            return
+        if not self.api_client.store.pending_count():
+            return
+        self.replay_request = self.api_client.call_async(self.api_client.replay_outbox)
+    
+    def create_countdown_screen(self) -> CountdownScreen:
+        screen = CountdownScreen(self.config)
+        screen.attach_status_client(self.status_client)
+        return screen
+    
+    def get_screen(self, name: str) -> BaseScreen:
+        """Get a screen by name, constructing and wiring it on first use"""
+        screen = self.screens.get(name)
+        if screen is not None:
+            return screen
+        
+        started = time.perf_counter()
+        screen = self.screen_factories[name]()
+        screen.app_manager = self
+        screen.api_client = self.api_client
+        screen.navigate_to.connect(self.handle_navigation)
+        screen.go_back.connect(self.handle_go_back)
+        self.stacked_widget.addWidget(screen)
+        self.screens[name] = screen
+        self.logger.debug(f"Built screen '{name}' in {(time.perf_counter() - started) * 1000:.1f} ms")
+        self.screen_created.emit(name, screen)
+        return screen
+    
+    def screen_data(self, name: str) -> dict:
+        """Navigation data passed to a screen's reset() hook"""
+        if name in ("action_select", "locker_select_borrow", "locker_select_return"):
+            return {"user_data": self.user_data}
+        if name == "confirm_action":
+            return {"user_data": self.user_data, "locker_data": self.locker_data}
+        if name == "countdown":
+            return {"user_data": self.user_data, "action_data": self.action_data}
+        if name == "done":
+            return {"completion_data": self.completion_data}
+        return {}
     
     def handle_navigation(self, screen_name: str):
         """Handle navigation to different screens"""
         self.logger.info(f"Navigating to: {screen_name}")
         
-        if screen_name == "welcome":
-            self.show_welcome_screen()
-        elif screen_name == "rfid_login":
-            self.show_rfid_login_screen()
-        elif screen_name == "code_login":
-            self.show_code_login_screen()
-        elif screen_name == "action_select":
-            self.show_action_select_screen()
-        elif screen_name == "locker_select_borrow":
-            self.show_locker_select_screen("borrow")
-        elif screen_name == "locker_select_return":
-            self.show_locker_select_screen("return")
-        elif screen_name == "confirm_action":
-            self.show_confirm_action_screen()
-        elif screen_name == "countdown":
-            self.show_countdown_screen()
-        elif screen_name == "done":
-            self.show_done_screen()
-        else:
+        if screen_name not in self.screen_factories:
             self.logger.warning(f"Unknown screen: {screen_name}")
+            return
+        
+        started = time.perf_counter()
+        if screen_name == "welcome":
+            # Clear all data when returning to welcome
+            self.clear_all_data()
+        
+        screen = self.get_screen(screen_name)
+        screen.reset(self.screen_data(screen_name))
+        self.stacked_widget.setCurrentWidget(screen)
+        self.current_screen_name = screen_name
+        self.logger.debug(f"Switched to '{screen_name}' in {(time.perf_counter() - started) * 1000:.1f} ms")
     
     def handle_go_back(self):
         """Handle go back navigation"""
-        current_index = self.stacked_widget.currentIndex()
-        current_widget = self.stacked_widget.currentWidget()
-        
-        # Determine previous screen based on current screen
-        if isinstance(current_widget, RFIDLoginScreen):
-            self.show_welcome_screen()
-        elif isinstance(current_widget, CodeLoginScreen):
-            self.show_welcome_screen()
-        elif isinstance(current_widget, ActionSelectScreen):
-            self.show_welcome_screen()
-        elif isinstance(current_widget, LockerSelectScreen):
-            self.show_action_select_screen()
-        elif isinstance(current_widget, ConfirmActionScreen):
+        if self.current_screen_name == "confirm_action":
             # Go back to appropriate locker select screen
             action_type = self.locker_data.get("action_type", "borrow")
-            if action_type == "borrow":
-                self.show_locker_select_screen("borrow")
-            else:
-                self.show_locker_select_screen("return")
-        elif isinstance(current_widget, CountdownScreen):
-            self.show_confirm_action_screen()
+            target = "locker_select_borrow" if action_type == "borrow" else "locker_select_return"
         else:
             # Default: go to welcome
-            self.show_welcome_screen()
+            target = BACK_TARGETS.get(self.current_screen_name, "welcome")
+        self.handle_navigation(target)
     
     def show_screen(self, screen_name: str):
         """Show screen by name"""
         self.handle_navigation(screen_name)
     
-    def show_welcome_screen(self):
-        """Show welcome screen"""
-        self.stacked_widget.setCurrentWidget(self.welcome_screen)
-        # Clear all data when returning to welcome
-        self.clear_all_data()
-    
-    def show_rfid_login_screen(self):
-        """Show RFID login screen"""
-        self.stacked_widget.setCurrentWidget(self.rfid_login_screen)
-    
-    def show_code_login_screen(self):
-        """Show code login screen"""
-        self.stacked_widget.setCurrentWidget(self.code_login_screen)
-    
-    def show_action_select_screen(self):
-        """Show action select screen"""
-        # Pass user data to action select screen
-        self.action_select_screen.user_data = self.user_data
-        self.stacked_widget.setCurrentWidget(self.action_select_screen)
-    
-    def show_locker_select_screen(self, action_type: str):
-        """Show locker select screen"""
-        # Create screen if not exists
-        if action_type == "borrow":
-            if not self.locker_select_borrow_screen:
-                self.locker_select_borrow_screen = LockerSelectScreen(
-                    self.config, self.user_data, "borrow"
-                )
-                self.locker_select_borrow_screen.app_manager = self
-                self.locker_select_borrow_screen.navigate_to.connect(self.handle_navigation)
-                self.locker_select_borrow_screen.go_back.connect(self.handle_go_back)
-                self.stacked_widget.addWidget(self.locker_select_borrow_screen)
-            
-            self.stacked_widget.setCurrentWidget(self.locker_select_borrow_screen)
-        else:
-            if not self.locker_select_return_screen:
-                self.locker_select_return_screen = LockerSelectScreen(
-                    self.config, self.user_data, "return"
-                )
-                self.locker_select_return_screen.app_manager = self
-                self.locker_select_return_screen.navigate_to.connect(self.handle_navigation)
-                self.locker_select_return_screen.go_back.connect(self.handle_go_back)
-                self.stacked_widget.addWidget(self.locker_select_return_screen)
-            
-            self.stacked_widget.setCurrentWidget(self.locker_select_return_screen)
-    
-    def show_confirm_action_screen(self):
-        """Show confirm action screen"""
-        # Pass data to confirm action screen
-        self.confirm_action_screen.user_data = self.user_data
-        self.confirm_action_screen.locker_data = self.locker_data
-        self.stacked_widget.setCurrentWidget(self.confirm_action_screen)
-    
-    def show_countdown_screen(self):
-        """Show countdown screen"""
-        # Pass data to countdown screen
-        self.countdown_screen.user_data = self.user_data
-        self.countdown_screen.action_data = self.action_data
-        self.stacked_widget.setCurrentWidget(self.countdown_screen)
-    
-    def show_done_screen(self):
-        """Show done screen"""
-        # Pass completion data to done screen
-        self.done_screen.completion_data = self.completion_data
-        self.stacked_widget.setCurrentWidget(self.done_screen)
-    
     def store_user_data(self, user_data: dict):
         """Store user data from login"""
         self.user_data = user_data
@@ -260,6 +213,11 @@ class AppManager(QObject):
         self.completion_data = {}
         self.logger.info("Cleared all stored data")
     
+    def shutdown(self):
+        """Release background connections on application exit"""
+        self.status_client.stop()
+        self.replay_timer.stop()
+    
     def get_current_widget(self) -> QWidget:
         """Get current widget"""
         return self.stacked_widget.currentWidget()
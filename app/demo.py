@@ -12,6 +12,8 @@ from PyQt6.QtGui import QIcon
 from app_manager import AppManager
 from utils.config import Config
 from utils.logger import setup_logger
+from utils.api_client import AsyncAPIMixin, shutdown_executor
+from utils.rfid_reader import RFIDSignalBridge
 
 # Mock API responses for demo
 MOCK_RESPONSES = {
@@ -76,7 +78,7 @@ MOCK_RESPONSES = {
     }
 }
 
-class MockAPIClient:
+class MockAPIClient(AsyncAPIMixin):
     """Mock API client for demo purposes"""
     
     def __init__(self, config):
@@ -318,6 +320,7 @@ class MockRFIDReader:
         self.config = config
         self.callback = callback
         self.is_reading = False
+        self.bridge = RFIDSignalBridge(callback)
     
     def start_reading(self):
         """Mock start reading"""
@@ -330,9 +333,9 @@ class MockRFIDReader:
         
         def simulate_card():
             time.sleep(3)
-            if self.is_reading and self.callback:
+            if self.is_reading:
                 print("Mock RFID card detected: DEMO_CARD_12345")
-                self.callback("DEMO_CARD_12345")
+                self.bridge.card_detected.emit("DEMO_CARD_12345")
         
         threading.Thread(target=simulate_card, daemon=True).start()
         return True
@@ -371,25 +374,29 @@ class DemoMainWindow(QMainWindow):
     
     def setup_app_manager(self):
         """Setup application manager with mock components"""
-        self.app_manager = AppManager(self.config)
-        
-        # Replace API client with mock
-        self.app_manager.rfid_login_screen.api_client = MockAPIClient(self.config)
-        self.app_manager.code_login_screen.api_client = MockAPIClient(self.config)
-        self.app_manager.action_select_screen.api_client = MockAPIClient(self.config)
-        self.app_manager.confirm_action_screen.api_client = MockAPIClient(self.config)
-        self.app_manager.countdown_screen.api_client = MockAPIClient(self.config)
-        
-        # Replace RFID reader with mock (only if not already in demo mode)
-        if not self.config.get("rfid.demo_mode", False):
-            self.app_manager.rfid_login_screen.rfid_reader = MockRFIDReader(self.config)
+        # All screens share the mock API client
+        self.app_manager = AppManager(self.config, api_client=MockAPIClient(self.config))
+        self.app_manager.screen_created.connect(self.on_screen_created)
         
         self.setCentralWidget(self.app_manager.get_stacked_widget())
+    
+    def on_screen_created(self, name: str, screen):
+        """Replace RFID reader with mock (only if not already in demo mode)"""
+        if name == "rfid_login" and not self.config.get("rfid.demo_mode", False):
+            screen.rfid_reader = MockRFIDReader(self.config, screen.on_rfid_detected)
 
 def main():
     """Main function to start the demo application"""
+    # Load configuration
+    config = Config()
+    
     # Setup logging
-    logger = setup_logger()
+    logger = setup_logger(
+        max_bytes=config.get("logging.max_bytes", 5 * 1024 * 1024),
+        backup_count=config.get("logging.backup_count", 10),
+        retention_days=config.get("logging.retention_days", 14),
+        sample=config.get("logging.sample", {}),
+    )
     logger.info("Starting Demo Locker Management Application")
     
     # Create Qt application
@@ -397,13 +404,12 @@ def main():
     app.setApplicationName("Demo Locker Management System")
     app.setApplicationVersion("1.0.0")
     app.setOrganizationName("Smart Locker Demo")
-    
-    # Load configuration
-    config = Config()
+    app.aboutToQuit.connect(shutdown_executor)
     
     # Create and show main window
     main_window = DemoMainWindow(config)
     main_window.show()
+    app.aboutToQuit.connect(main_window.app_manager.shutdown)
     
     print("=" * 60)
     print("DEMO MODE - Hệ thống quản lý tủ khóa thông minh")
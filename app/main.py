@@ -7,12 +7,14 @@ Main application entry point
 
 import sys
 import os
+import time
 from PyQt6.QtWidgets import QApplication, QMainWindow
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QIcon
 from app_manager import AppManager
 from utils.config import Config
 from utils.logger import setup_logger
+from utils.api_client import shutdown_executor
 
 class MainWindow(QMainWindow):
     """Main application window"""
@@ -40,8 +42,18 @@ class MainWindow(QMainWindow):
 
 def main():
     """Main function to start the application"""
+    started = time.perf_counter()
+    
+    # Load configuration
+    config = Config()
+    
     # Setup logging
-    logger = setup_logger()
+    logger = setup_logger(
+        max_bytes=config.get("logging.max_bytes", 5 * 1024 * 1024),
+        backup_count=config.get("logging.backup_count", 10),
+        retention_days=config.get("logging.retention_days", 14),
+        sample=config.get("logging.sample", {}),
+    )
     logger.info("Starting Locker Management Application")
     
     # Create Qt application
@@ -49,13 +61,16 @@ def main():
     app.setApplicationName("Locker Management System")
     app.setApplicationVersion("1.0.0")
     app.setOrganizationName("Smart Locker")
-    
-    # Load configuration
-    config = Config()
+    app.aboutToQuit.connect(shutdown_executor)
     
     # Create and show main window
     main_window = MainWindow(config)
     main_window.show()
+    # Fires on the first event loop turn, after the initial frame is laid out
+    QTimer.singleShot(0, lambda: logger.info(
+        f"First frame after {(time.perf_counter() - started) * 1000:.0f} ms"
+    ))
+    app.aboutToQuit.connect(main_window.app_manager.shutdown)
     
     # Start application event loop
     sys.exit(app.exec())
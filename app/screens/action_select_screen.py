@@ -28,6 +28,12 @@ class ActionSelectScreen(BaseScreen):
     def get_screen_title(self) -> str:
         return "Chọn hành động"
     
+    def reset(self, data: dict = None):
+        """Rebuild the greeting and user info for the logged-in user"""
+        super().reset(data)
+        self.clear_content()
+        self.setup_action_content()
+    
     def setup_action_content(self):
         """Setup action selection content"""
         # Welcome message with user name
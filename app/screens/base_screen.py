@@ -19,6 +19,7 @@ class BaseScreen(QWidget):
     def __init__(self, config: Config, parent=None):
         super().__init__(parent)
         self.config = config
+        self._api_requests = []
         self.setup_ui()
         self.setup_styles()
     
@@ -105,6 +106,29 @@ class BaseScreen(QWidget):
         self.back_button.setFont(button_font)
         self.home_button.setFont(button_font)
     
+    def reset(self, data: dict = None):
+        """
+        Prepare a reused screen for display with fresh navigation data.
+        Stores data as attributes (e.g. user_data) and refreshes the title;
+        screens whose content depends on the data extend this.
+        """
+        for key, value in (data or {}).items():
+            setattr(self, key, value)
+        self.title_label.setText(self.get_screen_title())
+    
+    def clear_content(self):
+        """Remove everything from the content area before rebuilding it"""
+        self._clear_layout(self.content_layout)
+    
+    def _clear_layout(self, layout):
+        while layout.count():
+            item = layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+            elif item.layout() is not None:
+                self._clear_layout(item.layout())
+                item.layout().deleteLater()
+    
     def get_screen_title(self) -> str:
         """Get screen title - override in subclasses"""
         return "Màn hình"
@@ -123,12 +147,39 @@ class BaseScreen(QWidget):
         """Handle home button click"""
         self.navigate_to.emit("welcome")
     
+    def run_api(self, method, *args, callback=None, error_callback=None, **kwargs):
+        """
+        Run an API client method off the UI thread; callback(result) runs on the UI thread.
+        Pending calls are cancelled when the screen is hidden (navigation away).
+        """
+        self._api_requests = [r for r in self._api_requests if r.is_pending()]
+        request = self.api_client.call_async(
+            method, *args, callback=callback, error_callback=error_callback, **kwargs
+        )
+        self._api_requests.append(request)
+        return request
+    
+    def has_pending_api(self) -> bool:
+        return any(request.is_pending() for request in self._api_requests)
+    
+    def cancel_api_requests(self):
+        """Cancel pending API calls so stale responses are not applied to this screen"""
+        for request in self._api_requests:
+            request.cancel()
+        self._api_requests = []
+    
     def showEvent(self, event):
         """Handle show event"""
         super().showEvent(event)
         # Update clock when screen is shown
         self.update_clock()
     
+    def hideEvent(self, event):
+        """Handle hide event"""
+        # QStackedWidget hides the current screen on navigation
+        self.cancel_api_requests()
+        super().hideEvent(event)
+    
     def keyPressEvent(self, event):
         """Handle key press events"""
         if event.key() == Qt.Key.Key_Escape:
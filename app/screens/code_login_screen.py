@@ -18,7 +18,7 @@ class CodeLoginScreen(BaseScreen):
     
     def __init__(self, config: Config, parent=None):
         super().__init__(config, parent)
-        self.api_client = APIClient(config)
+        self.api_client = APIClient.shared(config)
         self.logger = logging.getLogger(__name__)
         self.code_input = ""
         
@@ -179,6 +179,15 @@ class CodeLoginScreen(BaseScreen):
             }}
         """)
     
+    def reset(self, data: dict = None):
+        """Clear the previous input"""
+        super().reset(data)
+        self.clear_code()
+        self.progress_bar.setVisible(False)
+        self.status_label.setText("Vui lòng nhập mã truy cập")
+        for child in self.findChildren(QPushButton):
+            child.setEnabled(True)
+    
     def add_digit(self, digit: str):
         """Add digit to code input"""
         if len(self.code_input) < 20:  # Limit code length
@@ -198,6 +207,9 @@ class CodeLoginScreen(BaseScreen):
     
     def submit_code(self):
         """Submit code for authentication"""
+        if self.has_pending_api():
+            return
+        
         if not self.code_input:
             self.status_label.setText("❌ Vui lòng nhập mã truy cập")
             return
@@ -214,11 +226,16 @@ class CodeLoginScreen(BaseScreen):
         self.authenticate_code(self.code_input)
     
     def authenticate_code(self, code: str):
-        """Authenticate JWT code with backend"""
+        """Authenticate JWT code with backend (runs off the UI thread)"""
+        self.run_api(
+            self.api_client.login_code, code,
+            callback=self.on_login_response,
+            error_callback=self.on_login_error,
+        )
+    
+    def on_login_response(self, response):
+        """Handle login API response"""
         try:
-            # Call API
-            response = self.api_client.login_code(code)
-            
             if response and response.get("success"):
                 # Login successful
                 token = response.get("token")
@@ -249,6 +266,11 @@ class CodeLoginScreen(BaseScreen):
             self.logger.error(f"Error during code authentication: {e}")
             self.show_error("❌ Lỗi hệ thống")
     
+    def on_login_error(self, error: Exception):
+        """Handle unexpected error raised by the login call"""
+        self.logger.error(f"Error during code authentication: {error}")
+        self.show_error("❌ Lỗi hệ thống")
+    
     def show_error(self, message: str):
         """Show error message and allow retry"""
         self.status_label.setText(message)
@@ -21,7 +21,7 @@ class ConfirmActionScreen(BaseScreen):
         self.locker_data = locker_data or {}
         
         super().__init__(config, parent)
-        self.api_client = APIClient(config)
+        self.api_client = APIClient.shared(config)
         self.logger = logging.getLogger(__name__)
         
         self.setup_confirm_content()
@@ -33,6 +33,12 @@ class ConfirmActionScreen(BaseScreen):
         else:
             return "Xác nhận trả thiết bị"
     
+    def reset(self, data: dict = None):
+        """Rebuild the confirmation for the selected locker"""
+        super().reset(data)
+        self.clear_content()
+        self.setup_confirm_content()
+    
     def setup_confirm_content(self):
         """Setup confirmation content"""
         # Main message
@@ -220,46 +226,56 @@ class ConfirmActionScreen(BaseScreen):
         self.open_locker()
     
     def open_locker(self):
-        """Send open locker request to API"""
-        try:
-            token = self.user_data.get("token")
-            locker = self.locker_data.get("locker", {})
-            action_type = self.locker_data.get("action_type", "unknown")
-            locker_id = locker.get("id")
+        """Send open locker request to API (runs off the UI thread)"""
+        token = self.user_data.get("token")
+        locker = self.locker_data.get("locker", {})
+        action_type = self.locker_data.get("action_type", "unknown")
+        locker_id = locker.get("id")
+        
+        if not token or not locker_id:
+            self.show_error("❌ Dữ liệu không hợp lệ")
+            return
+        
+        # Call API to open locker
+        self.run_api(
+            self.api_client.open_locker, token, locker_id, action_type,
+            callback=self.on_open_response,
+            error_callback=self.on_open_error,
+        )
+    
+    def on_open_response(self, response):
+        """Handle open locker API response"""
+        locker = self.locker_data.get("locker", {})
+        action_type = self.locker_data.get("action_type", "unknown")
+        locker_id = locker.get("id")
+        
+        if response and response.get("success"):
+            # Locker opened successfully
+            self.logger.info(f"Locker {locker_id} opened for {action_type}")
             
-            if not token or not locker_id:
-                self.show_error("❌ Dữ liệu không hợp lệ")
-                return
+            # Store action data for countdown screen
+            self.action_data = {
+                "locker": locker,
+                "action_type": action_type,
+                "start_time": response.get("start_time"),
+                "session_id": response.get("session_id")
+            }
             
-            # Call API to open locker
-            response = self.api_client.open_locker(token, locker_id, action_type)
+            # Store in app manager if available
+            if hasattr(self, 'app_manager'):
+                self.app_manager.store_action_data(self.action_data)
             
-            if response and response.get("success"):
-                # Locker opened successfully
-                self.logger.info(f"Locker {locker_id} opened for {action_type}")
-                
-                # Store action data for countdown screen
-                self.action_data = {
-                    "locker": locker,
-                    "action_type": action_type,
-                    "start_time": response.get("start_time"),
-                    "session_id": response.get("session_id")
-                }
-                
-                # Store in app manager if available
-                if hasattr(self, 'app_manager'):
-                    self.app_manager.store_action_data(self.action_data)
-                
-                # Navigate to countdown screen
-                self.navigate_to.emit("countdown")
-                
-            else:
-                error_msg = response.get("message", "Lỗi mở tủ") if response else "Lỗi kết nối"
-                self.show_error(f"❌ {error_msg}")
-                
-        except Exception as e:
-            self.logger.error(f"Error opening locker: {e}")
-            self.show_error("❌ Lỗi hệ thống")
+            # Navigate to countdown screen
+            self.navigate_to.emit("countdown")
+            
+        else:
+            error_msg = response.get("message", "Lỗi mở tủ") if response else "Lỗi kết nối"
+            self.show_error(f"❌ {error_msg}")
+    
+    def on_open_error(self, error: Exception):
+        """Handle unexpected error raised by the open locker call"""
+        self.logger.error(f"Error opening locker: {error}")
+        self.show_error("❌ Lỗi hệ thống")
     
     def show_error(self, message: str):
         """Show error message and allow retry"""
@@ -22,13 +22,21 @@ class CountdownScreen(BaseScreen):
         self.action_data = action_data or {}
         
         super().__init__(config, parent)
-        self.api_client = APIClient(config)
+        self.api_client = APIClient.shared(config)
         self.logger = logging.getLogger(__name__)
         
         # Countdown settings
         self.countdown_time = config.get("ui.countdown_time", 300)  # 5 minutes default
         self.remaining_time = self.countdown_time
         self.is_warning = False
+        self.status_request = None
+        self.complete_request = None
+        
+        # Live status via MQTT (attached by AppManager); HTTP polling with backoff otherwise
+        self.status_client = None
+        self.poll_min_interval = config.get("locker.status_poll_min", 2)
+        self.poll_max_interval = config.get("locker.status_poll_max", 30)
+        self.poll_interval = self.poll_min_interval
         
         # Setup UI
         self.setup_countdown_content()
@@ -239,12 +247,53 @@ class CountdownScreen(BaseScreen):
         # Countdown timer
         self.countdown_timer = QTimer()
         self.countdown_timer.timeout.connect(self.update_countdown)
-        self.countdown_timer.start(1000)  # Update every second
         
-        # Status check timer
+        # Fallback status polling (only while MQTT is not connected, see schedule_status_poll)
         self.status_timer = QTimer()
+        self.status_timer.setSingleShot(True)
         self.status_timer.timeout.connect(self.check_locker_status)
-        self.status_timer.start(5000)  # Check every 5 seconds
+    
+    def reset(self, data: dict = None):
+        """Rebuild the view for the opened locker and restart the countdown"""
+        super().reset(data)
+        self.remaining_time = self.countdown_time
+        self.is_warning = False
+        self.clear_content()
+        self.setup_countdown_content()
+        self.countdown_timer.start(1000)  # Update every second
+    
+    def attach_status_client(self, status_client):
+        """Use MQTT status messages instead of polling the API"""
+        self.status_client = status_client
+        status_client.cell_status.connect(self.on_cell_status)
+        status_client.connection_changed.connect(self.on_status_connection_changed)
+    
+    def mqtt_connected(self) -> bool:
+        return self.status_client is not None and self.status_client.is_connected()
+    
+    def schedule_status_poll(self):
+        """Schedule the next HTTP status check, backing off exponentially"""
+        if self.mqtt_connected() or not self.isVisible():
+            return
+        self.status_timer.start(int(self.poll_interval * 1000))
+        self.poll_interval = min(self.poll_interval * 2, self.poll_max_interval)
+    
+    def on_status_connection_changed(self, connected: bool):
+        """Switch between MQTT updates and HTTP polling"""
+        if connected:
+            self.status_timer.stop()
+        else:
+            self.poll_interval = self.poll_min_interval
+            self.schedule_status_poll()
+    
+    def on_cell_status(self, cell_id: int, status: str):
+        """Handle live status from MQTT"""
+        if not self.isVisible() or status != "closed":
+            return
+        locker_id = self.action_data.get("locker", {}).get("id")
+        if locker_id is not None and str(cell_id) == str(locker_id):
+            self.logger.info("Locker was closed (MQTT), completing action")
+            self.complete_action()
     
     def update_countdown(self):
         """Update countdown timer"""
@@ -321,73 +370,97 @@ class CountdownScreen(BaseScreen):
         QTimer.singleShot(3000, self.auto_complete)
     
     def check_locker_status(self):
-        """Check locker status from API"""
-        try:
-            token = self.user_data.get("token")
-            locker = self.action_data.get("locker", {})
-            locker_id = locker.get("id")
-            
-            if not token or not locker_id:
+        """Check locker status from API (skipped while the previous check is still running)"""
+        if self.status_request is not None and self.status_request.is_pending():
+            return
+        
+        token = self.user_data.get("token")
+        locker = self.action_data.get("locker", {})
+        locker_id = locker.get("id")
+        
+        if not token or not locker_id:
+            return
+        
+        # Call API to check status
+        self.status_request = self.run_api(
+            self.api_client.get_locker_status, token, locker_id,
+            callback=self.on_status_response,
+            error_callback=self.on_status_error,
+        )
+    
+    def on_status_response(self, response):
+        """Handle locker status API response"""
+        if response and response.get("success"):
+            status = response.get("status")
+            if status == "closed":
+                # Locker was closed, complete action
+                self.logger.info("Locker was closed, completing action")
+                self.complete_action()
                 return
-            
-            # Call API to check status
-            response = self.api_client.get_locker_status(token, locker_id)
-            
-            if response and response.get("success"):
-                status = response.get("status")
-                if status == "closed":
-                    # Locker was closed, complete action
-                    self.logger.info("Locker was closed, completing action")
-                    self.complete_action()
-                    
-        except Exception as e:
-            self.logger.error(f"Error checking locker status: {e}")
+        self.schedule_status_poll()
+    
+    def on_status_error(self, error: Exception):
+        self.logger.error(f"Error checking locker status: {error}")
+        self.schedule_status_poll()
     
     def on_complete(self):
         """Handle complete button click"""
         self.complete_action()
     
     def complete_action(self):
-        """Complete the action"""
-        try:
-            token = self.user_data.get("token")
-            locker = self.action_data.get("locker", {})
-            action_type = self.action_data.get("action_type", "unknown")
-            locker_id = locker.get("id")
+        """Complete the action (runs off the UI thread, only once at a time)"""
+        if self.complete_request is not None and self.complete_request.is_pending():
+            return
+        
+        token = self.user_data.get("token")
+        locker = self.action_data.get("locker", {})
+        action_type = self.action_data.get("action_type", "unknown")
+        locker_id = locker.get("id")
+        
+        if not token or not locker_id:
+            self.show_error("❌ Dữ liệu không hợp lệ")
+            return
+        
+        # Call API to confirm action
+        self.complete_request = self.run_api(
+            self.api_client.confirm_action, token, locker_id, action_type,
+            callback=self.on_complete_response,
+            error_callback=self.on_complete_error,
+        )
+    
+    def on_complete_response(self, response):
+        """Handle confirm action API response"""
+        locker = self.action_data.get("locker", {})
+        action_type = self.action_data.get("action_type", "unknown")
+        locker_id = locker.get("id")
+        
+        if response and response.get("success"):
+            # Action completed successfully
+            self.logger.info(f"Action {action_type} completed for locker {locker_id}")
             
-            if not token or not locker_id:
-                self.show_error("❌ Dữ liệu không hợp lệ")
-                return
+            # Store completion data
+            self.completion_data = {
+                "locker": locker,
+                "action_type": action_type,
+                "completion_time": datetime.now().isoformat(),
+                "duration": self.countdown_time - self.remaining_time
+            }
             
-            # Call API to confirm action
-            response = self.api_client.confirm_action(token, locker_id, action_type)
+            # Store in app manager if available
+            if hasattr(self, 'app_manager'):
+                self.app_manager.store_completion_data(self.completion_data)
             
-            if response and response.get("success"):
-                # Action completed successfully
-                self.logger.info(f"Action {action_type} completed for locker {locker_id}")
-                
-                # Store completion data
-                self.completion_data = {
-                    "locker": locker,
-                    "action_type": action_type,
-                    "completion_time": datetime.now().isoformat(),
-                    "duration": self.countdown_time - self.remaining_time
-                }
-                
-                # Store in app manager if available
-                if hasattr(self, 'app_manager'):
-                    self.app_manager.store_completion_data(self.completion_data)
-                
-                # Navigate to done screen
-                self.navigate_to.emit("done")
-                
-            else:
-                error_msg = response.get("message", "Lỗi hoàn tất") if response else "Lỗi kết nối"
-                self.show_error(f"❌ {error_msg}")
-                
-        except Exception as e:
-            self.logger.error(f"Error completing action: {e}")
-            self.show_error("❌ Lỗi hệ thống")
+            # Navigate to done screen
+            self.navigate_to.emit("done")
+            
+        else:
+            error_msg = response.get("message", "Lỗi hoàn tất") if response else "Lỗi kết nối"
+            self.show_error(f"❌ {error_msg}")
+    
+    def on_complete_error(self, error: Exception):
+        """Handle unexpected error raised by the confirm action call"""
+        self.logger.error(f"Error completing action: {error}")
+        self.show_error("❌ Lỗi hệ thống")
     
     def auto_complete(self):
         """Auto-complete action when time expires"""
@@ -408,6 +481,18 @@ class CountdownScreen(BaseScreen):
         
         self.go_back.emit()
     
+    def showEvent(self, event):
+        """Start fallback polling when MQTT is not connected"""
+        super().showEvent(event)
+        self.poll_interval = self.poll_min_interval
+        self.schedule_status_poll()
+    
+    def hideEvent(self, event):
+        """Stop countdown and status polling when leaving the screen"""
+        self.countdown_timer.stop()
+        self.status_timer.stop()
+        super().hideEvent(event)
+    
     def closeEvent(self, event):
         """Handle close event"""
         # Stop timers
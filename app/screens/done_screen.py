@@ -23,6 +23,15 @@ class DoneScreen(BaseScreen):
         self.setup_done_content()
         self.setup_auto_return_timer()
     
+    def reset(self, data: dict = None):
+        """Show the summary of the completed action and restart the auto return"""
+        super().reset(data)
+        self.clear_content()
+        self.setup_done_content()
+        self.countdown_seconds = 5
+        self.auto_return_timer.start(5000)
+        self.countdown_timer.start(1000)
+    
     def get_screen_title(self) -> str:
         return "Hoàn tất"
     
@@ -204,12 +213,10 @@ class DoneScreen(BaseScreen):
         """Setup auto return timer"""
         self.auto_return_timer = QTimer()
         self.auto_return_timer.timeout.connect(self.auto_return_to_home)
-        self.auto_return_timer.start(5000)  # 5 seconds
         
-        # Countdown timer
+        # Countdown timer (both started by reset() when the screen is shown)
         self.countdown_timer = QTimer()
         self.countdown_timer.timeout.connect(self.update_countdown)
-        self.countdown_timer.start(1000)  # 1 second
         
         self.countdown_seconds = 5
     
@@ -250,6 +257,12 @@ class DoneScreen(BaseScreen):
         # Navigate to welcome screen
         self.navigate_to.emit("welcome")
     
+    def hideEvent(self, event):
+        """Stop the auto return when leaving the screen"""
+        self.auto_return_timer.stop()
+        self.countdown_timer.stop()
+        super().hideEvent(event)
+    
     def closeEvent(self, event):
         """Handle close event"""
         # Stop timers
@@ -17,15 +17,28 @@ class LockerSelectScreen(BaseScreen):
     """Locker selection screen for borrow/return"""
     
     def __init__(self, config: Config, user_data: dict = None, action_type: str = "borrow", parent=None):
-        super().__init__(config, parent)
+        # Initialize data before calling super().__init__ (get_screen_title needs action_type)
         self.user_data = user_data or {}
         self.action_type = action_type  # "borrow" or "return"
-        self.api_client = APIClient(config)
+        
+        super().__init__(config, parent)
+        self.api_client = APIClient.shared(config)
         self.logger = logging.getLogger(__name__)
         self.lockers = []
         self.selected_locker = None
         
         self.setup_locker_content()
+    
+    def reset(self, data: dict = None):
+        """Drop the previous selection and reload lockers for the current user"""
+        super().reset(data)
+        self.lockers = []
+        self.selected_locker = None
+        self.confirm_button.setEnabled(False)
+        for i in reversed(range(self.lockers_layout.count())):
+            widget = self.lockers_layout.itemAt(i).widget()
+            if widget:
+                widget.deleteLater()
         self.load_lockers()
     
     def get_screen_title(self) -> str:
@@ -125,23 +138,26 @@ class LockerSelectScreen(BaseScreen):
             self.show_error("❌ Không có token xác thực")
             return
         
-        try:
-            if self.action_type == "borrow":
-                response = self.api_client.get_available_lockers(token)
-            else:
-                response = self.api_client.get_user_lockers(token)
-            
-            if response and response.get("success"):
-                self.lockers = response.get("lockers", [])
-                self.logger.info(f"Loaded {len(self.lockers)} lockers for {self.action_type}")
-                self.display_lockers()
-            else:
-                error_msg = response.get("message", "Lỗi tải danh sách") if response else "Lỗi kết nối"
-                self.show_error(f"❌ {error_msg}")
-                
-        except Exception as e:
-            self.logger.error(f"Error loading lockers: {e}")
-            self.show_error("❌ Lỗi hệ thống")
+        if self.action_type == "borrow":
+            method = self.api_client.get_available_lockers
+        else:
+            method = self.api_client.get_user_lockers
+        self.run_api(method, token, callback=self.on_lockers_loaded, error_callback=self.on_load_error)
+    
+    def on_lockers_loaded(self, response):
+        """Handle locker list API response"""
+        if response and response.get("success"):
+            self.lockers = response.get("lockers", [])
+            self.logger.info(f"Loaded {len(self.lockers)} lockers for {self.action_type}")
+            self.display_lockers()
+        else:
+            error_msg = response.get("message", "Lỗi tải danh sách") if response else "Lỗi kết nối"
+            self.show_error(f"❌ {error_msg}")
+    
+    def on_load_error(self, error: Exception):
+        """Handle unexpected error raised by the locker list call"""
+        self.logger.error(f"Error loading lockers: {error}")
+        self.show_error("❌ Lỗi hệ thống")
     
     def display_lockers(self):
         """Display lockers in grid layout"""
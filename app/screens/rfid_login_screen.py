@@ -18,12 +18,11 @@ class RFIDLoginScreen(BaseScreen):
     
     def __init__(self, config: Config, parent=None):
         super().__init__(config, parent)
-        self.api_client = APIClient(config)
+        self.api_client = APIClient.shared(config)
         self.rfid_reader = RFIDReader(config, self.on_rfid_detected)
         self.logger = logging.getLogger(__name__)
         
         self.setup_rfid_content()
-        self.start_rfid_reading()
     
     def get_screen_title(self) -> str:
         return "Đăng nhập bằng thẻ RFID"
@@ -107,6 +106,14 @@ class RFIDLoginScreen(BaseScreen):
             }}
         """)
     
+    def reset(self, data: dict = None):
+        """Back to the waiting state and start reading cards"""
+        super().reset(data)
+        self.rfid_icon.setText("🔑")
+        self.progress_bar.setVisible(False)
+        self.cancel_button.setEnabled(True)
+        self.start_rfid_reading()
+    
     def start_rfid_reading(self):
         """Start RFID reading"""
         if self.rfid_reader.start_reading():
@@ -132,11 +139,16 @@ class RFIDLoginScreen(BaseScreen):
         self.authenticate_rfid(rfid_uid)
     
     def authenticate_rfid(self, rfid_uid: str):
-        """Authenticate RFID with backend"""
+        """Authenticate RFID with backend (runs off the UI thread)"""
+        self.run_api(
+            self.api_client.login_rfid, rfid_uid,
+            callback=self.on_login_response,
+            error_callback=self.on_login_error,
+        )
+    
+    def on_login_response(self, response):
+        """Handle login API response"""
         try:
-            # Call API
-            response = self.api_client.login_rfid(rfid_uid)
-            
             if response and response.get("success"):
                 # Login successful
                 token = response.get("token")
@@ -167,6 +179,11 @@ class RFIDLoginScreen(BaseScreen):
             self.logger.error(f"Error during RFID authentication: {e}")
             self.show_error("❌ Lỗi hệ thống")
     
+    def on_login_error(self, error: Exception):
+        """Handle unexpected error raised by the login call"""
+        self.logger.error(f"Error during RFID authentication: {error}")
+        self.show_error("❌ Lỗi hệ thống")
+    
     def show_error(self, message: str):
         """Show error message and allow retry"""
         self.status_label.setText(message)
@@ -190,6 +207,11 @@ class RFIDLoginScreen(BaseScreen):
         self.rfid_reader.stop_reading()
         self.go_back.emit()
     
+    def hideEvent(self, event):
+        """Stop reading cards when leaving the screen"""
+        self.rfid_reader.stop_reading()
+        super().hideEvent(event)
+    
     def closeEvent(self, event):
         """Handle close event"""
         self.rfid_reader.disconnect()
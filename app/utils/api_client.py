@@ -6,13 +6,126 @@ API client for backend communication
 
 import requests
 import json
+import base64
+import uuid
 import logging
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Any, List, Optional
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
 from utils.config import Config
+from utils.local_store import LocalStore
 
-class APIClient:
+# Shared worker pool for all asynchronous kiosk API calls
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# AsyncRequest running on the current worker thread (lets _make_request stop retrying once cancelled)
+_current = threading.local()
+# Keep handles alive until their result has been delivered on the main thread
+_in_flight = set()
+
+def get_executor(max_workers: int = 4) -> ThreadPoolExecutor:
+    """Get (or lazily create) the shared API worker pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-worker")
+        return _executor
+
+def shutdown_executor():
+    """Stop the shared worker pool (called on application exit)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+class AsyncRequest(QObject):
+    """
+    Handle of an API call running on the worker pool.
+    Result is delivered on the Qt main thread via the finished signal / callback;
+    after cancel() nothing is delivered.
+    """
+    
+    finished = pyqtSignal(object)  # response dict or None
+    failed = pyqtSignal(str)
+    _done = pyqtSignal(object, object)  # (result, error) - emitted from worker thread
+    
+    def __init__(self, callback: Optional[Callable] = None, error_callback: Optional[Callable] = None):
+        # Must be created on the main thread so _deliver runs there (queued connection)
+        super().__init__()
+        self.cancelled = False
+        self.done = False
+        self.future: Optional[Future] = None
+        self._callback = callback
+        self._error_callback = error_callback
+        self._done.connect(self._deliver)
+    
+    def cancel(self):
+        """Drop the result; the HTTP call itself stops at the next retry boundary"""
+        self.cancelled = True
+        if self.future is not None and self.future.cancel():
+            # Never started, so _done will not be emitted: release the reference here
+            self.done = True
+            _in_flight.discard(self)
+    
+    def is_pending(self) -> bool:
+        return not self.done and not self.cancelled
+    
+    @pyqtSlot(object, object)
+    def _deliver(self, result, error):
+        self.done = True
+        _in_flight.discard(self)
+        if self.cancelled:
+            return
+        if error is not None:
+            self.failed.emit(str(error))
+            if self._error_callback:
+                self._error_callback(error)
+            elif self._callback:
+                # Same contract as the sync API: None on failure
+                self._callback(None)
+            return
+        self.finished.emit(result)
+        if self._callback:
+            self._callback(result)
+
+class AsyncAPIMixin:
+    """Adds call_async() to an API client (real or mock)"""
+    
+    def call_async(self, method: Callable, *args, callback: Optional[Callable] = None,
+                   error_callback: Optional[Callable] = None, **kwargs) -> AsyncRequest:
+        """
+        Run an API method (e.g. self.login_rfid) on the shared worker pool.
+        callback(result) is invoked on the Qt main thread so it may touch widgets.
+        """
+        request = AsyncRequest(callback, error_callback)
+        _in_flight.add(request)
+        max_workers = self.config.get("api.max_workers", 4) if getattr(self, "config", None) else 4
+        
+        def run():
+            if request.cancelled:
+                request._done.emit(None, None)
+                return
+            _current.request = request
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                request._done.emit(None, e)
+            else:
+                request._done.emit(result, None)
+            finally:
+                _current.request = None
+        
+        request.future = get_executor(max_workers).submit(run)
+        return request
+
+class APIClient(AsyncAPIMixin):
     """API client for communicating with backend"""
     
+    _shared: Optional["APIClient"] = None
+    _shared_lock = threading.Lock()
+    
     def __init__(self, config: Config):
         self.config = config
         self.base_url = config.get("api.base_url", "http://localhost:8000")
@@ -21,18 +134,60 @@ class APIClient:
         self.session = requests.Session()
         self.logger = logging.getLogger(__name__)
         
+        # One keep-alive connection per API worker thread
+        pool_size = config.get("api.max_workers", 4)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # Latest access/refresh token per user (JWT "sub"), kept in memory only so
+        # queued writes can be replayed for that user without persisting credentials
+        self._sessions: Dict[str, Dict[str, str]] = {}
+        self._sessions_lock = threading.Lock()
+        
+        # Local cache + write-ahead outbox (keeps the kiosk usable through outages)
+        self.store = None
+        if config.get("storage.enabled", True):
+            try:
+                self.store = LocalStore(config)
+            except Exception as e:
+                self.logger.error(f"Local store unavailable, running without offline cache: {e}")
+        
         # Set default headers
         self.session.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
     
+    @classmethod
+    def shared(cls, config: Config) -> "APIClient":
+        """Process-wide client, so all screens reuse one session and connection pool"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(config)
+            return cls._shared
+    
     def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, 
                      headers: Optional[Dict] = None) -> Optional[Dict]:
         """Make HTTP request with retry logic"""
+        response = self._request(method, endpoint, data, headers)
+        return response.json() if response is not None else None
+    
+    def _request(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                 headers: Optional[Dict] = None, ok_statuses: tuple = (),
+                 raise_errors: bool = False) -> Optional[requests.Response]:
+        """
+        Send a request with retry logic. Returns the response for 2xx (or one of
+        ok_statuses, e.g. 304), otherwise None - or re-raises the last error
+        when raise_errors is set so callers can tell "offline" from "rejected".
+        """
         url = f"{self.base_url}{endpoint}"
         
         for attempt in range(self.retry_attempts):
+            current = getattr(_current, "request", None)
+            if current is not None and current.cancelled:
+                self.logger.debug(f"API request to {endpoint} cancelled")
+                return None
             try:
                 if method.upper() == "GET":
                     response = self.session.get(url, timeout=self.timeout, headers=headers)
@@ -47,22 +202,209 @@ class APIClient:
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
                 
+                if response.status_code in ok_statuses:
+                    return response
                 response.raise_for_status()
-                return response.json()
+                return response
                 
             except requests.exceptions.RequestException as e:
                 self.logger.warning(f"API request failed (attempt {attempt + 1}/{self.retry_attempts}): {e}")
                 if attempt == self.retry_attempts - 1:
                     self.logger.error(f"API request failed after {self.retry_attempts} attempts")
+                    if raise_errors:
+                        raise
                     return None
         
         return None
     
+    @staticmethod
+    def _token_subject(token: Optional[str]) -> str:
+        """User id (JWT "sub") used to scope per-user cache entries; not verified"""
+        try:
+            payload = token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+            return str(claims.get("sub", ""))
+        except Exception:
+            return ""
+    
+    def remember_session(self, access_token: Optional[str], refresh_token: Optional[str] = None):
+        """Track the newest credentials of a user for outbox replay"""
+        subject = self._token_subject(access_token) if access_token else ""
+        if not subject:
+            return
+        with self._sessions_lock:
+            session = self._sessions.setdefault(subject, {})
+            session["access_token"] = access_token
+            if refresh_token:
+                session["refresh_token"] = refresh_token
+    
+    def _remember_login(self, response: Optional[Dict]) -> Optional[Dict]:
+        if isinstance(response, dict):
+            self.remember_session(response.get("access_token") or response.get("token"),
+                                  response.get("refresh_token"))
+        return response
+    
+    def _session_token(self, subject: str) -> Optional[str]:
+        with self._sessions_lock:
+            return self._sessions.get(subject, {}).get("access_token")
+    
+    def _refresh_session(self, subject: str) -> Optional[str]:
+        """New access token for subject from its refresh token (None if unknown or rejected)"""
+        with self._sessions_lock:
+            refresh_token = self._sessions.get(subject, {}).get("refresh_token")
+        if not refresh_token:
+            return None
+        response = self._make_request("POST", "/auth/refresh",
+                                      headers={"Authorization": f"Bearer {refresh_token}"})
+        token = response.get("access_token") if response else None
+        if token:
+            self.remember_session(token)
+        return token
+    
+    def _cached_get(self, endpoint: str, token: str, per_user: bool = False) -> Optional[Dict]:
+        """
+        GET through the local store: revalidates with If-None-Match, serves the
+        cached body on 304, and falls back to it (marked "offline") when the
+        backend cannot be reached.
+        """
+        headers = {"Authorization": f"Bearer {token}"}
+        if self.store is None:
+            return self._make_request("GET", endpoint, headers=headers)
+        
+        scope = self._token_subject(token) if per_user else ""
+        key = f"{scope}:{endpoint}" if scope else endpoint
+        etag, cached = self.store.get(key)
+        if etag:
+            headers["If-None-Match"] = etag
+        
+        try:
+            response = self._request("GET", endpoint, headers=headers, ok_statuses=(304,), raise_errors=True)
+        except requests.exceptions.HTTPError as e:
+            # 4xx is a real answer; 5xx (e.g. 502/503/504 from the proxy) means the backend is down
+            status = e.response.status_code if e.response is not None else 0
+            if status < 500 or cached is None:
+                return None
+            self.logger.info(f"Backend error {status}, serving cached {endpoint}")
+            return {**cached, "offline": True} if isinstance(cached, dict) else cached
+        except requests.exceptions.RequestException:
+            if cached is None:
+                return None
+            self.logger.info(f"Backend unreachable, serving cached {endpoint}")
+            return {**cached, "offline": True} if isinstance(cached, dict) else cached
+        
+        if response is None:
+            return None
+        if response.status_code == 304 and cached is not None:
+            self.store.touch(key)
+            return cached
+        body = response.json()
+        self.store.put(key, body, response.headers.get("ETag"), scope)
+        return body
+    
+    def _queued_write(self, method: str, endpoint: str, token: str,
+                      data: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Send a borrow/return write with an Idempotency-Key. If the backend is
+        unreachable or answers 5xx (e.g. 502/503/504 from the proxy while it
+        restarts) the write goes to the outbox and is replayed later with the
+        same key, so a retry can never apply it twice.
+        """
+        key = str(uuid.uuid4())
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": key}
+        self.remember_session(token)
+        try:
+            response = self._request(method, endpoint, data, headers, raise_errors=True)
+        except requests.exceptions.HTTPError as e:
+            # Same rule as _cached_get: 4xx is a real rejection, 5xx means the backend is down
+            status = e.response.status_code if e.response is not None else 0
+            if status >= 500:
+                return self._enqueue_write(key, method, endpoint, token, data)
+            return {"success": False, "message": self._error_message(e)}
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return self._enqueue_write(key, method, endpoint, token, data)
+        except requests.exceptions.RequestException:
+            return None
+        return response.json() if response is not None else None
+    
+    def _enqueue_write(self, key: str, method: str, endpoint: str, token: str,
+                       data: Optional[Dict]) -> Optional[Dict]:
+        if self.store is None:
+            return None
+        # Only the user id is stored; the replay uses that user's current session
+        self.store.enqueue(key, method, endpoint, data, self._token_subject(token))
+        return {"success": True, "queued": True, "idempotency_key": key}
+    
+    @staticmethod
+    def _error_message(error: requests.exceptions.HTTPError) -> str:
+        """The "error" field of a JSON error body, else the exception text (e.g. HTML error pages)"""
+        try:
+            body = error.response.json()
+        except (AttributeError, ValueError):
+            return str(error)
+        return (body.get("error") if isinstance(body, dict) else None) or str(error)
+    
+    def replay_outbox(self) -> int:
+        """
+        Replay queued writes oldest-first with the current session of the user who
+        made them (refreshed if expired); stops at the first network failure or
+        5xx (still offline). Entries whose user has no valid session stay queued until
+        that user signs in again. Returns the number of writes delivered.
+        """
+        if self.store is None:
+            return 0
+        delivered = 0
+        for entry in self.store.pending():
+            subject = entry["subject"]
+            try:
+                self._replay_entry(entry, subject)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else 0
+                if status == 401:
+                    # Session expired and could not be refreshed: keep it for the next sign-in
+                    self.store.mark_attempt(entry["id"], str(e))
+                    self.logger.warning(
+                        f"Replay of {entry['endpoint']} ({entry['idempotency_key']}) waiting for user {subject} to sign in"
+                    )
+                    continue
+                if status >= 500:
+                    # Backend still down behind the proxy: same as offline
+                    self.store.mark_attempt(entry["id"], str(e))
+                    break
+                # Other 4xx will never succeed (e.g. item taken meanwhile): park it
+                self.store.mark_attempt(entry["id"], str(e), failed=400 <= status < 500)
+                self.logger.error(f"Replay of {entry['endpoint']} ({entry['idempotency_key']}) failed: {e}")
+                continue
+            except requests.exceptions.RequestException as e:
+                self.store.mark_attempt(entry["id"], str(e))
+                break
+            self.store.mark_done(entry["id"])
+            delivered += 1
+        if delivered:
+            self.logger.info(f"Replayed {delivered} queued writes")
+        return delivered
+    
+    def _replay_entry(self, entry: Dict[str, Any], subject: str):
+        """Send one queued write; on 401 retry once with a refreshed token"""
+        headers = {"Idempotency-Key": entry["idempotency_key"]}
+        token = self._session_token(subject)
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            self._request(entry["method"], entry["endpoint"], entry["body"], headers, raise_errors=True)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            token = self._refresh_session(subject)
+            if not token:
+                raise
+            headers["Authorization"] = f"Bearer {token}"
+            self._request(entry["method"], entry["endpoint"], entry["body"], headers, raise_errors=True)
+    
     # Authentication Endpoints (/auth)
     def login(self, username: str, password: str) -> Optional[Dict]:
         """Login and receive JWT token"""
         data = {"username": username, "password": password}
-        return self._make_request("POST", "/auth/login", data)
+        return self._remember_login(self._make_request("POST", "/auth/login", data))
     
     def register(self, username: str, password: str, email: str = None) -> Optional[Dict]:
         """Register first account (default admin)"""
@@ -79,8 +421,7 @@ class APIClient:
     
     def get_users(self, token: str) -> Optional[Dict]:
         """Get all users list"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", "/users", headers=headers)
+        return self._cached_get("/users", token)
     
     def get_user(self, token: str, user_id: str) -> Optional[Dict]:
         """Get user info by ID"""
@@ -105,8 +446,7 @@ class APIClient:
     
     def get_items(self, token: str) -> Optional[Dict]:
         """Get all items list"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", "/items", headers=headers)
+        return self._cached_get("/items", token)
     
     def get_item(self, token: str, item_id: str) -> Optional[Dict]:
         """Get item info by ID"""
@@ -125,14 +465,16 @@ class APIClient:
     
     def get_items_by_cell(self, token: str, cell_id: str) -> Optional[Dict]:
         """Get items list in specific cell"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", f"/items/cell/{cell_id}", headers=headers)
+        return self._cached_get(f"/items/cell/{cell_id}", token)
+    
+    def get_accessible_items(self, token: str) -> Optional[Dict]:
+        """Get items the current user may borrow (cached per user)"""
+        return self._cached_get("/items/my-accessible", token, per_user=True)
     
     # Cell Management Endpoints (/cells)
     def get_cells(self, token: str) -> Optional[Dict]:
         """Get all cells list"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", "/cells", headers=headers)
+        return self._cached_get("/cells", token)
     
     def get_cell(self, token: str, cell_id: str) -> Optional[Dict]:
         """Get cell info by ID"""
@@ -156,14 +498,25 @@ class APIClient:
     
     # Borrowing Management Endpoints (/borrowings)
     def create_borrowing(self, token: str, borrowing_data: Dict) -> Optional[Dict]:
-        """Create borrowing record"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("POST", "/borrowings", borrowing_data, headers)
+        """Create borrowing record (queued for replay when offline)"""
+        return self._queued_write("POST", "/borrowings", token, borrowing_data)
     
     def return_item(self, token: str, borrowing_id: str) -> Optional[Dict]:
-        """Return item (complete borrowing)"""
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("PATCH", f"/borrowings/{borrowing_id}/return", headers=headers)
+        """Return item (complete borrowing, queued for replay when offline)"""
+        return self._queued_write("PATCH", f"/borrowings/{borrowing_id}/return", token)
+
+    def create_borrowings_bulk(self, token: str, item_ids: List[int], expected_return_at: str,
+                               note: Optional[str] = None, open_cells: bool = True) -> Optional[Dict]:
+        """Borrow several items at once; the response reports each item separately"""
+        data = {"item_ids": item_ids, "expected_return_at": expected_return_at,
+                "note": note, "open_cells": open_cells}
+        return self._queued_write("POST", "/borrowings/bulk", token, data)
+
+    def return_items_bulk(self, token: str, borrowing_ids: List[int],
+                          open_cells: bool = True) -> Optional[Dict]:
+        """Return several borrowings at once; the response reports each borrowing separately"""
+        data = {"borrowing_ids": borrowing_ids, "open_cells": open_cells}
+        return self._queued_write("PATCH", "/borrowings/bulk/return", token, data)
     
     # Cell Event Endpoints (/cells/<cell_id>/events)
     def get_cell_events(self, token: str, cell_id: str) -> Optional[Dict]:
@@ -177,13 +530,16 @@ class APIClient:
         # For now, we'll use the regular login endpoint
         # In the future, this might be a separate RFID endpoint
         data = {"rfid_uid": rfid_uid}
-        return self._make_request("POST", "/auth/rfid", data)
+        return self._remember_login(self._make_request("POST", "/auth/rfid", data))
     
     def login_code(self, jwt_token: str) -> Optional[Dict]:
         """Login with JWT token (legacy method)"""
         # This might be used for token validation
         headers = {"Authorization": f"Bearer {jwt_token}"}
-        return self._make_request("GET", "/auth/validate", headers=headers)
+        response = self._make_request("GET", "/auth/validate", headers=headers)
+        if response is not None:
+            self.remember_session(jwt_token)
+        return response
     
     def get_user_info(self, token: str) -> Optional[Dict]:
         """Get user information (legacy method)"""
@@ -193,14 +549,12 @@ class APIClient:
     def get_available_lockers(self, token: str) -> Optional[Dict]:
         """Get available lockers for borrowing (legacy method)"""
         # This maps to available cells
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", "/cells/available", headers=headers)
+        return self._cached_get("/cells/available", token)
     
     def get_user_lockers(self, token: str) -> Optional[Dict]:
         """Get user's borrowed lockers (legacy method)"""
         # This maps to user's active borrowings
-        headers = {"Authorization": f"Bearer {token}"}
-        return self._make_request("GET", "/borrowings/active", headers=headers)
+        return self._cached_get("/borrowings/active", token, per_user=True)
     
     def open_locker(self, token: str, locker_id: str, action: str) -> Optional[Dict]:
         """Open locker for borrow/return (legacy method)"""
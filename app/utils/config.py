@@ -21,22 +21,47 @@ class Config:
             "api": {
                 "base_url": "http://localhost:8000",
                 "timeout": 30,
-                "retry_attempts": 3
+                "retry_attempts": 3,
+                "max_workers": 4  # background threads for API calls
             },
             "rfid": {
                 "port": "/dev/ttyUSB0",
                 "baudrate": 9600,
-                "timeout": 1
+                "timeout": 1,
+                "debounce": 2.0  # ignore the same UID within this window (seconds)
             },
             "ui": {
                 "theme": "light",
                 "language": "vi",
                 "fullscreen": True,
-                "countdown_time": 300  # 5 minutes in seconds
+                "countdown_time": 300,  # 5 minutes in seconds
+                "prewarm_screens": True  # build screens in the background after startup
+            },
+            "mqtt": {
+                "enabled": True,  # live locker status; needs paho-mqtt
+                "host": "localhost",
+                "port": 1883,
+                "username": "",
+                "password": "",
+                "keepalive": 60
+            },
+            "storage": {
+                "enabled": True,  # local SQLite cache + offline write queue
+                "path": "kiosk_cache.db",
+                "user_ttl": 604800,  # forget per-user cache entries after 7 days
+                "replay_interval": 30  # seconds between outbox replay attempts
+            },
+            "logging": {
+                "max_bytes": 5242880,  # rotate at 5 MB or at midnight
+                "backup_count": 10,
+                "retention_days": 14,
+                "sample": {}  # e.g. {"utils.mqtt_client": 10} keeps 1 of 10 DEBUG/INFO records
             },
             "locker": {
                 "max_borrow_time": 3600,  # 1 hour in seconds
-                "warning_time": 300  # 5 minutes warning
+                "warning_time": 300,  # 5 minutes warning
+                "status_poll_min": 2,  # HTTP status polling backoff when MQTT is down (seconds)
+                "status_poll_max": 30
             }
         }
         
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local SQLite store: cached API reads (with ETags) and a write-ahead outbox
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from utils.config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL DEFAULT '',
+    etag TEXT,
+    body TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_resources_scope ON resources (scope, fetched_at);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    body TEXT,
+    subject TEXT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class LocalStore:
+    """
+    Kiosk-side persistence so common reads survive backend/network outages.
+    - resources: last good response per endpoint (cells, items, per-user access lists)
+      together with its ETag for conditional refresh.
+    - outbox: borrow/return writes made while offline, replayed in order with
+      their original idempotency key once the backend is reachable again.
+    Used from the API worker threads, so every access goes through one lock.
+    """
+
+    def __init__(self, config: Config):
+        self.logger = logging.getLogger(__name__)
+        self.path = config.get("storage.path", "kiosk_cache.db")
+        # Per-user entries (access lists) are dropped after this many seconds unused
+        self.user_ttl = config.get("storage.user_ttl", 7 * 24 * 3600)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.prune()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Cached reads
+    def get(self, key: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return (etag, body) of the cached response, (None, None) if missing"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, body FROM resources WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, body: Any, etag: Optional[str] = None, scope: str = ""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resources (key, scope, etag, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, scope, etag, json.dumps(body, ensure_ascii=False), time.time()),
+            )
+
+    def touch(self, key: str):
+        """Mark a cached response as still current (after a 304)"""
+        with self._lock:
+            self._conn.execute("UPDATE resources SET fetched_at = ? WHERE key = ?", (time.time(), key))
+
+    def prune(self):
+        """Forget per-user entries of users not seen recently"""
+        cutoff = time.time() - self.user_ttl
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM resources WHERE scope != '' AND fetched_at < ?", (cutoff,)
+            ).rowcount
+        if deleted:
+            self.logger.info(f"Pruned {deleted} cached entries of inactive users")
+
+    # Write-ahead outbox
+    def enqueue(self, idempotency_key: str, method: str, endpoint: str,
+                body: Optional[Dict] = None, subject: str = ""):
+        """Queue a write made by user subject (JWT "sub"); no credentials are stored"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, method, endpoint, body, subject, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (idempotency_key, method, endpoint,
+                 json.dumps(body) if body is not None else None, subject, time.time()),
+            )
+        self.logger.info(f"Queued {method} {endpoint} for replay ({idempotency_key})")
+
+    def pending(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Oldest-first entries still waiting to be replayed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, idempotency_key, method, endpoint, body, attempts, subject FROM outbox "
+                "WHERE failed = 0 ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [{
+            "id": row[0],
+            "idempotency_key": row[1],
+            "method": row[2],
+            "endpoint": row[3],
+            "body": json.loads(row[4]) if row[4] else None,
+            "attempts": row[5],
+            "subject": row[6] or "",
+        } for row in rows]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE failed = 0").fetchone()[0]
+
+    def mark_done(self, entry_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def mark_attempt(self, entry_id: int, error: str, failed: bool = False):
+        """Record a failed replay; failed=True parks the entry (it will never succeed)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, failed = ? WHERE id = ?",
+                (error[:500], 1 if failed else 0, entry_id),
+            )
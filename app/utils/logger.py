@@ -2,46 +2,163 @@
 # -*- coding: utf-8 -*-
 """
 Logging configuration for the application
+
+DroppingQueueHandler, SamplingFilter and SizedTimedRotatingFileHandler mirror
+iot-locker/app/utils/log_config.py. The kiosk (ships app/ only) and the backend
+(Docker build context iot-locker/) are packaged separately with no shared
+package to import from, so a fix in one copy must be applied to the other.
 """
 
 import logging
 import os
-from datetime import datetime
+import sys
+import time
+import glob
+import queue
+import atexit
+import threading
+from datetime import date
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+_listener: Optional[QueueListener] = None
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller; records are dropped when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 of every N DEBUG/INFO records of noisy modules; WARNING and above always pass"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        if not rate:
+            return True
+        with self._lock:
+            count = self._counters.get(record.name, 0)
+            self._counters[record.name] = count + 1
+        return count % rate == 0
+
+    def _rate_for(self, name: str) -> Optional[int]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return None
+
+class SizedTimedRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotates when the file exceeds max_bytes or the day changes (numbered
+    backups like RotatingFileHandler), keeping at most backup_count files
+    and none older than retention_days.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, retention_days: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=max(1, backup_count),
+                         encoding='utf-8', delay=True)
+        self.retention_days = retention_days
+        if os.path.exists(self.baseFilename):
+            self._day = date.fromtimestamp(os.path.getmtime(self.baseFilename))
+        else:
+            self._day = date.today()
+
+    def shouldRollover(self, record) -> bool:
+        if date.today() != self._day and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self._day = date.today()
+        self._purge_expired()
+
+    def _purge_expired(self):
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for path in glob.glob(f"{glob.escape(self.baseFilename)}.*"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+def setup_logger(name: str = "locker_app", level: int = logging.INFO,
+                 logs_dir: str = "logs", max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 10, retention_days: int = 14,
+                 sample: Optional[Dict[str, int]] = None) -> logging.Logger:
+    """
+    Setup and configure logging for the whole process.
+    Every logger writes into a bounded queue; a QueueListener thread does the
+    file/console I/O, so the UI, RFID and MQTT threads never wait on disk.
+    """
+    global _listener
 
-def setup_logger(name: str = "locker_app", level: int = logging.INFO) -> logging.Logger:
-    """Setup and configure logger"""
-    
     # Create logs directory if it doesn't exist
-    logs_dir = "logs"
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # Clear existing handlers
-    logger.handlers.clear()
-    
+
     # Create formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
-    # File handler
-    log_file = os.path.join(logs_dir, f"{datetime.now().strftime('%Y%m%d')}.log")
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+
+    # File handler (size + daily rotation with retention)
+    file_handler = SizedTimedRotatingFileHandler(
+        os.path.join(logs_dir, f"{name}.log"), max_bytes, backup_count, retention_days
+    )
     file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    
+
     # Console handler
-    console_handler = logging.StreamHandler()
+    console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger 
\ No newline at end of file
+
+    # Queue in front of the handlers, on the root logger so module loggers are included
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=10000))
+    queue_handler.addFilter(SamplingFilter(sample or {}))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = QueueListener(queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.unregister(shutdown_logger)
+    atexit.register(shutdown_logger)
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    # Clear existing handlers
+    logger.handlers.clear()
+    return logger
+
+def shutdown_logger():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
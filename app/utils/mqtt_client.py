@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Optional MQTT client for live locker status (paho-mqtt is not required)
+"""
+
+import json
+import logging
+from typing import Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+from utils.config import Config
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # paho-mqtt not installed: screens fall back to HTTP polling
+    mqtt = None
+
+# Same topic the backend MQTTService subscribes to for ESP32 status
+STATUS_TOPIC = "locker/cell/+/status"
+
+class LockerStatusClient(QObject):
+    """
+    Subscribes to locker status messages published by the ESP32 cells.
+    Signals are emitted from the paho network thread and delivered on the
+    Qt main thread (queued connection, this object lives on the main thread).
+    """
+
+    cell_status = pyqtSignal(int, str)  # (cell_id, "open"/"closed")
+    connection_changed = pyqtSignal(bool)
+
+    def __init__(self, config: Config, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.client = None
+        self.connected = False
+
+        # Configuration
+        self.enabled = config.get("mqtt.enabled", True)
+        self.host = config.get("mqtt.host", "localhost")
+        self.port = config.get("mqtt.port", 1883)
+        self.username = config.get("mqtt.username", "")
+        self.password = config.get("mqtt.password", "")
+        self.keepalive = config.get("mqtt.keepalive", 60)
+
+    @staticmethod
+    def is_available() -> bool:
+        return mqtt is not None
+
+    def start(self) -> bool:
+        """Connect in the background; returns False if MQTT is disabled or unavailable"""
+        if not self.enabled:
+            self.logger.info("MQTT status client disabled in config")
+            return False
+        if mqtt is None:
+            self.logger.info("paho-mqtt not installed - using HTTP status polling")
+            return False
+        if self.client is not None:
+            return True
+
+        try:
+            self.client = mqtt.Client()
+            if self.username:
+                self.client.username_pw_set(self.username, self.password)
+            self.client.on_connect = self._on_connect
+            self.client.on_disconnect = self._on_disconnect
+            self.client.on_message = self._on_message
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            # connect_async + loop_start: never blocks the UI, paho keeps reconnecting
+            self.client.connect_async(self.host, self.port, self.keepalive)
+            self.client.loop_start()
+            self.logger.info(f"Connecting to MQTT broker at {self.host}:{self.port}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to start MQTT status client: {e}")
+            self.client = None
+            return False
+
+    def stop(self):
+        """Disconnect and stop the network thread"""
+        if self.client is None:
+            return
+        try:
+            self.client.disconnect()
+            self.client.loop_stop()
+        except Exception as e:
+            self.logger.error(f"Error stopping MQTT status client: {e}")
+        self.client = None
+        self._set_connected(False)
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def _set_connected(self, connected: bool):
+        if connected != self.connected:
+            self.connected = connected
+            self.connection_changed.emit(connected)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(STATUS_TOPIC, 0)
+            self.logger.info(f"Connected to MQTT broker, subscribed to {STATUS_TOPIC}")
+            self._set_connected(True)
+        else:
+            self.logger.warning(f"MQTT connection refused. Code: {rc}")
+            self._set_connected(False)
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.logger.warning(f"Disconnected from MQTT broker. Code: {rc}")
+        self._set_connected(False)
+
+    def _on_message(self, client, userdata, msg):
+        cell_id = self._parse_cell_id(msg.topic)
+        if cell_id is None:
+            return
+        try:
+            payload = json.loads(msg.payload.decode())
+        except (ValueError, UnicodeDecodeError):
+            self.logger.debug(f"Ignoring invalid payload on {msg.topic}")
+            return
+        status = payload.get("status") if isinstance(payload, dict) else None
+        if status:
+            self.cell_status.emit(cell_id, str(status))
+
+    @staticmethod
+    def _parse_cell_id(topic: str) -> Optional[int]:
+        # locker/cell/<id>/status
+        parts = topic.split("/")
+        if len(parts) != 4:
+            return None
+        try:
+            return int(parts[2])
+        except ValueError:
+            return None
@@ -9,8 +9,23 @@ import threading
 import time
 import logging
 from typing import Optional, Callable
+from PyQt6.QtCore import QObject, pyqtSignal, Qt
 from utils.config import Config
 
+class RFIDSignalBridge(QObject):
+    """
+    Marshals card detections from the reader thread onto the Qt main thread.
+    Must be created on the main thread; the queued connection posts each UID
+    to the main event loop instead of calling the callback on the reader thread.
+    """
+    
+    card_detected = pyqtSignal(str)
+    
+    def __init__(self, callback: Optional[Callable[[str], None]] = None):
+        super().__init__()
+        if callback:
+            self.card_detected.connect(callback, Qt.ConnectionType.QueuedConnection)
+
 class RFIDReader:
     """RFID reader class for USB/UART communication"""
     
@@ -27,6 +42,11 @@ class RFIDReader:
         self.baudrate = config.get("rfid.baudrate", 9600)
         self.timeout = config.get("rfid.timeout", 1)
         self.demo_mode = config.get("rfid.demo_mode", False)
+        # Same UID seen again within this window (seconds) is ignored
+        self.debounce = config.get("rfid.debounce", 2.0)
+        self._last_uid = None
+        self._last_seen = 0.0
+        self.bridge = RFIDSignalBridge(callback)
     
     def connect(self) -> bool:
         """Connect to RFID reader"""
@@ -92,29 +112,54 @@ class RFIDReader:
         """Stop reading RFID cards"""
         self.is_reading = False
         
+        # Wake the reader thread out of its blocking read (POSIX only)
+        if self.serial_port and hasattr(self.serial_port, "cancel_read"):
+            try:
+                self.serial_port.cancel_read()
+            except Exception:
+                pass
+        
         if self.reader_thread and self.reader_thread.is_alive():
-            self.reader_thread.join(timeout=1)
+            self.reader_thread.join(timeout=self.timeout + 1)
         
         self.logger.info("Stopped RFID reading")
     
     def _read_loop(self):
-        """Background thread for reading RFID cards"""
+        """
+        Background thread for reading RFID cards.
+        readline() blocks in the serial driver (select on the fd) until a line
+        arrives or the port timeout expires, so the thread sleeps while idle.
+        """
         while self.is_reading:
             try:
-                if self.serial_port.in_waiting > 0:
-                    # Read data from serial port
-                    data = self.serial_port.readline().decode('utf-8').strip()
+                uid = self._read_uid()
+                if uid and self._accept(uid):
+                    self.logger.info(f"RFID card detected: {uid}")
+                    self.bridge.card_detected.emit(uid)
                     
-                    if data:
-                        # Parse RFID UID (assuming format like "UID: 1234567890ABCDEF")
-                        uid = self._parse_rfid_data(data)
-                        if uid and self.callback:
-                            self.logger.info(f"RFID card detected: {uid}")
-                            self.callback(uid)
-                            
             except Exception as e:
+                if not self.is_reading:
+                    break
                 self.logger.error(f"Error reading RFID data: {e}")
-                time.sleep(0.1)
+                time.sleep(0.5)
+    
+    def _read_uid(self) -> Optional[str]:
+        """Block for one line (up to the port timeout) and parse it"""
+        line = self.serial_port.readline()
+        if not line:
+            return None
+        data = line.decode('utf-8', errors='ignore').strip()
+        return self._parse_rfid_data(data) if data else None
+    
+    def _accept(self, uid: str) -> bool:
+        """Suppress repeated reads of the same card within the debounce window"""
+        now = time.monotonic()
+        if uid == self._last_uid and now - self._last_seen < self.debounce:
+            self._last_seen = now
+            return False
+        self._last_uid = uid
+        self._last_seen = now
+        return True
     
     def _parse_rfid_data(self, data: str) -> Optional[str]:
         """Parse RFID data to extract UID"""
@@ -146,20 +191,16 @@ class RFIDReader:
             if not self.connect():
                 return None
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
             try:
-                if self.serial_port.in_waiting > 0:
-                    data = self.serial_port.readline().decode('utf-8').strip()
-                    if data:
-                        uid = self._parse_rfid_data(data)
-                        if uid:
-                            return uid
-                            
+                uid = self._read_uid()
+                if uid:
+                    return uid
+                    
             except Exception as e:
                 self.logger.error(f"Error reading single card: {e}")
-                
-            time.sleep(0.1)
+                time.sleep(0.5)
         
         return None
     
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import ApiService, { type Cell } from '../services/api';
+import ApiService, { type Cell, type CellStatusEvent } from '../services/api';
 
 interface CellControlProps {
   compact?: boolean;
@@ -15,11 +15,27 @@ const CellControl = ({ compact = false, showTitle = true }: CellControlProps) =>
   useEffect(() => {
     loadCells();
     
-    // Auto refresh every 15 seconds
-    const interval = setInterval(loadCells, 15000);
-    return () => clearInterval(interval);
+    // Nhận thay đổi trạng thái qua SSE thay vì polling 15 giây
+    const unsubscribe = ApiService.subscribeCellStream({
+      onCellStatus: applyCellStatus,
+      onResync: loadCells
+    });
+    return unsubscribe;
   }, []);
 
+  const applyCellStatus = (event: CellStatusEvent) => {
+    setCells(prev => prev.map(cell =>
+      cell.id === event.cell_id
+        ? {
+            ...cell,
+            status: event.status,
+            last_open_at: event.last_open_at ?? cell.last_open_at,
+            last_close_at: event.last_close_at ?? cell.last_close_at
+          }
+        : cell
+    ));
+  };
+
   const loadCells = async () => {
     try {
       const data = await ApiService.getCells();
@@ -46,9 +62,7 @@ const CellControl = ({ compact = false, showTitle = true }: CellControlProps) =>
       
       // Show success notification
       showNotification(`${operation.charAt(0).toUpperCase() + operation.slice(1)} command sent successfully`, 'success');
-      
-      // Reload cells after operation
-      setTimeout(loadCells, 1500); // Wait for ESP32 to respond
+      // Trạng thái mới sẽ được đẩy về qua stream khi ESP32 phản hồi
     } catch (error) {
       const errorMessage = error instanceof Error ? error.message : `Failed to ${operation} cell`;
       setError(errorMessage);
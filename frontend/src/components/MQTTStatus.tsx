@@ -1,26 +1,33 @@
 import { useState, useEffect } from 'react';
+import ApiService from '../services/api';
 
 const MQTTStatus = () => {
   const [status, setStatus] = useState<'connected' | 'disconnected' | 'connecting'>('connecting');
   const [lastCheck, setLastCheck] = useState<Date>(new Date());
 
   useEffect(() => {
-    // Simulate MQTT connection status checking
-    // In a real implementation, you would check actual MQTT connection status
-    const checkMQTTStatus = () => {
-      // This would be replaced with actual MQTT status check
-      const isConnected = Math.random() > 0.1; // 90% chance of being connected
-      setStatus(isConnected ? 'connected' : 'disconnected');
+    const checkMQTTStatus = async () => {
+      try {
+        const info = await ApiService.getMqttStatus();
+        setStatus(info.connected ? 'connected' : 'disconnected');
+      } catch (error) {
+        console.error('Error checking MQTT status:', error);
+        setStatus('disconnected');
+      }
       setLastCheck(new Date());
     };
 
-    // Initial check
-    setTimeout(checkMQTTStatus, 2000);
+    // Initial check, sau đó cập nhật khi server đẩy event mqtt_status
+    checkMQTTStatus();
+    const unsubscribe = ApiService.subscribeCellStream({
+      onMqttStatus: ({ connected }) => {
+        setStatus(connected ? 'connected' : 'disconnected');
+        setLastCheck(new Date());
+      },
+      onResync: checkMQTTStatus
+    });
 
-    // Check status every 30 seconds
-    const interval = setInterval(checkMQTTStatus, 30000);
-
-    return () => clearInterval(interval);
+    return unsubscribe;
   }, []);
 
   const getStatusInfo = () => {
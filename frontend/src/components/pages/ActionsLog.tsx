@@ -1,7 +1,9 @@
 import React, { useState, useEffect } from 'react';
 // import { useAuth } from '../../contexts/AuthContext';
 import ApiService from '../../services/api';
-import type { CellEvent, Borrowing } from '../../services/api';
+import type { CellEvent, Borrowing, ActivityCounts } from '../../services/api';
+
+const PAGE_SIZE = 100;
 
 const ActionsLog: React.FC = () => {
   // const { user: currentUser } = useAuth();
@@ -10,6 +12,11 @@ const ActionsLog: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [filter, setFilter] = useState<'all' | 'cell_events' | 'borrowings'>('all');
+  const [eventsCursor, setEventsCursor] = useState<string | null>(null);
+  const [borrowingsCursor, setBorrowingsCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Tổng số từ server; null nếu không lấy được -> thẻ hiển thị số dòng đã tải
+  const [counts, setCounts] = useState<ActivityCounts | null>(null);
 
   useEffect(() => {
     fetchData();
@@ -18,12 +25,16 @@ const ActionsLog: React.FC = () => {
   const fetchData = async () => {
     try {
       setLoading(true);
-      const [cellEventsData, borrowingsData] = await Promise.all([
-        ApiService.getCellEvents(),
-        ApiService.getBorrowings()
+      const [cellEventsPage, borrowingsPage, activityCounts] = await Promise.all([
+        ApiService.getCellEventsPage({}, PAGE_SIZE),
+        ApiService.getBorrowingsPage({}, PAGE_SIZE),
+        ApiService.getActivityCounts().catch(() => null)
       ]);
-      setCellEvents(cellEventsData);
-      setBorrowings(borrowingsData);
+      setCounts(activityCounts);
+      setCellEvents(cellEventsPage.items);
+      setBorrowings(borrowingsPage.items);
+      setEventsCursor(cellEventsPage.next_cursor);
+      setBorrowingsCursor(borrowingsPage.next_cursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch data');
     } finally {
@@ -31,6 +42,29 @@ const ActionsLog: React.FC = () => {
     }
   };
 
+  // Tải trang tiếp theo theo cursor thay vì kéo toàn bộ log mỗi lần mở trang
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const [cellEventsPage, borrowingsPage] = await Promise.all([
+        eventsCursor ? ApiService.getCellEventsPage({}, PAGE_SIZE, eventsCursor) : null,
+        borrowingsCursor ? ApiService.getBorrowingsPage({}, PAGE_SIZE, borrowingsCursor) : null
+      ]);
+      if (cellEventsPage) {
+        setCellEvents(prev => [...prev, ...cellEventsPage.items]);
+        setEventsCursor(cellEventsPage.next_cursor);
+      }
+      if (borrowingsPage) {
+        setBorrowings(prev => [...prev, ...borrowingsPage.items]);
+        setBorrowingsCursor(borrowingsPage.next_cursor);
+      }
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch data');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getFilteredActions = () => {
     const allActions: Array<{
       id: string;
@@ -98,6 +132,7 @@ const ActionsLog: React.FC = () => {
   }
 
   const filteredActions = getFilteredActions();
+  const countLabel = (title: string) => counts ? title : `${title} (loaded)`;
 
   return (
     <main
@@ -299,6 +334,28 @@ const ActionsLog: React.FC = () => {
         </div>
       </div>
 
+      {(eventsCursor || borrowingsCursor) && (
+        <div style={{ width: '100%', display: 'flex', justifyContent: 'center', marginBottom: 24 }}>
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            style={{
+              background: 'white',
+              color: '#667eea',
+              border: '1px solid #667eea',
+              borderRadius: 6,
+              padding: '8px 24px',
+              fontSize: 14,
+              fontWeight: 500,
+              cursor: loadingMore ? 'not-allowed' : 'pointer',
+              opacity: loadingMore ? 0.6 : 1
+            }}
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Summary Cards */}
       <div style={{
         width: '100%',
@@ -314,10 +371,10 @@ const ActionsLog: React.FC = () => {
           boxShadow: '0px 2px 8px rgba(0,0,0,0.1)'
         }}>
           <h3 style={{ margin: 0, color: '#666', fontSize: 14, marginBottom: 8 }}>
-            Total Cell Events
+            {countLabel('Total Cell Events')}
           </h3>
           <p style={{ margin: 0, fontSize: 28, fontWeight: 700, color: '#5C5CFF' }}>
-            {cellEvents.length}
+            {counts ? counts.cell_events : cellEvents.length}
           </p>
         </div>
 
@@ -328,10 +385,10 @@ const ActionsLog: React.FC = () => {
           boxShadow: '0px 2px 8px rgba(0,0,0,0.1)'
         }}>
           <h3 style={{ margin: 0, color: '#666', fontSize: 14, marginBottom: 8 }}>
-            Total Borrowings
+            {countLabel('Total Borrowings')}
           </h3>
           <p style={{ margin: 0, fontSize: 28, fontWeight: 700, color: '#F57C00' }}>
-            {borrowings.length}
+            {counts ? counts.borrowings : borrowings.length}
           </p>
         </div>
 
@@ -342,10 +399,10 @@ const ActionsLog: React.FC = () => {
           boxShadow: '0px 2px 8px rgba(0,0,0,0.1)'
         }}>
           <h3 style={{ margin: 0, color: '#666', fontSize: 14, marginBottom: 8 }}>
-            Active Borrowings
+            {countLabel('Active Borrowings')}
           </h3>
           <p style={{ margin: 0, fontSize: 28, fontWeight: 700, color: '#B7791F' }}>
-            {borrowings.filter(b => !b.returned_at).length}
+            {counts ? counts.active_borrowings : borrowings.filter(b => !b.returned_at).length}
           </p>
         </div>
 
@@ -356,10 +413,10 @@ const ActionsLog: React.FC = () => {
           boxShadow: '0px 2px 8px rgba(0,0,0,0.1)'
         }}>
           <h3 style={{ margin: 0, color: '#666', fontSize: 14, marginBottom: 8 }}>
-            Returned Items
+            {countLabel('Returned Items')}
           </h3>
           <p style={{ margin: 0, fontSize: 28, fontWeight: 700, color: '#06A561' }}>
-            {borrowings.filter(b => b.returned_at).length}
+            {counts ? counts.returned_borrowings : borrowings.filter(b => b.returned_at).length}
           </p>
         </div>
       </div>
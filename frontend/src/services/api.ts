@@ -76,6 +76,87 @@ export interface DashboardStats {
   }>;
 }
 
+// Tổng số dòng cho trang nhật ký (danh sách chỉ tải từng trang)
+export interface ActivityCounts {
+  cell_events: number;
+  borrowings: number;
+  active_borrowings: number;
+  returned_borrowings: number;
+}
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  limit: number;
+}
+
+export interface CellEventFilters {
+  cell_id?: number;
+  user_id?: number;
+  event_type?: 'open' | 'close';
+  since?: string;
+  until?: string;
+}
+
+export interface BorrowingFilters {
+  cell_id?: number;
+  user_id?: number;
+  item_id?: number;
+  status?: 'borrowing' | 'returned' | 'overdue';
+  since?: string;
+  until?: string;
+}
+
+export interface AccessChangeSummary {
+  items: number;
+  granted: number;
+  revoked: number;
+}
+
+export interface BulkResult {
+  item_id?: number;
+  borrowing_id?: number;
+  borrowing?: Borrowing;
+  error?: string;
+}
+
+export interface BulkResponse {
+  results: BulkResult[];
+  succeeded: number;
+  failed: number;
+  cells?: { cell_id: number; status: 'sent' | 'already_open' | 'not_found' | 'failed'; correlation_id?: string }[];
+}
+
+const toQuery = (params: Record<string, string | number | undefined | null>): string => {
+  const search = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') {
+      search.set(key, String(value));
+    }
+  });
+  return search.toString();
+};
+
+export interface CellStatusEvent {
+  cell_id: number;
+  status: 'open' | 'closed';
+  last_open_at?: string | null;
+  last_close_at?: string | null;
+}
+
+export interface MQTTStatusInfo {
+  connected: boolean;
+  broker: string;
+}
+
+export interface CellStreamHandlers {
+  onCellStatus?: (event: CellStatusEvent) => void;
+  onMqttStatus?: (status: { connected: boolean }) => void;
+  // Server báo client đã lỡ event (hàng đợi tràn / kết nối lại quá trễ) -> cần tải lại toàn bộ
+  onResync?: () => void;
+  onError?: (event: Event) => void;
+}
+
 class ApiService {
   private getHeaders(): HeadersInit {
     const token = localStorage.getItem('access_token');
@@ -187,6 +268,24 @@ class ApiService {
     return this.handleResponse<User[]>(response);
   }
 
+  async setItemsAccess(itemIds: number[], userIds: number[]): Promise<AccessChangeSummary> {
+    const response = await fetch(`${API_BASE_URL}/items/access`, {
+      method: 'PUT',
+      headers: this.getHeaders(),
+      body: JSON.stringify({ item_ids: itemIds, user_ids: userIds })
+    });
+    return this.handleResponse<AccessChangeSummary>(response);
+  }
+
+  async copyItemAccess(itemId: number, target: { item_ids?: number[]; cell_id?: number }): Promise<AccessChangeSummary> {
+    const response = await fetch(`${API_BASE_URL}/items/${itemId}/access/copy`, {
+      method: 'POST',
+      headers: this.getHeaders(),
+      body: JSON.stringify(target)
+    });
+    return this.handleResponse<AccessChangeSummary>(response);
+  }
+
   // Get items current user has access to (for regular users)
   async getMyAccessibleItems(): Promise<Item[]> {
     const response = await fetch(`${API_BASE_URL}/items/my-accessible`, {
@@ -289,21 +388,127 @@ class ApiService {
     await this.handleResponse(response);
   }
 
+  // Lệnh ghi đang chạy theo scope: bấm lặp khi request chưa xong dùng lại cùng promise,
+  // header Idempotency-Key để backend không thực hiện lại nếu request bị gửi lặp
+  private inflight = new Map<string, Promise<unknown>>();
+
+  private idempotent<T>(scope: string, send: (key: string) => Promise<T>): Promise<T> {
+    const pending = this.inflight.get(scope);
+    if (pending) return pending as Promise<T>;
+    const promise = send(crypto.randomUUID()).finally(() => this.inflight.delete(scope));
+    this.inflight.set(scope, promise);
+    return promise;
+  }
+
   // Cell MQTT Control API
   async openCell(id: number): Promise<{ message: string }> {
-    const response = await fetch(`${API_BASE_URL}/cells/${id}/open`, {
-      method: 'POST',
-      headers: this.getHeaders()
+    return this.idempotent(`open:${id}`, async (key) => {
+      const response = await fetch(`${API_BASE_URL}/cells/${id}/open`, {
+        method: 'POST',
+        headers: { ...this.getHeaders(), 'Idempotency-Key': key }
+      });
+      return this.handleResponse<{ message: string }>(response);
     });
-    return this.handleResponse<{ message: string }>(response);
   }
 
   async closeCell(id: number): Promise<{ message: string }> {
-    const response = await fetch(`${API_BASE_URL}/cells/${id}/close`, {
-      method: 'POST',
+    return this.idempotent(`close:${id}`, async (key) => {
+      const response = await fetch(`${API_BASE_URL}/cells/${id}/close`, {
+        method: 'POST',
+        headers: { ...this.getHeaders(), 'Idempotency-Key': key }
+      });
+      return this.handleResponse<{ message: string }>(response);
+    });
+  }
+
+  // Cell status stream (Server-Sent Events): một EventSource dùng chung cho cả trang
+  // (mỗi stream giữ một thread của worker backend), mở khi có subscriber đầu tiên, đóng khi hết
+  private streamHandlers = new Set<CellStreamHandlers>();
+  private streamSource: EventSource | null = null;
+  private streamLastEventId: string | null = null;
+  private streamRetryTimer: ReturnType<typeof setTimeout> | null = null;
+  private streamRetryDelay = 3000;
+
+  subscribeCellStream(handlers: CellStreamHandlers): () => void {
+    this.streamHandlers.add(handlers);
+    if (this.streamHandlers.size === 1) void this.openCellStream();
+    return () => {
+      this.streamHandlers.delete(handlers);
+      if (this.streamHandlers.size === 0) this.closeCellStream();
+    };
+  }
+
+  private closeCellStream() {
+    if (this.streamRetryTimer) clearTimeout(this.streamRetryTimer);
+    this.streamRetryTimer = null;
+    this.streamSource?.close();
+    this.streamSource = null;
+  }
+
+  private scheduleCellStreamReconnect() {
+    if (this.streamHandlers.size === 0 || this.streamRetryTimer) return;
+    this.streamRetryTimer = setTimeout(() => {
+      this.streamRetryTimer = null;
+      void this.openCellStream();
+    }, this.streamRetryDelay);
+    this.streamRetryDelay = Math.min(this.streamRetryDelay * 2, 30000);
+  }
+
+  private async openCellStream() {
+    // Access token không đưa lên URL: xin token ngắn hạn chỉ dùng cho stream ở mỗi lần kết nối
+    let streamToken: string;
+    try {
+      const response = await fetch(`${API_BASE_URL}/cells/stream/token`, {
+        method: 'POST',
+        headers: this.getHeaders()
+      });
+      streamToken = (await this.handleResponse<{ token: string }>(response)).token;
+    } catch (error) {
+      console.error('Error getting cell stream token:', error);
+      this.scheduleCellStreamReconnect();
+      return;
+    }
+    if (this.streamHandlers.size === 0 || this.streamSource) return;
+
+    const query = toQuery({ token: streamToken, last_event_id: this.streamLastEventId });
+    const source = new EventSource(`${API_BASE_URL}/cells/stream?${query}`);
+    this.streamSource = source;
+    // Ghi nhớ id event cuối để lần kết nối sau nối tiếp được
+    const read = <T>(event: Event): T => {
+      const message = event as MessageEvent;
+      if (message.lastEventId) this.streamLastEventId = message.lastEventId;
+      return JSON.parse(message.data) as T;
+    };
+
+    source.onopen = () => { this.streamRetryDelay = 3000; };
+    source.addEventListener('cell_status', (event) => {
+      const data = read<CellStatusEvent>(event);
+      this.streamHandlers.forEach(handlers => handlers.onCellStatus?.(data));
+    });
+    source.addEventListener('mqtt_status', (event) => {
+      const data = read<{ connected: boolean }>(event);
+      this.streamHandlers.forEach(handlers => handlers.onMqttStatus?.(data));
+    });
+    source.addEventListener('resync', (event) => {
+      read<unknown>(event);
+      this.streamHandlers.forEach(handlers => handlers.onResync?.());
+    });
+    // Server đóng stream định kỳ / token hết hạn / worker đầy (503): tự kết nối lại với token mới,
+    // gửi last_event_id để server phát lại event bị lỡ
+    source.onerror = (event) => {
+      this.streamHandlers.forEach(handlers => handlers.onError?.(event));
+      source.close();
+      if (this.streamSource === source) this.streamSource = null;
+      this.scheduleCellStreamReconnect();
+    };
+  }
+
+  // MQTT API
+  async getMqttStatus(): Promise<MQTTStatusInfo> {
+    const response = await fetch(`${API_BASE_URL}/mqtt/status`, {
       headers: this.getHeaders()
     });
-    return this.handleResponse<{ message: string }>(response);
+    return this.handleResponse<MQTTStatusInfo>(response);
   }
 
   // Borrowings API
@@ -321,6 +526,15 @@ class ApiService {
     return this.handleResponse<Borrowing[]>(response);
   }
 
+  // Phân trang keyset: truyền next_cursor của trang trước để lấy trang tiếp theo
+  async getBorrowingsPage(filters: BorrowingFilters = {}, limit = 100, cursor?: string | null): Promise<Page<Borrowing>> {
+    const query = toQuery({ ...filters, limit, cursor });
+    const response = await fetch(`${API_BASE_URL}/borrowings?${query}`, {
+      headers: this.getHeaders()
+    });
+    return this.handleResponse<Page<Borrowing>>(response);
+  }
+
   async getBorrowing(id: number): Promise<Borrowing> {
     const response = await fetch(`${API_BASE_URL}/borrowings/${id}`, {
       headers: this.getHeaders()
@@ -349,6 +563,33 @@ class ApiService {
     return this.handleResponse<Borrowing>(response);
   }
 
+  async createBorrowingsBulk(data: {
+    item_ids: number[];
+    expected_return_at: string;
+    note?: string;
+    open_cells?: boolean;
+  }): Promise<BulkResponse> {
+    return this.idempotent(`borrow-bulk:${[...data.item_ids].sort().join(',')}`, async (key) => {
+      const response = await fetch(`${API_BASE_URL}/borrowings/bulk`, {
+        method: 'POST',
+        headers: { ...this.getHeaders(), 'Idempotency-Key': key },
+        body: JSON.stringify(data)
+      });
+      return this.handleResponse<BulkResponse>(response);
+    });
+  }
+
+  async returnBorrowingsBulk(borrowingIds: number[], openCells = true): Promise<BulkResponse> {
+    return this.idempotent(`return-bulk:${[...borrowingIds].sort().join(',')}`, async (key) => {
+      const response = await fetch(`${API_BASE_URL}/borrowings/bulk/return`, {
+        method: 'PATCH',
+        headers: { ...this.getHeaders(), 'Idempotency-Key': key },
+        body: JSON.stringify({ borrowing_ids: borrowingIds, open_cells: openCells })
+      });
+      return this.handleResponse<BulkResponse>(response);
+    });
+  }
+
   // Cell Events API
   async getCellEvents(): Promise<CellEvent[]> {
     const response = await fetch(`${API_BASE_URL}/cell-events`, {
@@ -357,6 +598,14 @@ class ApiService {
     return this.handleResponse<CellEvent[]>(response);
   }
 
+  async getCellEventsPage(filters: CellEventFilters = {}, limit = 100, cursor?: string | null): Promise<Page<CellEvent>> {
+    const query = toQuery({ ...filters, limit, cursor });
+    const response = await fetch(`${API_BASE_URL}/cell-events?${query}`, {
+      headers: this.getHeaders()
+    });
+    return this.handleResponse<Page<CellEvent>>(response);
+  }
+
   async getCellEvent(id: number): Promise<CellEvent> {
     const response = await fetch(`${API_BASE_URL}/cell-events/${id}`, {
       headers: this.getHeaders()
@@ -371,6 +620,13 @@ class ApiService {
     });
     return this.handleResponse<DashboardStats>(response);
   }
+
+  async getActivityCounts(): Promise<ActivityCounts> {
+    const response = await fetch(`${API_BASE_URL}/dashboard/activity-counts`, {
+      headers: this.getHeaders()
+    });
+    return this.handleResponse<ActivityCounts>(response);
+  }
 }
 
 export default new ApiService();
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_jwt_extended import JWTManager
 from app.extensions import db, migrate
 from app.routes.user_route import user_bp
@@ -7,13 +7,21 @@ from app.routes.item_route import item_bp
 from app.routes.cell_event_route import cell_event_bp
 from app.routes.borrowings_route import borrowings_bp
 from app.routes.dashboard_route import dashboard_bp
+from app.routes.mqtt_route import mqtt_bp
 from app.auth.auth_route import auth_bp
 from flask_cors import CORS
+from app.utils.log_config import setup_logging
+from app.utils.metrics import metrics, install_metrics, scrape_authorized, CONTENT_TYPE
+from app.utils.compression import response_compressor
+from app.utils.query_profiler import query_profiler
+import click
 import os
 from datetime import timedelta
 
 def create_app():
     app = Flask(__name__)
+    # Logging qua hàng đợi + listener riêng (xoay file, sampling) trước khi khởi tạo service
+    setup_logging(app)
     app.config.from_object('config.Config')
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
     CORS(app, origins=['*'], supports_credentials=True)
@@ -29,6 +37,23 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Nén gzip/br theo Accept-Encoding (đăng ký trước để chạy sau mọi after_request khác)
+    response_compressor.install(app)
+
+    # Metric độ trễ request theo blueprint và số câu SQL / request
+    with app.app_context():
+        install_metrics(app, db.engine)
+    # Profiler SQL theo request (chỉ khi QUERY_PROFILER_ENABLED=true)
+    query_profiler.install(app)
+
+    # Warm cell state cache from the cells table
+    with app.app_context():
+        try:
+            from app.services.cell_state_cache import cell_state_cache
+            cell_state_cache.warm()
+        except Exception as e:
+            app.logger.warning(f"Cell state cache not warmed: {e}")
+
     # Initialize MQTT service
     with app.app_context():
         try:
@@ -39,6 +64,22 @@ def create_app():
         except Exception as e:
             app.logger.error(f"Failed to initialize MQTT service: {e}")
 
+    # Scheduler chuyển borrowing quá hạn sang overdue
+    from app.services.overdue_service import overdue_scheduler
+    overdue_scheduler.start(app)
+
+    @app.cli.command('overdue-scan')
+    @click.option('--loop', is_flag=True, help='Chạy liên tục thay vì quét một lần')
+    def overdue_scan(loop):
+        """Chuyển các borrowing quá hạn sang overdue (có thể chạy như worker riêng)"""
+        if loop:
+            overdue_scheduler.enabled = True
+            overdue_scheduler.start(app)
+            overdue_scheduler._thread.join()
+            return
+        flipped = overdue_scheduler.run_once()
+        click.echo(f"{len(flipped)} borrowings marked overdue")
+
     # Register blueprints
     app.register_blueprint(user_bp)
     app.register_blueprint(cell_bp)
@@ -47,6 +88,16 @@ def create_app():
     app.register_blueprint(cell_event_bp)
     app.register_blueprint(borrowings_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(mqtt_bp)
+
+    # Prometheus scrape endpoint (metric của process worker hiện tại)
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        if not metrics.enabled:
+            return jsonify({"error": "Not found"}), 404
+        if not scrape_authorized():
+            return jsonify({"error": "Unauthorized"}), 401
+        return Response(metrics.render(), mimetype=CONTENT_TYPE)
 
     # Error handlers
     @app.errorhandler(404)
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from app.schemas.user_schema import UserSchema
 from app.auth.auth_service import AuthService
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from app.services.user_cache import user_cache
+from app.utils.token_helper import build_token_claims
 
 auth_bp = Blueprint('auth_bp', __name__)
 user_schema = UserSchema()
@@ -16,8 +18,8 @@ def login():
     user = AuthService.login(data['username'], data['password'])
     if not user:
         return jsonify({"error": "Invalid username or password"}), 401
-    # Thêm role vào JWT claims
-    access_token = create_access_token(identity=str(user.id), additional_claims={"role": user.role.value})
+    # Thêm role và version stamp của user vào JWT claims
+    access_token = create_access_token(identity=str(user.id), additional_claims=build_token_claims(user))
     refresh_token = create_refresh_token(identity=str(user.id))
     user_info = {
         "id": user.id,
@@ -50,14 +52,13 @@ def register():
 @jwt_required(refresh=True)
 def refresh():
     current_user_id = get_jwt_identity()
-    # Get user from database to include role in new token
-    from app.services.user_service import UserService
-    user = UserService.get_user_by_id(int(current_user_id))
+    # Lấy role hiện tại từ user_cache (chỉ query DB khi cache miss)
+    user = user_cache.get(current_user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
     new_access_token = create_access_token(
         identity=str(user.id), 
-        additional_claims={"role": user.role.value}
+        additional_claims=build_token_claims(user)
     )
     return jsonify({"access_token": new_access_token}), 200
@@ -1 +1,2 @@
 from .item_access_model import ItemAccessModel  # noqa: F401
+from .idempotency_key_model import IdempotencyKeyModel  # noqa: F401
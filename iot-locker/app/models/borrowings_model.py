@@ -8,6 +8,9 @@ class BorrowStatus(enum.Enum):
     returned = "returned"
     overdue = "overdue"
 
+# Borrowing chưa trả: đang mượn hoặc đã bị scheduler chuyển sang quá hạn
+ACTIVE_STATUSES = (BorrowStatus.borrowing, BorrowStatus.overdue)
+
 class BorrowingModel(db.Model):
     __tablename__ = "borrowings"
 
@@ -22,6 +25,16 @@ class BorrowingModel(db.Model):
     created_at = db.Column(db.DateTime, server_default=vn_func_now())
     updated_at = db.Column(db.DateTime, server_default=vn_func_now(), onupdate=vn_func_now())
 
+    # Index cho phân trang keyset (borrowed_at, id) và các bộ lọc theo user/item/status
+    __table_args__ = (
+        db.Index('ix_borrowings_borrowed_at_id', 'borrowed_at', 'id'),
+        db.Index('ix_borrowings_user_borrowed_at_id', 'user_id', 'borrowed_at', 'id'),
+        db.Index('ix_borrowings_item_borrowed_at_id', 'item_id', 'borrowed_at', 'id'),
+        db.Index('ix_borrowings_status_borrowed_at_id', 'status', 'borrowed_at', 'id'),
+        # Quét borrowing đến hạn của OverdueScheduler
+        db.Index('ix_borrowings_status_expected_return_at', 'status', 'expected_return_at'),
+    )
+
     # Relationships
     user = db.relationship('UserModel', backref='borrowings')
     item = db.relationship('ItemModel', backref='borrowings')
\ No newline at end of file
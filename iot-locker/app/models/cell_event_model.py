@@ -16,6 +16,13 @@ class CellEventModel(db.Model):
     event_type = db.Column(db.Enum(LockerEventType), nullable=False)
     timestamp = db.Column(db.DateTime, server_default=vn_func_now(), nullable=False)
 
+    # Index cho phân trang keyset (timestamp, id) và các bộ lọc theo cell/user
+    __table_args__ = (
+        db.Index('ix_cells_events_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_cells_events_locker_timestamp_id', 'locker_id', 'timestamp', 'id'),
+        db.Index('ix_cells_events_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
+
     # Relationships
     user = db.relationship('UserModel', backref='cell_events')
     cell = db.relationship('CellModel', backref='events')
\ No newline at end of file
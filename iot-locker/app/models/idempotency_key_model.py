@@ -0,0 +1,27 @@
+from app.extensions import db
+
+
+class IdempotencyKeyModel(db.Model):
+    """
+    Response đã lưu của request ghi có header Idempotency-Key, dùng chung cho mọi worker.
+    status_code NULL: request đầu tiên vẫn đang xử lý.
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    idem_key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.LargeBinary(length=16777215), nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Một key chỉ thuộc về một user + endpoint: INSERT trùng báo IntegrityError -> request lặp lại
+        db.UniqueConstraint('user_id', 'method', 'path', 'idem_key', name='uq_idempotency_user_method_path_key'),
+        # Dọn key hết hạn theo created_at
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
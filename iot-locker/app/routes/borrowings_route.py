@@ -1,15 +1,29 @@
 from flask import Blueprint, request, jsonify
-from app.schemas.borrowings_schema import BorrowingSchema
-from app.services.borrowings_service import BorrowingsService
+from marshmallow import ValidationError
+from app.schemas.borrowings_schema import BorrowingSchema, BulkBorrowSchema, BulkReturnSchema
+from app.schemas.projection import SchemaProjection, fields_arg
+from app.models.borrowings_model import BorrowingModel
+from app.services.borrowings_service import BorrowingsService, contention_stats
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from app.utils.role_required import role_required
+from app.utils.idempotency import idempotent, idempotency_cache
+from app.utils.pagination import (
+    PaginationError, wants_page, parse_limit, parse_int_arg, parse_datetime_arg
+)
+from app.services.export_service import ExportService
+from app.utils.export_response import export_format, streaming_export_response
 
 borrowings_bp = Blueprint('borrowings_bp', __name__)
 borrowing_schema = BorrowingSchema()
 borrowings_schema = BorrowingSchema(many=True)
+bulk_borrow_schema = BulkBorrowSchema()
+# Dump danh sách theo cột (cùng output với borrowings_schema)
+borrowings_projection = SchemaProjection(BorrowingSchema, BorrowingModel, keys=('borrowed_at', 'id'))
+bulk_return_schema = BulkReturnSchema()
 
 @borrowings_bp.route('/borrowings', methods=['POST'])
 @jwt_required()
+@idempotent
 def borrow_item():
     data = request.get_json()
     user_id_str = get_jwt_identity()  # JWT identity is user id as string
@@ -34,18 +48,127 @@ def borrow_item():
 
 @borrowings_bp.route('/borrowings/<int:borrowing_id>/return', methods=['PATCH'])
 @jwt_required()
+@idempotent
 def return_item(borrowing_id):
     borrowing, error = BorrowingsService.return_item(borrowing_id)
     if error:
         return jsonify({"error": error}), 400
     return borrowing_schema.dump(borrowing), 200
 
+def _current_user_id():
+    try:
+        return int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return None
+
+def _bulk_response(results, cell_ids, open_cells):
+    """Kết quả từng phần tử; 201/200 nếu có ít nhất một phần tử thành công, ngược lại 400"""
+    succeeded = 0
+    for result in results:
+        if "borrowing" in result:
+            result["borrowing"] = borrowing_schema.dump(result["borrowing"])
+            succeeded += 1
+    body = {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+    if open_cells and cell_ids:
+        body["cells"] = BorrowingsService.open_cells(cell_ids, get_jwt_identity())
+    return body, succeeded
+
+@borrowings_bp.route('/borrowings/bulk', methods=['POST'])
+@jwt_required()
+@idempotent
+def borrow_items():
+    """Mượn nhiều item cho user hiện tại trong một request; lỗi được báo theo từng item"""
+    try:
+        data = bulk_borrow_schema.load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"error": e.messages}), 400
+    results, cell_ids, error = BorrowingsService.borrow_items(
+        user_id=_current_user_id(),
+        item_ids=data['item_ids'],
+        expected_return_at=data['expected_return_at'],
+        note=data.get('note')
+    )
+    if error:
+        return jsonify({"error": error}), 400
+    body, succeeded = _bulk_response(results, cell_ids, data['open_cells'])
+    return body, 201 if succeeded else 400
+
+@borrowings_bp.route('/borrowings/bulk/return', methods=['PATCH'])
+@jwt_required()
+@idempotent
+def return_items():
+    """Trả nhiều borrowing trong một request; lỗi được báo theo từng borrowing"""
+    try:
+        data = bulk_return_schema.load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"error": e.messages}), 400
+    results, cell_ids = BorrowingsService.return_items(data['borrowing_ids'])
+    body, succeeded = _bulk_response(results, cell_ids, data['open_cells'])
+    return body, 200 if succeeded else 400
+
+def _borrowing_filters(args):
+    return {
+        "cell_id": parse_int_arg(args, 'cell_id'),
+        "user_id": parse_int_arg(args, 'user_id'),
+        "item_id": parse_int_arg(args, 'item_id'),
+        "status": args.get('status') or None,
+        "since": parse_datetime_arg(args, 'since'),
+        "until": parse_datetime_arg(args, 'until'),
+    }
+
 @borrowings_bp.route('/borrowings', methods=['GET'])
 @jwt_required()
 @role_required('admin')
 def get_all_borrowings():
-    borrowings = BorrowingsService.get_all_borrowings()
-    return jsonify(borrowings_schema.dump(borrowings)), 200
+    """
+    Lọc theo ?cell_id=&user_id=&item_id=&status=&since=&until= (theo borrowed_at).
+    Có ?limit= hoặc ?cursor= thì trả về một trang {items, next_cursor}.
+    ?fields=id,status,item.name chỉ trả về (và chỉ SELECT) các field đó.
+    """
+    try:
+        projection = borrowings_projection.only(fields_arg(request.args))
+        filters = _borrowing_filters(request.args)
+        if not wants_page(request.args):
+            rows = BorrowingsService.get_borrowings(projection, **filters)
+            return jsonify(projection.dump(rows)), 200
+        limit = parse_limit(request.args)
+        rows, next_cursor = BorrowingsService.get_borrowings_page(
+            limit, request.args.get('cursor'), projection, **filters
+        )
+    except (PaginationError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "items": projection.dump(rows),
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }), 200
+
+# Xuất toàn bộ lịch sử mượn/trả (NDJSON/CSV, ?gzip=1), cùng bộ lọc với /borrowings
+@borrowings_bp.route('/borrowings/export', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def export_borrowings():
+    fmt = export_format()
+    if not fmt:
+        return jsonify({"error": "Unsupported format"}), 400
+    try:
+        filters = _borrowing_filters(request.args)
+        chunks = ExportService.export_borrowings(fmt, **filters)
+    except (PaginationError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return streaming_export_response(chunks, fmt, 'borrowings')
+
+@borrowings_bp.route('/borrowings/idempotency/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_idempotency_stats():
+    return idempotency_cache.get_stats(), 200
+
+@borrowings_bp.route('/borrowings/contention/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_contention_stats():
+    return contention_stats.get_stats(), 200
 
 @borrowings_bp.route('/borrowings/my-active', methods=['GET'])
 @jwt_required()
@@ -2,12 +2,21 @@
 from flask import Blueprint, request, jsonify
 from app.services.cell_event_service import CellEventService
 from app.schemas.cell_event_schema import CellEventSchema
+from app.schemas.projection import SchemaProjection, fields_arg
+from app.models.cell_event_model import CellEventModel
 from flask_jwt_extended import jwt_required, get_jwt
 from app.utils.role_required import role_required
+from app.utils.pagination import (
+    PaginationError, wants_page, parse_limit, parse_int_arg, parse_datetime_arg
+)
+from app.services.export_service import ExportService
+from app.utils.export_response import export_format, streaming_export_response
 
 cell_event_bp = Blueprint('cell_event', __name__)
 cell_event_schema = CellEventSchema()
 cell_events_schema = CellEventSchema(many=True)
+# Dump danh sách theo cột (cùng output với cell_events_schema)
+cell_events_projection = SchemaProjection(CellEventSchema, CellEventModel, keys=('timestamp', 'id'))
 
 # Ghi event (open/close) cho cell
 
@@ -15,12 +24,53 @@ cell_events_schema = CellEventSchema(many=True)
 # @jwt_required()
 
 
-# Lấy tất cả events
+def _event_filters(args):
+    return {
+        "cell_id": parse_int_arg(args, 'cell_id'),
+        "user_id": parse_int_arg(args, 'user_id'),
+        "event_type": args.get('event_type') or None,
+        "since": parse_datetime_arg(args, 'since'),
+        "until": parse_datetime_arg(args, 'until'),
+    }
+
+# Lấy events, lọc theo ?cell_id=&user_id=&event_type=&since=&until=
+# Có ?limit= hoặc ?cursor= thì trả về một trang {items, next_cursor}
+# ?fields=id,event_type,timestamp chỉ trả về (và chỉ SELECT) các field đó
 @cell_event_bp.route('/cell-events', methods=['GET'])
 @jwt_required()
 def get_all_events():
-    events = CellEventService.get_all_events()
-    return jsonify(cell_events_schema.dump(events)), 200
+    try:
+        projection = cell_events_projection.only(fields_arg(request.args))
+        filters = _event_filters(request.args)
+        if not wants_page(request.args):
+            rows = CellEventService.get_events(projection, **filters)
+            return jsonify(projection.dump(rows)), 200
+        limit = parse_limit(request.args)
+        rows, next_cursor = CellEventService.get_events_page(
+            limit, request.args.get('cursor'), projection, **filters
+        )
+    except (PaginationError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "items": projection.dump(rows),
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }), 200
+
+# Xuất toàn bộ lịch sử events (NDJSON/CSV, ?gzip=1), cùng bộ lọc với /cell-events
+@cell_event_bp.route('/cell-events/export', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def export_events():
+    fmt = export_format()
+    if not fmt:
+        return jsonify({"error": "Unsupported format"}), 400
+    try:
+        filters = _event_filters(request.args)
+        chunks = ExportService.export_events(fmt, **filters)
+    except (PaginationError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return streaming_export_response(chunks, fmt, 'cell_events')
 
 # Lấy log event theo cell
 @cell_event_bp.route('/cells/<int:cell_id>/events', methods=['GET'])
@@ -1,19 +1,90 @@
 # app/routes/cell_route.py
-from flask_jwt_extended import jwt_required, get_jwt
-from flask import Blueprint, request, jsonify
+import os
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
+from flask import Blueprint, request, jsonify, Response
 from app.schemas.cell_schema import CellSchema
+from app.schemas.projection import SchemaProjection, fields_arg
+from app.models.cell_model import CellModel
 from app.services.cell_service import CellService
+from app.services.cell_state_cache import cell_state_cache
+from app.services.command_ack_service import command_ack_tracker
+from app.services.cell_stream_service import cell_stream_broker
 from app.utils.role_required import role_required
+from app.utils.token_helper import create_stream_token, verify_stream_token
+from app.utils.idempotency import idempotent
+from app.utils.conditional import conditional_get
 
 cell_bp = Blueprint('cells', __name__)
 cell_schema = CellSchema()
 cells_schema = CellSchema(many=True)
+# Dump danh sách theo cột (cùng output với cells_schema)
+cells_projection = SchemaProjection(CellSchema, CellModel)
+# Thời hạn (giây) của token ?token= cho /cells/stream, chỉ cần đủ để mở kết nối
+CELL_STREAM_TOKEN_TTL = int(os.getenv('CELL_STREAM_TOKEN_TTL', 60))
 
 @cell_bp.route('/cells', methods=['GET'])
 @jwt_required()
+@conditional_get('cells')
 def get_cells():
-    cells = CellService.get_all_cells()
-    return cells_schema.dump(cells), 200
+    """?fields=id,status chỉ trả về (và chỉ SELECT) các field đó"""
+    try:
+        projection = cells_projection.only(fields_arg(request.args))
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    rows = CellService.get_all_cells(projection)
+    return projection.dump(rows), 200
+
+@cell_bp.route('/cells/cache/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_cell_cache_stats():
+    return cell_state_cache.get_stats(), 200
+
+@cell_bp.route('/cells/stream/token', methods=['POST'])
+@jwt_required()
+def issue_stream_token():
+    """Token ngắn hạn chỉ dùng để mở /cells/stream (không đưa access token lên URL)"""
+    return {"token": create_stream_token(get_jwt_identity()), "expires_in": CELL_STREAM_TOKEN_TTL}, 200
+
+@cell_bp.route('/cells/stream', methods=['GET'])
+def stream_cells():
+    """
+    Server-Sent Events: đẩy thay đổi trạng thái cell thay cho polling GET /cells.
+    EventSource không gửi được header nên dùng ?token=<token từ POST /cells/stream/token>;
+    client khác có thể gửi Authorization header như bình thường.
+    Kết nối lại với header Last-Event-ID (hoặc ?last_event_id=) để nhận tiếp event bị lỡ.
+    Worker đã đủ stream -> 503 + Retry-After.
+    """
+    stream_token = request.args.get('token')
+    if stream_token:
+        if verify_stream_token(stream_token, CELL_STREAM_TOKEN_TTL) is None:
+            return {"message": "Invalid or expired stream token"}, 401
+    else:
+        verify_jwt_in_request()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = cell_stream_broker.subscribe(last_event_id)
+    if subscription is None:
+        response = jsonify({"message": "Too many open streams, retry later"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    response = Response(
+        cell_stream_broker.stream(subscription),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+    # Client ngắt trước khi generator chạy thì finally của stream() không chạy
+    response.call_on_close(lambda: cell_stream_broker.unsubscribe(subscription))
+    return response
+
+@cell_bp.route('/cells/stream/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_cell_stream_stats():
+    return cell_stream_broker.get_stats(), 200
 
 @cell_bp.route('/cells/<int:cell_id>', methods=['GET'])
 @jwt_required()
@@ -61,36 +132,74 @@ def delete_cell(cell_id):
         return {"message": "Cell not found"}, 404
     return {"message": "Cell deleted"}, 200
     
+def _wait_ack_args():
+    """Đọc tham số ?wait_ack=1&timeout=<giây> để chờ ESP32 xác nhận lệnh"""
+    wait_ack = request.args.get('wait_ack', '').lower() in ('1', 'true', 'yes')
+    timeout = request.args.get('timeout', type=float)
+    return wait_ack, timeout
+
+def _command_response(cell_id, result, action, status):
+    body = {
+        "message": f"Cell {cell_id} {action} successfully",
+        "status": status,
+        "correlation_id": result["correlation_id"],
+    }
+    if result["acked"] is None:
+        return body, 200
+    body["acked"] = result["acked"]
+    body["ack_latency_ms"] = result["latency_ms"]
+    if not result["acked"]:
+        body["message"] = f"Cell {cell_id} did not acknowledge the command in time"
+        return body, 504
+    return body, 200
+
 @cell_bp.route('/cells/<int:cell_id>/open', methods=['POST'])
 @jwt_required()
+@idempotent
 def open_cell(cell_id):
     """API endpoint để mở cell qua MQTT"""
     claims = get_jwt()
     user_id = claims.get('sub')
+    wait_ack, timeout = _wait_ack_args()
     
     try:
-        result = CellService.open_cell(cell_id, user_id)
+        result = CellService.open_cell(cell_id, user_id, wait_ack=wait_ack, ack_timeout=timeout)
         if not result:
             return {"message": "Cell not found or already open"}, 404
-        return {"message": f"Cell {cell_id} opened successfully", "status": "open"}, 200
+        return _command_response(cell_id, result, "opened", "open")
     except Exception as e:
         return {"message": str(e)}, 400
 
 @cell_bp.route('/cells/<int:cell_id>/close', methods=['POST'])
 @jwt_required()
+@idempotent
 def close_cell(cell_id):
     """API endpoint để đóng cell qua MQTT"""
     claims = get_jwt()
     user_id = claims.get('sub')
+    wait_ack, timeout = _wait_ack_args()
     
     try:
-        result = CellService.close_cell(cell_id, user_id)
+        result = CellService.close_cell(cell_id, user_id, wait_ack=wait_ack, ack_timeout=timeout)
         if not result:
             return {"message": "Cell not found or already closed"}, 404
-        return {"message": f"Cell {cell_id} closed successfully", "status": "closed"}, 200
+        return _command_response(cell_id, result, "closed", "closed")
     except Exception as e:
         return {"message": str(e)}, 400
 
+@cell_bp.route('/cells/ack-stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_ack_stats():
+    """Histogram độ trễ command -> ack của tất cả cell"""
+    return command_ack_tracker.get_stats(), 200
+
+@cell_bp.route('/cells/<int:cell_id>/ack-stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_cell_ack_stats(cell_id):
+    return command_ack_tracker.get_stats(cell_id), 200
+
 @cell_bp.route('/cells/<int:cell_id>/borrowings', methods=['GET'])
 @jwt_required()
 def get_cell_borrowings(cell_id):
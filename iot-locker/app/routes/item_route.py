@@ -4,12 +4,18 @@ from app.schemas.item_schema import ItemSchema
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from app.utils.role_required import role_required
 from app.services.item_access_service import ItemAccessService
+from app.services.item_access_index import item_access_index
 from app.schemas.user_schema import UserSchema
+from app.schemas.projection import SchemaProjection, fields_arg
+from app.models.item_model import ItemModel
+from app.utils.conditional import conditional_get
 
 item_bp = Blueprint('item', __name__)
 item_schema = ItemSchema()
 items_schema = ItemSchema(many=True)
 users_schema = UserSchema(many=True)
+# Dump danh sách theo cột (cùng output với items_schema)
+items_projection = SchemaProjection(ItemSchema, ItemModel)
 
 
 
@@ -28,9 +34,15 @@ def create_item():
 
 @item_bp.route('/items', methods=['GET'])
 @jwt_required()
+@conditional_get('items')
 def get_all_items():
-    items = ItemService.get_all_items()
-    return jsonify(items_schema.dump(items)), 200
+    """?fields=id,name,status chỉ trả về (và chỉ SELECT) các field đó"""
+    try:
+        projection = items_projection.only(fields_arg(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = ItemService.get_all_items(projection)
+    return jsonify(projection.dump(rows)), 200
 
 @item_bp.route('/items/<int:item_id>', methods=['GET'])
 @jwt_required()
@@ -66,11 +78,18 @@ def delete_item(item_id):
 
 @item_bp.route('/items/cell/<int:cell_id>', methods=['GET'])
 @jwt_required()
+@conditional_get('items')
 def get_items_by_cell(cell_id):
     items = ItemService.get_all_items()
     filtered = [item for item in items if item.cell_id == cell_id]
     return jsonify(items_schema.dump(filtered)), 200
 
+@item_bp.route('/items/access/index/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_item_access_index_stats():
+    return jsonify(item_access_index.get_stats()), 200
+
 @item_bp.route('/items/<int:item_id>/access', methods=['GET'])
 @jwt_required()
 def get_item_access(item_id):
@@ -89,13 +108,8 @@ def check_item_access(item_id):
     except (TypeError, ValueError):
         return jsonify({'error': 'Invalid user ID in token'}), 401
     
-    users = ItemAccessService.list_users_for_item(item_id)
-    # If no access restrictions, everyone can access
-    if not users:
-        return jsonify({'has_access': True}), 200
-    
-    # Check if user is in access list
-    has_access = any(user.id == user_id for user in users)
+    # Item không giới hạn hoặc user nằm trong danh sách (tra trong chỉ mục, không query)
+    has_access = ItemAccessService.has_access(item_id, user_id)
     return jsonify({'has_access': has_access}), 200
 
 @item_bp.route('/items/my-accessible', methods=['GET'])
@@ -110,15 +124,7 @@ def get_my_accessible_items():
     except (TypeError, ValueError):
         return jsonify({'error': 'Invalid user ID in token'}), 401
     
-    all_items = ItemService.get_all_items()
-    accessible_items = []
-    
-    for item in all_items:
-        users = ItemAccessService.list_users_for_item(item.id)
-        # If no access restrictions, everyone can access
-        if not users or any(user.id == user_id for user in users):
-            accessible_items.append(item)
-    
+    accessible_items = ItemAccessService.list_accessible_items(user_id)
     return jsonify(items_schema.dump(accessible_items)), 200
 
 @item_bp.route('/items/<int:item_id>/access', methods=['PUT'])
@@ -133,6 +139,30 @@ def set_item_access(item_id):
     users = ItemAccessService.list_users_for_item(item_id)
     return jsonify(users_schema.dump(users)), 200
 
+@item_bp.route('/items/access', methods=['PUT'])
+@jwt_required()
+@role_required('admin')
+def set_items_access():
+    """Đặt cùng một danh sách user cho nhiều item: {"item_ids": [...], "user_ids": [...]}"""
+    data = request.get_json() or {}
+    ok, err, summary = ItemAccessService.set_items_access(data.get('item_ids', []), data.get('user_ids', []))
+    if not ok:
+        return jsonify({'error': err or 'Unable to set access'}), 400
+    return jsonify(summary), 200
+
+@item_bp.route('/items/<int:item_id>/access/copy', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def copy_item_access(item_id):
+    """Chép quyền của item sang {"item_ids": [...]} và/hoặc mọi item trong {"cell_id": ...}"""
+    data = request.get_json() or {}
+    if not data.get('item_ids') and data.get('cell_id') is None:
+        return jsonify({'error': 'item_ids or cell_id is required'}), 400
+    ok, err, summary = ItemAccessService.copy_item_access(item_id, data.get('item_ids'), data.get('cell_id'))
+    if not ok:
+        return jsonify({'error': err or 'Unable to copy access'}), 400
+    return jsonify(summary), 200
+
 @item_bp.route('/items/<int:item_id>/access/<int:user_id>', methods=['POST'])
 @jwt_required()
 @role_required('admin')
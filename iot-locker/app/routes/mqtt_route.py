@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.mqtt_service import mqtt_service
+from app.services.command_ack_service import command_ack_tracker
+
+mqtt_bp = Blueprint('mqtt', __name__)
+
+# Trạng thái kết nối broker + độ sâu hàng đợi ingest và độ trễ xử lý batch
+@mqtt_bp.route('/mqtt/status', methods=['GET'])
+@jwt_required()
+def get_mqtt_status():
+    return jsonify(mqtt_service.get_stats()), 200
+
+# Tra cứu trạng thái ack của một lệnh theo correlation_id
+@mqtt_bp.route('/mqtt/commands/<correlation_id>', methods=['GET'])
+@jwt_required()
+def get_command(correlation_id):
+    command = command_ack_tracker.get_command(correlation_id)
+    if not command:
+        return jsonify({"error": "Command not found"}), 404
+    return jsonify(command), 200
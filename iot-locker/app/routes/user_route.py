@@ -5,6 +5,7 @@ from app.services.user_service import UserService
 from app.auth.auth_service import AuthService
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.utils.role_required import role_required
+from app.utils.conditional import conditional_get
 
 user_bp = Blueprint('user_bp', __name__)
 user_schema = UserSchema()
@@ -31,6 +32,7 @@ def create_user_route():
 
 @user_bp.route('/users', methods=['GET'])
 @jwt_required()
+@conditional_get('users')
 def get_users():
     users = UserService.get_all_users()
     return users_schema.dump(users), 200
@@ -1,4 +1,5 @@
-from marshmallow import Schema, fields
+import os
+from marshmallow import Schema, fields, validate
 from marshmallow_enum import EnumField
 from app.models.borrowings_model import BorrowStatus
 
@@ -27,4 +28,17 @@ class BorrowingSchema(Schema):
     
     # Nested relationships
     user = fields.Nested(UserNestedSchema, dump_only=True)
-    item = fields.Nested(ItemNestedSchema, dump_only=True)
\ No newline at end of file
+    item = fields.Nested(ItemNestedSchema, dump_only=True)
+
+BULK_MAX_ITEMS = int(os.getenv('BULK_BORROW_MAX_ITEMS', 50))
+
+class BulkBorrowSchema(Schema):
+    item_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=BULK_MAX_ITEMS))
+    expected_return_at = fields.DateTime(required=True)
+    note = fields.Str(allow_none=True)
+    # Gửi lệnh mở các cell chứa item (mỗi cell một lần) sau khi mượn
+    open_cells = fields.Bool(load_default=True)
+
+class BulkReturnSchema(Schema):
+    borrowing_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=BULK_MAX_ITEMS))
+    open_cells = fields.Bool(load_default=True)
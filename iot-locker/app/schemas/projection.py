@@ -0,0 +1,195 @@
+import threading
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from marshmallow import fields
+from marshmallow_enum import EnumField, LoadDumpOptions
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import aliased
+from app.extensions import db
+
+# Số tổ hợp ?fields= khác nhau được giữ bản biên dịch cho mỗi projection
+MAX_CACHED_VARIANTS = 64
+
+
+def fields_arg(args) -> Optional[Tuple[str, ...]]:
+    """?fields=id,name,user.full_name -> ('id', 'name', 'user.full_name'); không có -> None"""
+    value = args.get('fields')
+    if not value:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    return names or None
+
+
+def _unknown_fields(schema, names: Iterable[str]) -> List[str]:
+    """Tên trong ?fields= không có trên schema (kể cả phần sau dấu chấm của field Nested)"""
+    unknown = []
+    for name in names:
+        head, _, rest = name.partition('.')
+        field = schema.fields.get(head)
+        if field is None or (rest and (not isinstance(field, fields.Nested) or _unknown_fields(field.schema, [rest]))):
+            unknown.append(name)
+    return unknown
+
+
+def _enum_lookup(field: EnumField) -> Callable[[Any], Any]:
+    """Bảng tra enum -> giá trị dump dựng sẵn một lần (thay cho EnumField._serialize từng dòng)"""
+    by_value = field.dump_by == LoadDumpOptions.value
+    lookup = {member: (member.value if by_value else member.name) for member in field.enum}
+    return lookup.__getitem__
+
+
+def _formatter(field: fields.Field, column) -> Optional[Callable[[Any], Any]]:
+    """Hàm format tương đương field._serialize, None nếu giá trị từ DB dùng được nguyên trạng"""
+    if isinstance(field, EnumField):
+        return _enum_lookup(field)
+    if isinstance(field, fields.DateTime):
+        if (field.format or field.DEFAULT_FORMAT) not in ('iso', 'iso8601'):
+            raise TypeError(f"Unsupported DateTime format for projection: {field.format}")
+        return datetime.isoformat
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if isinstance(field, fields.Integer):
+        return None if python_type is int else int
+    if isinstance(field, fields.String):
+        return None if python_type is str else str
+    if isinstance(field, fields.Boolean):
+        return None if python_type is bool else bool
+    raise TypeError(f"Unsupported field type for projection: {type(field).__name__}")
+
+
+def _row_builder(names: Tuple[str, ...], indexes: List[int], formatted: Tuple[Tuple[str, Callable], ...],
+                 nested: Tuple[Tuple[str, int, Callable], ...]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Hàm dựng dict cho một tầng schema, chuẩn bị một lần: itemgetter lấy mọi cột trong một lần gọi,
+    sau đó chỉ format các field cần format (bỏ qua None) và dựng các Nested
+    """
+    if len(indexes) == 1:
+        index = indexes[0]
+        getter = lambda r: (r[index],)  # noqa: E731 (itemgetter một index trả về giá trị, không phải tuple)
+    elif indexes:
+        getter = itemgetter(*indexes)
+    else:
+        getter = lambda r: ()  # noqa: E731
+
+    def row_to_dict(r) -> Dict[str, Any]:
+        result = dict(zip(names, getter(r)))
+        for name, formatter in formatted:
+            value = result[name]
+            if value is not None:
+                result[name] = formatter(value)
+        for name, key_index, build in nested:
+            result[name] = None if r[key_index] is None else build(r)
+        return result
+    return row_to_dict
+
+
+class SchemaProjection:
+    """
+    Thay cho Schema(many=True).dump(orm_objects) trên các endpoint danh sách: biên dịch schema
+    thành một câu SELECT chỉ lấy các cột cần dump (Nested -> LEFT JOIN bảng liên quan) và một hàm
+    dựng sẵn (itemgetter + danh sách formatter) chuyển mỗi tuple thành dict. Kết quả giống hệt
+    schema.dump: field không có cột trên model bị bỏ qua như marshmallow, Nested rỗng -> None,
+    enum/datetime format như EnumField/DateTime.
+    Biên dịch lười ở lần dùng đầu tiên (cần mapper đã cấu hình xong).
+    only: chỉ dump các field này (như Schema(only=...), hỗ trợ "user.full_name"), SELECT/JOIN thu hẹp theo.
+    keys: cột luôn được SELECT dù không dump (vd. khóa phân trang keyset), đọc qua getattr(row, key).
+    """
+
+    def __init__(self, schema_cls, model, only: Optional[Iterable[str]] = None, keys: Iterable[str] = ()):
+        self.schema_cls = schema_cls
+        self.model = model
+        self.only_fields = tuple(only) if only else None
+        self.keys = tuple(keys)
+        self._lock = threading.Lock()
+        self._compiled: Optional[Tuple[List, List, Callable]] = None
+        self._variants: Dict[frozenset, "SchemaProjection"] = {}
+
+    def only(self, names: Optional[Iterable[str]]) -> "SchemaProjection":
+        """Projection chỉ gồm các field names (sparse fieldset), ValueError nếu có field không tồn tại"""
+        if not names:
+            return self
+        key = frozenset(names)
+        with self._lock:
+            variant = self._variants.get(key)
+        if variant is not None:
+            return variant
+        # Kiểm tra trước khi đưa vào cache: tổ hợp field lạ không chiếm chỗ
+        unknown = _unknown_fields(self.schema_cls(), sorted(key))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        variant = SchemaProjection(self.schema_cls, self.model, only=sorted(key), keys=self.keys)
+        with self._lock:
+            if len(self._variants) < MAX_CACHED_VARIANTS:
+                variant = self._variants.setdefault(key, variant)
+        return variant
+
+    def _collect(self, schema, model, entity, prefix: str, columns: List, joins: List) -> Callable:
+        """Thêm cột/JOIN cho schema và trả về hàm dựng dict từ tuple r"""
+        mapper = sa_inspect(model)
+        names: List[str] = []
+        indexes: List[int] = []
+        formatted: List[Tuple[str, Callable]] = []
+        nested: List[Tuple[str, int, Callable]] = []
+        for name, field in schema.fields.items():
+            if field.load_only:
+                continue
+            attr = field.attribute or name
+            if isinstance(field, fields.Nested):
+                relationship = mapper.relationships.get(attr)
+                if relationship is None:
+                    raise TypeError(f"{model.__name__}.{attr} is not a relationship")
+                target = relationship.mapper.class_
+                alias = aliased(target)
+                joins.append(getattr(entity, attr).of_type(alias))
+                # Khóa chính của bảng liên quan để biết LEFT JOIN có khớp dòng nào không
+                key_index = len(columns)
+                columns.append(getattr(alias, sa_inspect(target).primary_key[0].key)
+                               .label(f"{prefix}{attr}__pk"))
+                # Giữ chỗ (đúng thứ tự field), ghi đè bằng dict lồng nhau hoặc None
+                names.append(name)
+                indexes.append(key_index)
+                nested.append((name, key_index,
+                               self._collect(field.schema, target, alias, f"{prefix}{attr}__", columns, joins)))
+                continue
+            if attr not in mapper.column_attrs:
+                if hasattr(model, attr):
+                    raise TypeError(f"{model.__name__}.{attr} is not a column")
+                continue  # marshmallow bỏ qua thuộc tính không tồn tại
+            column = getattr(entity, attr)
+            label = attr if not prefix else f"{prefix}{attr}"
+            names.append(name)
+            indexes.append(len(columns))
+            columns.append(column.label(label))
+            formatter = _formatter(field, mapper.column_attrs[attr].columns[0])
+            if formatter is not None:
+                formatted.append((name, formatter))
+        return _row_builder(tuple(names), indexes, tuple(formatted), tuple(nested))
+
+    def _compile(self):
+        with self._lock:
+            if self._compiled is not None:
+                return self._compiled
+            columns: List = []
+            joins: List = []
+            row_to_dict = self._collect(self.schema_cls(only=self.only_fields), self.model, self.model, '',
+                                        columns, joins)
+            selected = {column.name for column in columns}
+            columns.extend(getattr(self.model, key).label(key) for key in self.keys if key not in selected)
+            self._compiled = (columns, joins, row_to_dict)
+            return self._compiled
+
+    def query(self):
+        """Query (legacy Query API, dùng được với filter/order_by/keyset_page) trả về tuple đã chiếu"""
+        columns, joins, _ = self._compile()
+        query = db.session.query(*columns).select_from(self.model)
+        for join in joins:
+            query = query.outerjoin(join)
+        return query
+
+    def dump(self, rows) -> List[Dict[str, Any]]:
+        """Tuple từ query() -> list dict giống Schema(many=True).dump"""
+        row_to_dict = self._compile()[2]
+        return [row_to_dict(row) for row in rows]
@@ -1,14 +1,97 @@
+import os
+import time
+import random
+import threading
+import logging
+from typing import Any, Dict, List
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
 from app.extensions import db
-from app.models.borrowings_model import BorrowingModel, BorrowStatus
+from app.models.borrowings_model import BorrowingModel, BorrowStatus, ACTIVE_STATUSES
 from app.models.item_model import ItemModel, ItemStatus
-from app.models.user_model import UserModel
 from app.models.item_access_model import ItemAccessModel
+from app.models.user_model import UserModel
+from app.services.cell_service import CellService
+from app.services.item_access_service import ItemAccessService
+from app.services.dashboard_service import DashboardService
+from app.services.resource_versions import resource_versions
+from app.utils.pagination import keyset_page
 from datetime import datetime
 from app.utils.timezone_helper import get_vn_utc_now
 
+logger = logging.getLogger(__name__)
+
+# MySQL: 1205 lock wait timeout, 1213 deadlock -> transaction bị hủy, chạy lại được
+RETRYABLE_MYSQL_ERRORS = (1205, 1213)
+
+
+def _is_retryable(exc: OperationalError) -> bool:
+    args = getattr(exc.orig, 'args', ())
+    if args and args[0] in RETRYABLE_MYSQL_ERRORS:
+        return True
+    # SQLite (dev/test): ghi đồng thời trả về "database is locked"
+    return 'database is locked' in str(exc.orig)
+
+
+class ContentionStats:
+    """Bộ đếm tranh chấp khi mượn/trả (trong process), xem qua GET /borrowings/contention/stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "borrow_ok": 0,
+            "borrow_lost_race": 0,
+            "return_ok": 0,
+            "return_lost_race": 0,
+            "retries": 0,
+            "retry_exhausted": 0,
+        }
+
+    def incr(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters)
+
+
+contention_stats = ContentionStats()
+
+
+def run_with_retry(operation):
+    """
+    Chạy operation (tự commit) và chạy lại khi DB hủy transaction vì deadlock / lock wait timeout,
+    tối đa BORROW_MAX_RETRIES lần, backoff lũy thừa có jitter bắt đầu từ BORROW_RETRY_BACKOFF giây.
+    """
+    max_retries = int(os.getenv('BORROW_MAX_RETRIES', 3))
+    backoff = float(os.getenv('BORROW_RETRY_BACKOFF', 0.02))
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except OperationalError as exc:
+            db.session.rollback()
+            if not _is_retryable(exc):
+                raise
+            if attempt >= max_retries:
+                contention_stats.incr("retry_exhausted")
+                logger.warning(f"Giving up after {attempt} retries: {exc.orig}")
+                raise
+            attempt += 1
+            contention_stats.incr("retries")
+            time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+
 class BorrowingsService:
     @staticmethod
     def borrow_item(user_id, item_id, expected_return_at, note=None):
+        return run_with_retry(
+            lambda: BorrowingsService._borrow_item_once(user_id, item_id, expected_return_at, note)
+        )
+
+    @staticmethod
+    def _borrow_item_once(user_id, item_id, expected_return_at, note):
         # Kiểm tra user tồn tại
         user = UserModel.query.get(user_id)
         if not user:
@@ -19,14 +102,25 @@ class BorrowingsService:
             return None, {"error": "Item not found"}
         if item.status != ItemStatus.available:
             return None, {"error": "Item not available"}
-        # Kiểm tra quyền truy cập item: nếu item có cấu hình access thì user phải thuộc danh sách
-        access_rows = ItemAccessModel.query.filter_by(item_id=item_id).all()
-        if access_rows:
-            allowed_user_ids = {row.user_id for row in access_rows}
-            if user_id not in allowed_user_ids:
-                return None, {"error": "User doesn't have access to this item"}
-
-        # Tạo bản ghi borrowings
+        # Kiểm tra quyền truy cập item: nếu item có cấu hình access thì user phải thuộc danh sách.
+        # Đọc từ DB, không dùng item_access_index: chỉ mục của worker này có thể chưa thấy thu hồi quyền
+        if not ItemAccessService.has_access_db(item_id, user_id):
+            return None, {"error": "User doesn't have access to this item"}
+
+        # Giành item bằng một UPDATE có điều kiện: DB khóa dòng và kiểm tra lại status, nên khi
+        # nhiều kiosk mượn cùng lúc chỉ một request đổi được dòng (rowcount = 1), còn lại rowcount = 0
+        claimed = db.session.execute(
+            update(ItemModel)
+            .where(ItemModel.id == item_id, ItemModel.status == ItemStatus.available)
+            .values(status=ItemStatus.borrowing)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            db.session.rollback()
+            contention_stats.incr("borrow_lost_race")
+            return None, {"error": "Item not available"}
+
+        # Tạo bản ghi borrowings (cùng transaction với UPDATE, dòng item vẫn đang bị khóa)
         borrowing = BorrowingModel(
             user_id=user_id,
             item_id=item_id,
@@ -34,11 +128,193 @@ class BorrowingsService:
             status=BorrowStatus.borrowing,
             note=note
         )
-        item.status = ItemStatus.borrowing
         db.session.add(borrowing)
         db.session.commit()
+        contention_stats.incr("borrow_ok")
+        resource_versions.bump('items')
+        DashboardService.invalidate()
         return borrowing, None
 
+    @staticmethod
+    def borrow_items(user_id, item_ids, expected_return_at, note=None):
+        """
+        Mượn nhiều item trong một transaction. Kiểm tra bằng hai query theo tập (items khóa FOR UPDATE,
+        item_access của các item đó), giành từng item bằng UPDATE có điều kiện như borrow_item và
+        insert mọi borrowing rồi commit một lần.
+        Trả về (results, cell_ids, error): results theo đúng thứ tự item_ids, mỗi phần tử là
+        {"item_id", "borrowing"} hoặc {"item_id", "error"}; cell_ids là các cell chứa item đã mượn.
+        """
+        return run_with_retry(
+            lambda: BorrowingsService._borrow_items_once(user_id, item_ids, expected_return_at, note)
+        )
+
+    @staticmethod
+    def _borrow_items_once(user_id, item_ids, expected_return_at, note):
+        if not db.session.query(db.exists().where(UserModel.id == user_id)).scalar():
+            return [], [], {"error": "User not found"}
+
+        unique_ids = list(dict.fromkeys(item_ids))
+        # Khóa các dòng item theo thứ tự id để hai request bulk chồng nhau không deadlock
+        items = {
+            item.id: item
+            for item in ItemModel.query.filter(ItemModel.id.in_(unique_ids))
+                .order_by(ItemModel.id).with_for_update().all()
+        }
+        allowed: Dict[int, set] = {}
+        for item_id, access_user_id in db.session.query(ItemAccessModel.item_id, ItemAccessModel.user_id) \
+                .filter(ItemAccessModel.item_id.in_(unique_ids)):
+            allowed.setdefault(item_id, set()).add(access_user_id)
+
+        errors: Dict[int, str] = {}
+        claimed: List[int] = []
+        for item_id in unique_ids:
+            item = items.get(item_id)
+            if not item:
+                errors[item_id] = "Item not found"
+            elif item.status != ItemStatus.available:
+                errors[item_id] = "Item not available"
+            elif item_id in allowed and int(user_id) not in allowed[item_id]:
+                errors[item_id] = "User doesn't have access to this item"
+            elif db.session.execute(
+                update(ItemModel)
+                .where(ItemModel.id == item_id, ItemModel.status == ItemStatus.available)
+                .values(status=ItemStatus.borrowing)
+                .execution_options(synchronize_session=False)
+            ).rowcount != 1:
+                errors[item_id] = "Item not available"
+                contention_stats.incr("borrow_lost_race")
+            else:
+                claimed.append(item_id)
+
+        borrowings = {
+            item_id: BorrowingModel(
+                user_id=user_id,
+                item_id=item_id,
+                expected_return_at=expected_return_at,
+                status=BorrowStatus.borrowing,
+                note=note
+            )
+            for item_id in claimed
+        }
+        cell_ids = sorted({items[item_id].cell_id for item_id in claimed})
+        if borrowings:
+            db.session.add_all(borrowings.values())
+            db.session.commit()
+            for _ in claimed:
+                contention_stats.incr("borrow_ok")
+            resource_versions.bump('items')
+            DashboardService.invalidate()
+            BorrowingsService._reload_with_relations(borrowings.values())
+        else:
+            db.session.rollback()
+
+        results = []
+        seen = set()
+        for item_id in item_ids:
+            if item_id in seen:
+                results.append({"item_id": item_id, "error": "Duplicate item in request"})
+                continue
+            seen.add(item_id)
+            if item_id in borrowings:
+                results.append({"item_id": item_id, "borrowing": borrowings[item_id]})
+            else:
+                results.append({"item_id": item_id, "error": errors[item_id]})
+        return results, cell_ids, None
+
+    @staticmethod
+    def return_items(borrowing_ids):
+        """
+        Trả nhiều borrowing trong một transaction (một query nạp borrowing, UPDATE có điều kiện
+        cho từng borrowing, một UPDATE items cho tất cả item được trả, commit một lần).
+        Trả về (results, cell_ids) cùng dạng như borrow_items.
+        """
+        return run_with_retry(lambda: BorrowingsService._return_items_once(borrowing_ids))
+
+    @staticmethod
+    def _return_items_once(borrowing_ids):
+        unique_ids = list(dict.fromkeys(borrowing_ids))
+        loaded = {
+            borrowing.id: borrowing
+            for borrowing in BorrowingModel.query.options(db.joinedload(BorrowingModel.item))
+                .filter(BorrowingModel.id.in_(unique_ids))
+        }
+        now = get_vn_utc_now()
+        returned: Dict[int, BorrowingModel] = {}
+        for borrowing_id in unique_ids:
+            borrowing = loaded.get(borrowing_id)
+            if not borrowing or borrowing.status not in ACTIVE_STATUSES:
+                continue
+            if db.session.execute(
+                update(BorrowingModel)
+                .where(BorrowingModel.id == borrowing_id, BorrowingModel.status.in_(ACTIVE_STATUSES))
+                .values(status=BorrowStatus.returned, returned_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1:
+                returned[borrowing_id] = borrowing
+            else:
+                contention_stats.incr("return_lost_race")
+
+        cell_ids = sorted({b.item.cell_id for b in returned.values() if b.item})
+        if returned:
+            db.session.execute(
+                update(ItemModel)
+                .where(ItemModel.id.in_({b.item_id for b in returned.values()}))
+                .values(status=ItemStatus.available)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            for _ in returned:
+                contention_stats.incr("return_ok")
+            resource_versions.bump('items')
+            DashboardService.invalidate()
+            BorrowingsService._reload_with_relations(returned.values())
+        else:
+            db.session.rollback()
+
+        results = []
+        seen = set()
+        for borrowing_id in borrowing_ids:
+            if borrowing_id in seen:
+                results.append({"borrowing_id": borrowing_id, "error": "Duplicate borrowing in request"})
+            elif borrowing_id in returned:
+                results.append({"borrowing_id": borrowing_id, "borrowing": returned[borrowing_id]})
+            else:
+                results.append({"borrowing_id": borrowing_id, "error": "Borrowing not found or already returned"})
+            seen.add(borrowing_id)
+        return results, cell_ids
+
+    @staticmethod
+    def _reload_with_relations(borrowings):
+        """Nạp lại các borrowing vừa commit (kèm user, item) bằng một query thay vì lazy load từng dòng"""
+        BorrowingModel.query.options(
+            db.joinedload(BorrowingModel.user),
+            db.joinedload(BorrowingModel.item)
+        ).filter(BorrowingModel.id.in_([b.id for b in borrowings])).all()
+
+    @staticmethod
+    def open_cells(cell_ids, user_id):
+        """
+        Gửi lệnh mở một lần cho mỗi cell (sau khi đã commit bulk borrow/return).
+        Trả về [{"cell_id", "status"}] với status: sent / already_open / not_found / failed.
+        """
+        cells = []
+        for cell_id in cell_ids:
+            try:
+                result = CellService.open_cell(cell_id, user_id)
+            except Exception as e:
+                logger.error(f"Failed to open cell {cell_id} for bulk request: {e}")
+                result = False
+            entry = {"cell_id": cell_id}
+            if result is None:
+                entry["status"] = "already_open" if CellService.get_cell_by_id(cell_id) else "not_found"
+            elif result is False:
+                entry["status"] = "failed"
+            else:
+                entry["status"] = "sent"
+                entry["correlation_id"] = result["correlation_id"]
+            cells.append(entry)
+        return cells
+
     @staticmethod
     def get_all_borrowings():
         return BorrowingModel.query.options(
@@ -46,6 +322,53 @@ class BorrowingsService:
             db.joinedload(BorrowingModel.item)
         ).all()
 
+    @staticmethod
+    def borrowing_conditions(cell_id=None, user_id=None, item_id=None, status=None, since=None, until=None):
+        """Các điều kiện WHERE tương ứng với bộ lọc borrowings (lọc cell_id cần join items)"""
+        conditions = []
+        if cell_id is not None:
+            conditions.append(ItemModel.cell_id == cell_id)
+        if user_id is not None:
+            conditions.append(BorrowingModel.user_id == user_id)
+        if item_id is not None:
+            conditions.append(BorrowingModel.item_id == item_id)
+        if status is not None:
+            conditions.append(BorrowingModel.status == BorrowStatus(status))
+        if since is not None:
+            conditions.append(BorrowingModel.borrowed_at >= since)
+        if until is not None:
+            conditions.append(BorrowingModel.borrowed_at < until)
+        return conditions
+
+    @staticmethod
+    def filter_borrowings(projection=None, **filters):
+        """
+        Query borrowings (kèm user, item) theo các bộ lọc, chưa sắp xếp.
+        projection (SchemaProjection): trả về tuple đã chiếu thay vì ORM object.
+        """
+        if projection is not None:
+            query = projection.query()
+        else:
+            query = BorrowingModel.query.options(
+                db.joinedload(BorrowingModel.user),
+                db.joinedload(BorrowingModel.item)
+            )
+        if filters.get('cell_id') is not None:
+            query = query.join(ItemModel, BorrowingModel.item_id == ItemModel.id)
+        return query.filter(*BorrowingsService.borrowing_conditions(**filters))
+
+    @staticmethod
+    def get_borrowings(projection=None, **filters):
+        return BorrowingsService.filter_borrowings(projection, **filters).all()
+
+    @staticmethod
+    def get_borrowings_page(limit, cursor=None, projection=None, **filters):
+        """Một trang borrowings mới nhất trước, phân trang keyset theo (borrowed_at, id)"""
+        return keyset_page(
+            BorrowingsService.filter_borrowings(projection, **filters),
+            BorrowingModel.borrowed_at, BorrowingModel.id, limit, cursor
+        )
+
     @staticmethod
     def get_active_borrowings_for_user(user_id: int):
         """Return active (not yet returned) borrowings for a specific user."""
@@ -54,20 +377,39 @@ class BorrowingsService:
             db.joinedload(BorrowingModel.item)
         ).filter(
             BorrowingModel.user_id == user_id,
-            BorrowingModel.status == BorrowStatus.borrowing
+            BorrowingModel.status.in_(ACTIVE_STATUSES)
         ).all()
 
     @staticmethod
     def return_item(borrowing_id):
+        return run_with_retry(lambda: BorrowingsService._return_item_once(borrowing_id))
+
+    @staticmethod
+    def _return_item_once(borrowing_id):
         borrowing = BorrowingModel.query.get(borrowing_id)
-        if not borrowing or borrowing.status != BorrowStatus.borrowing:
+        if not borrowing or borrowing.status not in ACTIVE_STATUSES:
+            return None, {"error": "Borrowing not found or already returned"}
+        # Cùng cách với borrow_item: chỉ một request trả được borrowing, tránh trả hai lần
+        returned = db.session.execute(
+            update(BorrowingModel)
+            .where(BorrowingModel.id == borrowing_id, BorrowingModel.status.in_(ACTIVE_STATUSES))
+            .values(status=BorrowStatus.returned, returned_at=get_vn_utc_now())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if returned != 1:
+            db.session.rollback()
+            contention_stats.incr("return_lost_race")
             return None, {"error": "Borrowing not found or already returned"}
-        borrowing.returned_at = get_vn_utc_now()
-        borrowing.status = BorrowStatus.returned
-        item = ItemModel.query.get(borrowing.item_id)
-        if item:
-            item.status = ItemStatus.available
+        db.session.execute(
+            update(ItemModel)
+            .where(ItemModel.id == borrowing.item_id)
+            .values(status=ItemStatus.available)
+            .execution_options(synchronize_session=False)
+        )
         db.session.commit()
+        contention_stats.incr("return_ok")
+        resource_versions.bump('items')
+        DashboardService.invalidate()
         return borrowing, None
         
     @staticmethod
@@ -78,6 +420,10 @@ class BorrowingsService:
     def get_borrowings_by_cell(cell_id):
         # Lấy danh sách mượn/trả theo cell_id
         # Cần join từ borrowings qua items để lọc theo cell_id
+        # Dùng lại phép join để nạp item (contains_eager), user nạp cùng câu query
         return BorrowingModel.query.join(
             ItemModel, BorrowingModel.item_id == ItemModel.id
+        ).options(
+            db.contains_eager(BorrowingModel.item),
+            db.joinedload(BorrowingModel.user)
         ).filter(ItemModel.cell_id == cell_id).all()
\ No newline at end of file
@@ -1,5 +1,6 @@
 from app.extensions import db
 from app.models.cell_event_model import CellEventModel, LockerEventType
+from app.utils.pagination import keyset_page
 
 
 class CellEventService:
@@ -27,6 +28,54 @@ class CellEventService:
             db.joinedload(CellEventModel.cell)
         ).order_by(CellEventModel.timestamp.desc()).all()
 
+    @staticmethod
+    def event_conditions(cell_id=None, user_id=None, event_type=None, since=None, until=None):
+        """Các điều kiện WHERE tương ứng với bộ lọc events"""
+        conditions = []
+        if cell_id is not None:
+            conditions.append(CellEventModel.locker_id == cell_id)
+        if user_id is not None:
+            conditions.append(CellEventModel.user_id == user_id)
+        if event_type is not None:
+            conditions.append(CellEventModel.event_type == LockerEventType(event_type))
+        if since is not None:
+            conditions.append(CellEventModel.timestamp >= since)
+        if until is not None:
+            conditions.append(CellEventModel.timestamp < until)
+        return conditions
+
+    @staticmethod
+    def filter_events(projection=None, **filters):
+        """
+        Query events (kèm user, cell) theo các bộ lọc, chưa sắp xếp.
+        projection (SchemaProjection): trả về tuple đã chiếu thay vì ORM object.
+        """
+        if projection is not None:
+            query = projection.query()
+        else:
+            query = CellEventModel.query.options(
+                db.joinedload(CellEventModel.user),
+                db.joinedload(CellEventModel.cell)
+            )
+        return query.filter(*CellEventService.event_conditions(**filters))
+
+    @staticmethod
+    def get_events(projection=None, **filters):
+        return CellEventService.filter_events(projection, **filters).order_by(
+            CellEventModel.timestamp.desc(), CellEventModel.id.desc()
+        ).all()
+
+    @staticmethod
+    def get_events_page(limit, cursor=None, projection=None, **filters):
+        """Một trang events mới nhất trước, phân trang keyset theo (timestamp, id)"""
+        return keyset_page(
+            CellEventService.filter_events(projection, **filters),
+            CellEventModel.timestamp, CellEventModel.id, limit, cursor
+        )
+
     @staticmethod
     def get_events_by_cell(locker_id):
-        return CellEventModel.query.filter_by(locker_id=locker_id).order_by(CellEventModel.timestamp.desc()).all()
+        return CellEventModel.query.options(
+            db.joinedload(CellEventModel.user),
+            db.joinedload(CellEventModel.cell)
+        ).filter_by(locker_id=locker_id).order_by(CellEventModel.timestamp.desc()).all()
@@ -4,6 +4,11 @@ from app.services.cell_event_service import CellEventService
 from app.extensions import db
 from datetime import datetime
 from app.services.mqtt_service import mqtt_service
+from app.services.cell_state_cache import cell_state_cache
+from app.services.command_ack_service import command_ack_tracker
+from app.services.cell_stream_service import cell_stream_broker
+from app.services.dashboard_service import DashboardService
+from app.services.resource_versions import resource_versions
 from app.utils.timezone_helper import get_vn_utc_now
 import logging
 
@@ -11,7 +16,10 @@ logger = logging.getLogger(__name__)
 
 class CellService:
     @staticmethod
-    def get_all_cells():
+    def get_all_cells(projection=None):
+        """projection (SchemaProjection): trả về tuple đã chiếu thay vì ORM object"""
+        if projection is not None:
+            return projection.query().all()
         return CellModel.query.all()
 
     @staticmethod
@@ -23,6 +31,9 @@ class CellService:
         cell = CellModel(**data)
         db.session.add(cell)
         db.session.commit()
+        cell_state_cache.update_from_model(cell)
+        resource_versions.bump('cells', cell_ids=[cell.id])
+        DashboardService.invalidate()
         return cell
 
     @staticmethod
@@ -33,6 +44,7 @@ class CellService:
             return None
         status_changed = False
         new_status = None
+        current_status = cell.status.value if hasattr(cell.status, 'value') else cell.status
         for key, value in data.items():
             if key == "status":
                 # Chuẩn hóa value về enum value ("open"/"closed")
@@ -40,6 +52,9 @@ class CellService:
                     value_lower = value.lower()
                 else:
                     value_lower = value.value
+                # Chỉ ghi nhận khi trạng thái thực sự thay đổi
+                if value_lower == current_status:
+                    continue
                 if value_lower == "open":
                     cell.last_open_at = get_vn_utc_now()
                     status_changed = True
@@ -52,6 +67,12 @@ class CellService:
             else:
                 setattr(cell, key, value)
         db.session.commit()
+        cell_state_cache.update_from_model(cell)
+        resource_versions.bump('cells', cell_ids=[cell.id])
+        if status_changed:
+            cell_stream_broker.publish_cell_state(
+                cell.id, cell.status.value, cell.last_open_at, cell.last_close_at
+            )
         
         # Ghi event nếu status đổi và có user_id
         if status_changed and user_id:
@@ -70,47 +91,54 @@ class CellService:
         return cell
 
     @staticmethod
-    def open_cell(cell_id, user_id):
-        """Mở cell qua MQTT command"""
-        cell = CellModel.query.get(cell_id)
-        if not cell:
+    def open_cell(cell_id, user_id, wait_ack=False, ack_timeout=None):
+        """
+        Mở cell qua MQTT command.
+        Trả về None nếu cell không tồn tại/đã mở, False nếu gửi lệnh lỗi,
+        ngược lại trả về dict kết quả lệnh (correlation_id, acked, latency_ms).
+        """
+        state = cell_state_cache.get_or_load(cell_id)
+        if not state:
             return None
             
         # Kiểm tra nếu cell đã mở rồi
-        current_status = cell.status.value if hasattr(cell.status, 'value') else cell.status
-        if current_status == "open":
+        if state["status"] == "open":
             return None
             
         # Gửi MQTT command để mở cell
         int_user_id = int(user_id) if user_id else None
-        success = mqtt_service.publish_command(cell_id, "open", {"user_id": int_user_id})
-        if success:
-            logger.info(f"MQTT open command sent to cell {cell_id} by user {user_id}")
-            return True
-        else:
-            logger.error(f"Failed to send MQTT open command to cell {cell_id}")
-            return False
+        return CellService._send_command(cell_id, "open", {"user_id": int_user_id}, user_id, wait_ack, ack_timeout)
 
     @staticmethod
-    def close_cell(cell_id, user_id):
-        """Đóng cell qua MQTT command"""
-        cell = CellModel.query.get(cell_id)
-        if not cell:
+    def close_cell(cell_id, user_id, wait_ack=False, ack_timeout=None):
+        """Đóng cell qua MQTT command (giá trị trả về giống open_cell)"""
+        state = cell_state_cache.get_or_load(cell_id)
+        if not state:
             return None
             
         # Kiểm tra nếu cell đã đóng rồi
-        current_status = cell.status.value if hasattr(cell.status, 'value') else cell.status
-        if current_status == "closed":
+        if state["status"] == "closed":
             return None
             
         # Gửi MQTT command để đóng cell
-        success = mqtt_service.publish_command(cell_id, "close", {"user_id": user_id})
-        if success:
-            logger.info(f"MQTT close command sent to cell {cell_id} by user {user_id}")
-            return True
-        else:
-            logger.error(f"Failed to send MQTT close command to cell {cell_id}")
+        return CellService._send_command(cell_id, "close", {"user_id": user_id}, user_id, wait_ack, ack_timeout)
+
+    @staticmethod
+    def _send_command(cell_id, command, data, user_id, wait_ack, ack_timeout):
+        correlation_id = mqtt_service.send_command(cell_id, command, data)
+        if not correlation_id:
+            logger.error(f"Failed to send MQTT {command} command to cell {cell_id}")
             return False
+        logger.info(f"MQTT {command} command sent to cell {cell_id} by user {user_id}")
+
+        result = {"correlation_id": correlation_id, "acked": None, "latency_ms": None}
+        if wait_ack:
+            timeout = command_ack_tracker.ack_timeout if ack_timeout is None else ack_timeout
+            timeout = max(0.0, min(float(timeout), command_ack_tracker.ack_timeout))
+            pending = command_ack_tracker.wait(correlation_id, timeout)
+            result["acked"] = bool(pending and pending.state == "acked")
+            result["latency_ms"] = round(pending.latency_ms, 3) if pending and pending.latency_ms is not None else None
+        return result
 
     @staticmethod
     def delete_cell(cell_id):
@@ -119,4 +147,8 @@ class CellService:
             return None
         db.session.delete(cell)
         db.session.commit()
+        cell_state_cache.evict(cell_id)
+        # Item của cell bị xóa theo (FK) nên danh sách items cũng đổi
+        resource_versions.bump('cells', 'items', cell_ids=[cell_id])
+        DashboardService.invalidate()
         return cell
@@ -0,0 +1,133 @@
+import threading
+import logging
+from typing import Any, Dict, Optional
+from app.extensions import db
+from app.models.cell_model import CellModel
+from app.services.resource_versions import resource_versions
+
+logger = logging.getLogger(__name__)
+
+
+class CellStateCache:
+    """
+    Cache trạng thái cell dùng chung cho cả process.
+    Được nạp từ bảng cells lúc khởi động, cập nhật bởi status MQTT và CellService,
+    giữ status hiện tại cùng last_open_at/last_close_at để các kiểm tra
+    "đã mở/đã đóng" không cần truy vấn DB.
+    Thay đổi từ admin (CellService) ở worker khác tới qua resource_versions ("cell_ids") và
+    chỉ xóa cell khỏi cache, lần đọc sau nạp lại từ DB; resync xóa toàn bộ. Khi mất kênh đồng bộ
+    get_or_load() luôn đọc DB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, Dict[str, Any]] = {}
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.duplicates_skipped = 0
+        self.transitions = 0
+
+    def warm(self):
+        """Nạp toàn bộ trạng thái cell từ DB (cần app context)"""
+        rows = db.session.query(
+            CellModel.id, CellModel.status, CellModel.last_open_at, CellModel.last_close_at
+        ).all()
+        with self._lock:
+            self._states = {
+                row.id: {
+                    "status": row.status.value if hasattr(row.status, 'value') else row.status,
+                    "last_open_at": row.last_open_at,
+                    "last_close_at": row.last_close_at,
+                }
+                for row in rows
+            }
+            self.warmed = True
+        logger.info(f"Cell state cache warmed with {len(rows)} cells")
+
+    def get(self, cell_id: int) -> Optional[Dict[str, Any]]:
+        """Lấy trạng thái cell từ cache, None nếu chưa có"""
+        with self._lock:
+            state = self._states.get(cell_id)
+            if state is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(state)
+
+    def get_status(self, cell_id: int) -> Optional[str]:
+        state = self.get(cell_id)
+        return state["status"] if state else None
+
+    def get_or_load(self, cell_id: int) -> Optional[Dict[str, Any]]:
+        """Lấy trạng thái từ cache, nếu miss thì đọc DB một lần và lưu lại (cần app context)"""
+        if resource_versions.is_synced():
+            state = self.get(cell_id)
+            if state is not None:
+                return state
+        cell = CellModel.query.get(cell_id)
+        if not cell:
+            return None
+        self.update_from_model(cell)
+        return self.get_nowait(cell_id)
+
+    def get_nowait(self, cell_id: int) -> Optional[Dict[str, Any]]:
+        """Đọc cache mà không tính vào thống kê hit/miss"""
+        with self._lock:
+            state = self._states.get(cell_id)
+            return dict(state) if state else None
+
+    def set(self, cell_id: int, status: str, last_open_at=None, last_close_at=None):
+        with self._lock:
+            self._states[cell_id] = {
+                "status": status,
+                "last_open_at": last_open_at,
+                "last_close_at": last_close_at,
+            }
+
+    def update_from_model(self, cell: CellModel):
+        status = cell.status.value if hasattr(cell.status, 'value') else cell.status
+        self.set(cell.id, status, cell.last_open_at, cell.last_close_at)
+
+    def evict(self, cell_id: int):
+        with self._lock:
+            self._states.pop(cell_id, None)
+
+    def on_remote_change(self, payload: Optional[Dict[str, Any]]):
+        """Message từ worker khác (chạy trên thread của paho); None = có thể đã lỡ message"""
+        if payload is None:
+            with self._lock:
+                self._states.clear()
+            return
+        with self._lock:
+            for cell_id in payload.get("cell_ids") or []:
+                try:
+                    self._states.pop(int(cell_id), None)
+                except (TypeError, ValueError):
+                    continue
+
+    def record_duplicate(self):
+        with self._lock:
+            self.duplicates_skipped += 1
+
+    def record_transition(self, count: int = 1):
+        with self._lock:
+            self.transitions += count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "warmed": self.warmed,
+                "size": len(self._states),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "duplicates_skipped": self.duplicates_skipped,
+                "transitions": self.transitions,
+            }
+
+
+# Singleton instance
+cell_state_cache = CellStateCache()
+resource_versions.add_listener(cell_state_cache.on_remote_change)
@@ -0,0 +1,192 @@
+import os
+import json
+import queue
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class StreamEvent:
+    """Một event đã phát, giữ sẵn chuỗi SSE để không serialize lại cho từng client"""
+
+    __slots__ = ("seq", "event_type", "data", "encoded")
+
+    def __init__(self, seq: int, event_id: str, event_type: str, data: Dict[str, Any]):
+        self.seq = seq
+        self.event_type = event_type
+        self.data = data
+        payload = json.dumps(data, default=_json_default)
+        self.encoded = f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+class StreamSubscription:
+    """Hàng đợi có giới hạn của một client đang nghe stream"""
+
+    def __init__(self, max_queue: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        # Đặt True khi hàng đợi đầy: client bị trễ quá xa, cần tải lại toàn bộ trạng thái
+        self.overflowed = False
+
+
+class CellStreamBroker:
+    """
+    Phát trạng thái cell tới các client qua Server-Sent Events.
+    Mỗi event có id dạng "<boot>-<seq>" và được giữ trong ring buffer để client
+    kết nối lại với Last-Event-ID có thể nhận tiếp phần bị lỡ. Nếu id quá cũ hoặc
+    thuộc process khác (gunicorn nhiều worker) thì client nhận event "resync".
+    Mỗi stream giữ một thread gthread nên số stream mỗi worker bị giới hạn (CELL_STREAM_MAX_CLIENTS,
+    vượt thì subscribe() trả về None) và stream tự đóng sau CELL_STREAM_MAX_DURATION giây
+    (client kết nối lại với Last-Event-ID, có thể sang worker khác).
+    """
+
+    def __init__(self):
+        self.buffer_size = max(1, int(os.getenv('CELL_STREAM_BUFFER_SIZE', 500)))
+        self.client_queue_size = max(1, int(os.getenv('CELL_STREAM_CLIENT_QUEUE', 100)))
+        self.heartbeat = float(os.getenv('CELL_STREAM_HEARTBEAT', 15))
+        self.max_clients = max(1, int(os.getenv('CELL_STREAM_MAX_CLIENTS', 8)))
+        self.max_duration = float(os.getenv('CELL_STREAM_MAX_DURATION', 300))
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history: "deque[StreamEvent]" = deque(maxlen=self.buffer_size)
+        self._subscribers = set()
+        self.published = 0
+        self.overflows = 0
+        self.rejected = 0
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.boot_id}-{seq}"
+
+    def _parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        """Trả về seq nếu id thuộc process này, ngược lại None"""
+        if not event_id:
+            return None
+        boot, _, seq = event_id.rpartition('-')
+        if boot != self.boot_id:
+            return None
+        try:
+            return int(seq)
+        except ValueError:
+            return None
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> str:
+        """Phát event tới mọi subscriber, không bao giờ block thread gọi"""
+        with self._lock:
+            self._seq += 1
+            event = StreamEvent(self._seq, self._event_id(self._seq), event_type, data)
+            self._history.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+                with self._lock:
+                    self.overflows += 1
+        return self._event_id(event.seq)
+
+    def publish_cell_state(self, cell_id: int, status: str, last_open_at=None, last_close_at=None) -> str:
+        return self.publish("cell_status", {
+            "cell_id": cell_id,
+            "status": status,
+            "last_open_at": last_open_at,
+            "last_close_at": last_close_at,
+        })
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Optional[StreamSubscription]:
+        """
+        Đăng ký client mới. Nếu có last_event_id thì đưa sẵn các event bị lỡ vào hàng đợi,
+        hoặc đánh dấu cần resync khi không thể nối tiếp. Trả về None khi worker đã đủ stream.
+        """
+        subscription = StreamSubscription(self.client_queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                self.rejected += 1
+                return None
+            if last_event_id:
+                last_seq = self._parse_event_id(last_event_id)
+                oldest = self._history[0].seq if self._history else self._seq + 1
+                if last_seq is None or last_seq > self._seq or last_seq < oldest - 1:
+                    subscription.overflowed = True
+                else:
+                    missed = [event for event in self._history if event.seq > last_seq]
+                    if len(missed) > self.client_queue_size:
+                        subscription.overflowed = True
+                    else:
+                        for event in missed:
+                            subscription.queue.put_nowait(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StreamSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _resync(self, subscription: StreamSubscription) -> str:
+        """Xóa hàng đợi đã tràn và báo client tải lại toàn bộ trạng thái"""
+        while True:
+            try:
+                subscription.queue.get_nowait()
+            except queue.Empty:
+                break
+        subscription.overflowed = False
+        with self._lock:
+            current_id = self._event_id(self._seq)
+        return f"id: {current_id}\nevent: resync\ndata: {{}}\n\n"
+
+    def stream(self, subscription: StreamSubscription) -> Iterator[str]:
+        """
+        Generator chuỗi SSE cho một client, gửi comment heartbeat khi không có event,
+        kết thúc sau max_duration giây để trả thread cho worker
+        """
+        deadline = time.monotonic() + self.max_duration
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if subscription.overflowed:
+                    yield self._resync(subscription)
+                    continue
+                try:
+                    event = subscription.queue.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.encoded
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "boot_id": self.boot_id,
+                "last_event_id": self._event_id(self._seq),
+                "subscribers": len(self._subscribers),
+                "max_clients": self.max_clients,
+                "rejected": self.rejected,
+                "buffered_events": len(self._history),
+                "published": self.published,
+                "overflows": self.overflows,
+            }
+
+
+# Singleton instance
+cell_stream_broker = CellStreamBroker()
@@ -0,0 +1,214 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái cell mà ESP32 sẽ báo về khi thực hiện xong lệnh
+EXPECTED_STATUS = {
+    "open": "open",
+    "close": "closed",
+}
+
+# Event từ ESP32 (locker/cell/<id>/event) quy về trạng thái tương ứng
+EVENT_STATUS = {
+    "open": "open",
+    "opened": "open",
+    "close": "closed",
+    "closed": "closed",
+}
+
+# Biên của các bucket histogram độ trễ command -> ack (ms)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PendingCommand:
+    """Một lệnh đã gửi tới ESP32 và đang chờ ack"""
+
+    __slots__ = (
+        "correlation_id", "cell_id", "command", "expected_status",
+        "sent_at", "deadline", "state", "latency_ms", "_event",
+    )
+
+    def __init__(self, cell_id: int, command: str, timeout: float):
+        self.correlation_id = uuid.uuid4().hex
+        self.cell_id = cell_id
+        self.command = command
+        self.expected_status = EXPECTED_STATUS.get(command)
+        self.sent_at = time.monotonic()
+        self.deadline = self.sent_at + timeout
+        self.state = "pending"  # pending | acked | expired
+        self.latency_ms: Optional[float] = None
+        self._event = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "correlation_id": self.correlation_id,
+            "cell_id": self.cell_id,
+            "command": self.command,
+            "state": self.state,
+            "latency_ms": round(self.latency_ms, 3) if self.latency_ms is not None else None,
+        }
+
+
+class LatencyHistogram:
+    """Histogram độ trễ với bucket cố định"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+
+    def observe(self, value_ms: float):
+        index = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value_ms <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.min_ms = value_ms if self.min_ms is None else min(self.min_ms, value_ms)
+        self.max_ms = value_ms if self.max_ms is None else max(self.max_ms, value_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        bounds = list(LATENCY_BUCKETS_MS) + ["+Inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "min_ms": round(self.min_ms, 3) if self.min_ms is not None else None,
+            "max_ms": round(self.max_ms, 3) if self.max_ms is not None else None,
+            "buckets": [{"le_ms": bound, "count": count} for bound, count in zip(bounds, self.buckets)],
+        }
+
+
+class CommandAckTracker:
+    """
+    Theo dõi các lệnh MQTT đã gửi (mỗi lệnh có correlation_id trong payload)
+    cho tới khi ESP32 báo status/event tương ứng hoặc hết hạn.
+    Ghi lại histogram độ trễ command -> ack theo từng cell.
+    """
+
+    def __init__(self):
+        self.ack_timeout = float(os.getenv('MQTT_COMMAND_ACK_TIMEOUT', 15))
+        self.max_recent = int(os.getenv('MQTT_COMMAND_HISTORY_SIZE', 500))
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, PendingCommand]" = OrderedDict()
+        self._recent: "OrderedDict[str, PendingCommand]" = OrderedDict()
+        self._histograms: Dict[int, LatencyHistogram] = {}
+        self._sent: Dict[int, int] = {}
+        self._expired: Dict[int, int] = {}
+
+    def register(self, cell_id: int, command: str) -> PendingCommand:
+        """Tạo bản ghi chờ ack cho một lệnh sắp gửi"""
+        pending = PendingCommand(cell_id, command, self.ack_timeout)
+        with self._lock:
+            self._expire_locked()
+            self._pending[pending.correlation_id] = pending
+            self._sent[cell_id] = self._sent.get(cell_id, 0) + 1
+        return pending
+
+    def discard(self, correlation_id: str):
+        """Bỏ bản ghi khi lệnh không publish được"""
+        with self._lock:
+            pending = self._pending.pop(correlation_id, None)
+            if pending:
+                self._sent[pending.cell_id] = max(0, self._sent.get(pending.cell_id, 1) - 1)
+
+    def resolve(self, cell_id: int, status: Optional[str] = None,
+                correlation_id: Optional[str] = None) -> Optional[PendingCommand]:
+        """
+        Đánh dấu lệnh đã được ack. Có correlation_id thì chỉ khớp đúng lệnh đó (id lạ có thể là
+        lệnh của worker khác hoặc đã hết hạn -> không ack gì); chỉ khi firmware không gửi
+        correlation_id mới lấy lệnh cũ nhất của cell có trạng thái mong đợi trùng với status.
+        """
+        with self._lock:
+            self._expire_locked()
+            pending = None
+            if correlation_id:
+                pending = self._pending.get(correlation_id)
+            else:
+                for candidate in self._pending.values():
+                    if candidate.cell_id == cell_id and (
+                        status is None or candidate.expected_status == status
+                    ):
+                        pending = candidate
+                        break
+            if pending is None:
+                return None
+
+            del self._pending[pending.correlation_id]
+            pending.state = "acked"
+            pending.latency_ms = (time.monotonic() - pending.sent_at) * 1000.0
+            self._histograms.setdefault(pending.cell_id, LatencyHistogram()).observe(pending.latency_ms)
+            self._remember_locked(pending)
+        pending._event.set()
+        logger.info(
+            f"Command {pending.command} to cell {pending.cell_id} acked in {pending.latency_ms:.1f} ms"
+        )
+        return pending
+
+    def wait(self, correlation_id: str, timeout: float) -> Optional[PendingCommand]:
+        """Chờ ack tối đa timeout giây. Trả về bản ghi lệnh (state cho biết đã ack hay chưa)."""
+        with self._lock:
+            pending = self._pending.get(correlation_id) or self._recent.get(correlation_id)
+        if pending is None:
+            return None
+        pending._event.wait(timeout)
+        return pending
+
+    def get_command(self, correlation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire_locked()
+            pending = self._pending.get(correlation_id) or self._recent.get(correlation_id)
+            return pending.to_dict() if pending else None
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        while self._pending:
+            correlation_id, pending = next(iter(self._pending.items()))
+            if pending.deadline > now:
+                break
+            del self._pending[correlation_id]
+            pending.state = "expired"
+            self._expired[pending.cell_id] = self._expired.get(pending.cell_id, 0) + 1
+            self._remember_locked(pending)
+            pending._event.set()
+            logger.warning(f"Command {pending.command} to cell {pending.cell_id} was not acknowledged")
+
+    def _remember_locked(self, pending: PendingCommand):
+        self._recent[pending.correlation_id] = pending
+        while len(self._recent) > self.max_recent:
+            self._recent.popitem(last=False)
+
+    def get_stats(self, cell_id: Optional[int] = None) -> Dict[str, Any]:
+        """Số lệnh đã gửi/đang chờ/hết hạn và histogram độ trễ theo cell"""
+        with self._lock:
+            self._expire_locked()
+            cell_ids = set(self._sent) | set(self._histograms) | set(self._expired)
+            if cell_id is not None:
+                cell_ids = {cell_id}
+            cells = {}
+            for cid in sorted(cell_ids):
+                histogram = self._histograms.get(cid)
+                cells[str(cid)] = {
+                    "sent": self._sent.get(cid, 0),
+                    "pending": sum(1 for p in self._pending.values() if p.cell_id == cid),
+                    "expired": self._expired.get(cid, 0),
+                    "latency": histogram.to_dict() if histogram else LatencyHistogram().to_dict(),
+                }
+            return {
+                "ack_timeout_s": self.ack_timeout,
+                "pending": len(self._pending),
+                "cells": cells,
+            }
+
+
+# Singleton instance
+command_ack_tracker = CommandAckTracker()
@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+import logging
+from typing import Any, Dict, Optional
+from sqlalchemy import select, func
+from app.extensions import db
+from app.models.item_model import ItemModel, ItemStatus
+from app.models.user_model import UserModel
+from app.models.cell_model import CellModel
+from app.models.cell_event_model import CellEventModel
+from app.models.borrowings_model import BorrowingModel, BorrowStatus, ACTIVE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTIVITY_LIMIT = 10
+
+# Trạng thái hiển thị trong recent_activities (frontend tô màu theo "returned")
+ACTIVITY_STATUS = {
+    BorrowStatus.borrowing: "active",
+    BorrowStatus.overdue: "overdue",
+    BorrowStatus.returned: "returned",
+}
+
+
+class DashboardService:
+    """
+    Số liệu cho /dashboard/stats: các bộ đếm lấy bằng COUNT(*) trong một câu query
+    (active_borrowings lọc theo status, dùng ix_borrowings_status_borrowed_at_id, không quét lịch sử),
+    10 lượt mượn gần nhất lấy bằng ORDER BY borrowed_at DESC LIMIT 10 (có index).
+    Kết quả được cache DASHBOARD_STATS_TTL giây và bị xóa khi có thay đổi từ các service ghi.
+    """
+
+    _ttl = float(os.getenv('DASHBOARD_STATS_TTL', 5))
+    _lock = threading.Lock()
+    _cached: Optional[Dict[str, Any]] = None
+    _cached_at = 0.0
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        with DashboardService._lock:
+            cached = DashboardService._cached
+            if cached is not None and time.monotonic() - DashboardService._cached_at < DashboardService._ttl:
+                return cached
+
+        stats = DashboardService.compute_stats()
+        with DashboardService._lock:
+            DashboardService._cached = stats
+            DashboardService._cached_at = time.monotonic()
+        return stats
+
+    @staticmethod
+    def invalidate():
+        """Gọi sau khi commit thay đổi user/item/cell/borrowing"""
+        with DashboardService._lock:
+            DashboardService._cached = None
+
+    @staticmethod
+    def activity_counts() -> Dict[str, int]:
+        """
+        Tổng số cell event / lượt mượn cho trang nhật ký (trang đó chỉ tải từng trang 100 dòng).
+        Đếm cả lịch sử nên không nằm trong get_stats (được poll); chỉ chạy khi trang nhật ký mở.
+        """
+        counts = db.session.execute(select(
+            select(func.count(CellEventModel.id)).scalar_subquery().label('cell_events'),
+            select(func.count(BorrowingModel.id)).scalar_subquery().label('borrowings'),
+            select(func.count(BorrowingModel.id))
+                .where(BorrowingModel.status.in_(ACTIVE_STATUSES))
+                .scalar_subquery().label('active_borrowings'),
+            select(func.count(BorrowingModel.id))
+                .where(BorrowingModel.status == BorrowStatus.returned)
+                .scalar_subquery().label('returned_borrowings'),
+        )).one()
+        return dict(counts._mapping)
+
+    @staticmethod
+    def compute_stats() -> Dict[str, Any]:
+        counts = db.session.execute(select(
+            select(func.count(ItemModel.id)).scalar_subquery().label('total_items'),
+            select(func.count(UserModel.id)).scalar_subquery().label('total_users'),
+            select(func.count(CellModel.id)).scalar_subquery().label('total_cells'),
+            select(func.count(ItemModel.id))
+                .where(ItemModel.status == ItemStatus.available)
+                .scalar_subquery().label('available_items'),
+            select(func.count(BorrowingModel.id))
+                .where(BorrowingModel.status.in_(ACTIVE_STATUSES))
+                .scalar_subquery().label('active_borrowings'),
+        )).one()
+
+        recent_borrowings = BorrowingModel.query.options(
+            db.joinedload(BorrowingModel.user),
+            db.joinedload(BorrowingModel.item)
+        ).order_by(BorrowingModel.borrowed_at.desc()).limit(RECENT_ACTIVITY_LIMIT).all()
+
+        return {
+            "total_items": counts.total_items,
+            "total_users": counts.total_users,
+            "total_cells": counts.total_cells,
+            "available_items": counts.available_items,
+            "active_borrowings": counts.active_borrowings,
+            "recent_activities": [{
+                "id": b.id,
+                "user_name": b.user.full_name,
+                "item_name": b.item.name,
+                "borrowed_at": b.borrowed_at.isoformat(),
+                "expected_return_at": b.expected_return_at.isoformat(),
+                "status": ACTIVITY_STATUS.get(b.status, "active")
+            } for b in recent_borrowings]
+        }
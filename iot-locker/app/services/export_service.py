@@ -0,0 +1,151 @@
+import os
+import io
+import csv
+import json
+import zlib
+import enum
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
+from sqlalchemy import select
+from app.extensions import db
+from app.models.cell_event_model import CellEventModel
+from app.models.borrowings_model import BorrowingModel
+from app.models.cell_model import CellModel
+from app.models.item_model import ItemModel
+from app.models.user_model import UserModel
+from app.services.cell_event_service import CellEventService
+from app.services.borrowings_service import BorrowingsService
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+EVENT_COLUMNS = [
+    'id', 'timestamp', 'cell_id', 'cell_name', 'user_id', 'username', 'full_name', 'event_type',
+]
+
+BORROWING_COLUMNS = [
+    'id', 'user_id', 'username', 'full_name', 'item_id', 'item_name', 'cell_id',
+    'borrowed_at', 'expected_return_at', 'returned_at', 'status', 'note',
+]
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+class ExportService:
+    """
+    Xuất toàn bộ lịch sử cells_events / borrowings dưới dạng NDJSON hoặc CSV.
+    Dòng được đọc bằng server-side cursor (yield_per) và serialize dần thành từng chunk,
+    nên bộ nhớ không tăng theo số dòng.
+    """
+
+    batch_size = max(1, int(os.getenv('EXPORT_BATCH_SIZE', 1000)))
+
+    @staticmethod
+    def events_statement(**filters):
+        return (
+            select(
+                CellEventModel.id,
+                CellEventModel.timestamp,
+                CellEventModel.locker_id.label('cell_id'),
+                CellModel.name.label('cell_name'),
+                CellEventModel.user_id,
+                UserModel.username,
+                UserModel.full_name,
+                CellEventModel.event_type,
+            )
+            .outerjoin(CellModel, CellModel.id == CellEventModel.locker_id)
+            .outerjoin(UserModel, UserModel.id == CellEventModel.user_id)
+            .where(*CellEventService.event_conditions(**filters))
+            .order_by(CellEventModel.timestamp, CellEventModel.id)
+        )
+
+    @staticmethod
+    def borrowings_statement(**filters):
+        return (
+            select(
+                BorrowingModel.id,
+                BorrowingModel.user_id,
+                UserModel.username,
+                UserModel.full_name,
+                BorrowingModel.item_id,
+                ItemModel.name.label('item_name'),
+                ItemModel.cell_id,
+                BorrowingModel.borrowed_at,
+                BorrowingModel.expected_return_at,
+                BorrowingModel.returned_at,
+                BorrowingModel.status,
+                BorrowingModel.note,
+            )
+            .outerjoin(UserModel, UserModel.id == BorrowingModel.user_id)
+            .outerjoin(ItemModel, ItemModel.id == BorrowingModel.item_id)
+            .where(*BorrowingsService.borrowing_conditions(**filters))
+            .order_by(BorrowingModel.borrowed_at, BorrowingModel.id)
+        )
+
+    @staticmethod
+    def iter_rows(statement) -> Iterator[Dict[str, Any]]:
+        """Đọc từng dòng qua server-side cursor (cần app context)"""
+        result = db.session.execute(
+            statement.execution_options(stream_results=True, yield_per=ExportService.batch_size)
+        )
+        try:
+            for row in result.mappings():
+                yield {key: _plain(value) for key, value in row.items()}
+        finally:
+            result.close()
+
+    @staticmethod
+    def serialize(rows: Iterable[Dict[str, Any]], columns: List[str], fmt: str) -> Iterator[str]:
+        """Serialize dần từng dòng, gộp mỗi batch_size dòng thành một chunk"""
+        buffer = io.StringIO()
+        writer = None
+        if fmt == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+
+        pending = 0
+        for row in rows:
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write('\n')
+            pending += 1
+            if pending >= ExportService.batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        tail = buffer.getvalue()
+        if tail:
+            yield tail
+
+    @staticmethod
+    def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+        """Nén gzip theo luồng, mỗi chunk đầu vào được nén và đẩy ra ngay"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def export_events(fmt: str, **filters) -> Iterator[str]:
+        rows = ExportService.iter_rows(ExportService.events_statement(**filters))
+        return ExportService.serialize(rows, EVENT_COLUMNS, fmt)
+
+    @staticmethod
+    def export_borrowings(fmt: str, **filters) -> Iterator[str]:
+        rows = ExportService.iter_rows(ExportService.borrowings_statement(**filters))
+        return ExportService.serialize(rows, BORROWING_COLUMNS, fmt)
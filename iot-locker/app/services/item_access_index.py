@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+from sqlalchemy import and_, exists, not_, or_
+from app.extensions import db
+from app.models.item_model import ItemModel
+from app.models.item_access_model import ItemAccessModel
+from app.services.resource_versions import resource_versions
+
+logger = logging.getLogger(__name__)
+
+
+class ItemAccessIndex:
+    """
+    Chỉ mục quyền truy cập item dùng chung cho cả process:
+    item_id -> tập user được phép, và tập các item không giới hạn (không có dòng item_access).
+    Được dựng bằng một query, cập nhật bởi ItemAccessService/ItemService/UserService.
+    Các service đó phát id item / user bị đổi qua resource_versions ("access_item_ids",
+    "access_user_ids"); worker khác đánh dấu các item đó cũ và nạp lại từ DB ở lần đọc sau
+    (trong request, không phải thread của paho). Resync (có thể đã lỡ message) -> dựng lại toàn bộ.
+    ITEM_ACCESS_INDEX_TTL giây là giới hạn cuối cùng trước khi dựng lại.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('ITEM_ACCESS_INDEX_TTL', 60))
+        self._lock = threading.Lock()
+        self._items: Set[int] = set()
+        self._allowed: Dict[int, Set[int]] = {}
+        # Item bị đổi ở worker khác, nạp lại trước lần đọc sau
+        self._stale: Set[int] = set()
+        self.built_at: Optional[float] = None
+        self.builds = 0
+        self.refreshes = 0
+
+    def build(self):
+        """Dựng lại toàn bộ chỉ mục bằng một LEFT JOIN items -> item_access (cần app context)"""
+        with self._lock:
+            self._stale.clear()
+        rows = (
+            db.session.query(ItemModel.id, ItemAccessModel.user_id)
+            .outerjoin(ItemAccessModel, ItemAccessModel.item_id == ItemModel.id)
+            .all()
+        )
+        items: Set[int] = set()
+        allowed: Dict[int, Set[int]] = {}
+        for item_id, user_id in rows:
+            items.add(item_id)
+            if user_id is not None:
+                allowed.setdefault(item_id, set()).add(user_id)
+        with self._lock:
+            self._items = items
+            self._allowed = allowed
+            self.built_at = time.monotonic()
+            self.builds += 1
+        logger.debug(f"Item access index built: {len(items)} items, {len(allowed)} restricted")
+
+    def ensure_built(self):
+        if self.built_at is None or time.monotonic() - self.built_at > self.ttl:
+            self.build()
+        else:
+            self._refresh_stale()
+
+    def _refresh_stale(self):
+        """Nạp lại các item bị đổi ở worker khác: một query items, một query item_access"""
+        with self._lock:
+            if not self._stale:
+                return
+            stale, self._stale = self._stale, set()
+        existing = {row.id for row in db.session.query(ItemModel.id).filter(ItemModel.id.in_(stale))}
+        allowed: Dict[int, Set[int]] = {}
+        for row in db.session.query(ItemAccessModel.item_id, ItemAccessModel.user_id) \
+                .filter(ItemAccessModel.item_id.in_(stale)):
+            allowed.setdefault(row.item_id, set()).add(row.user_id)
+        with self._lock:
+            for item_id in stale:
+                if item_id not in existing:
+                    self._items.discard(item_id)
+                    self._allowed.pop(item_id, None)
+                    continue
+                self._items.add(item_id)
+                if item_id in allowed:
+                    self._allowed[item_id] = allowed[item_id]
+                else:
+                    self._allowed.pop(item_id, None)
+            self.refreshes += 1
+
+    def is_warm(self) -> bool:
+        return self.built_at is not None and time.monotonic() - self.built_at <= self.ttl
+
+    def _load_item(self, item_id: int) -> bool:
+        """Nạp một item chưa có trong chỉ mục (vd. vừa tạo ở process khác)"""
+        if not db.session.query(exists().where(ItemModel.id == item_id)).scalar():
+            return False
+        user_ids = {
+            row.user_id
+            for row in db.session.query(ItemAccessModel.user_id).filter_by(item_id=item_id)
+        }
+        self.set_item(item_id, user_ids)
+        return True
+
+    def has_access(self, item_id: int, user_id: int) -> bool:
+        """User có được dùng item không: item không giới hạn hoặc user nằm trong danh sách"""
+        self.ensure_built()
+        with self._lock:
+            known = item_id in self._items
+            allowed = self._allowed.get(item_id)
+        if not known and not self._load_item(item_id):
+            return False
+        if not known:
+            with self._lock:
+                allowed = self._allowed.get(item_id)
+        return allowed is None or int(user_id) in allowed
+
+    def is_restricted(self, item_id: int) -> bool:
+        self.ensure_built()
+        with self._lock:
+            return item_id in self._allowed
+
+    def accessible_item_ids(self, user_id: int) -> Set[int]:
+        self.ensure_built()
+        user_id = int(user_id)
+        with self._lock:
+            return {
+                item_id for item_id in self._items
+                if item_id not in self._allowed or user_id in self._allowed[item_id]
+            }
+
+    # Cập nhật chỉ mục sau khi commit thay đổi quyền
+
+    def set_item(self, item_id: int, user_ids: Iterable[int]):
+        user_ids = set(user_ids)
+        with self._lock:
+            self._items.add(item_id)
+            if user_ids:
+                self._allowed[item_id] = user_ids
+            else:
+                self._allowed.pop(item_id, None)
+
+    def add_user(self, item_id: int, user_id: int):
+        with self._lock:
+            self._items.add(item_id)
+            self._allowed.setdefault(item_id, set()).add(user_id)
+
+    def remove_user(self, item_id: int, user_id: int):
+        with self._lock:
+            users = self._allowed.get(item_id)
+            if users is None:
+                return
+            users.discard(user_id)
+            if not users:
+                del self._allowed[item_id]
+
+    def add_item(self, item_id: int):
+        with self._lock:
+            self._items.add(item_id)
+
+    def remove_item(self, item_id: int):
+        with self._lock:
+            self._items.discard(item_id)
+            self._allowed.pop(item_id, None)
+
+    def remove_user_everywhere(self, user_id: int):
+        """Bỏ user khỏi mọi danh sách (item_access bị xóa theo ON DELETE CASCADE)"""
+        with self._lock:
+            for item_id in [i for i, users in self._allowed.items() if user_id in users]:
+                users = self._allowed[item_id]
+                users.discard(user_id)
+                if not users:
+                    del self._allowed[item_id]
+
+    def invalidate(self):
+        with self._lock:
+            self.built_at = None
+
+    def on_remote_change(self, payload: Optional[Dict[str, Any]]):
+        """Message từ worker khác (chạy trên thread của paho, không đụng DB); None = có thể đã lỡ message"""
+        if payload is None:
+            self.invalidate()
+            return
+        with self._lock:
+            for item_id in payload.get("access_item_ids") or []:
+                try:
+                    self._stale.add(int(item_id))
+                except (TypeError, ValueError):
+                    continue
+        for user_id in payload.get("access_user_ids") or []:
+            try:
+                self.remove_user_everywhere(int(user_id))
+            except (TypeError, ValueError):
+                continue
+
+    @staticmethod
+    def accessible_items_query(user_id: int):
+        """
+        Cùng kết quả với accessible_item_ids nhưng chạy hoàn toàn trong SQL, dùng khi chỉ mục
+        chưa được dựng: item không có dòng item_access nào (anti-join) hoặc có dòng cho user.
+        """
+        restricted = exists().where(ItemAccessModel.item_id == ItemModel.id)
+        granted = exists().where(and_(
+            ItemAccessModel.item_id == ItemModel.id,
+            ItemAccessModel.user_id == user_id,
+        ))
+        return ItemModel.query.filter(or_(not_(restricted), granted)).order_by(ItemModel.id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "warm": self.built_at is not None and time.monotonic() - self.built_at <= self.ttl,
+                "items": len(self._items),
+                "restricted_items": len(self._allowed),
+                "grants": sum(len(users) for users in self._allowed.values()),
+                "builds": self.builds,
+                "refreshes": self.refreshes,
+                "stale_items": len(self._stale),
+                "ttl_s": self.ttl,
+            }
+
+
+# Singleton instance
+item_access_index = ItemAccessIndex()
+resource_versions.add_listener(item_access_index.on_remote_change)
@@ -1,9 +1,12 @@
-from typing import List, Tuple, Optional
+from typing import Any, Dict, Iterable, List, Tuple, Optional
+from sqlalchemy import case, delete, func, insert
 from sqlalchemy.exc import SQLAlchemyError
 from app.extensions import db
 from app.models.item_model import ItemModel
 from app.models.user_model import UserModel
 from app.models.item_access_model import ItemAccessModel
+from app.services.item_access_index import item_access_index
+from app.services.resource_versions import resource_versions
 
 
 class ItemAccessService:
@@ -27,29 +30,124 @@ class ItemAccessService:
         )
         return q.all()
 
+    @staticmethod
+    def has_access(item_id: int, user_id: int) -> bool:
+        """
+        Item không giới hạn hoặc user nằm trong danh sách - tra trong item_access_index,
+        hoặc trong DB khi chưa chắc đã nhận mọi thay đổi quyền từ worker khác
+        """
+        if not resource_versions.is_synced():
+            return ItemAccessService.has_access_db(item_id, user_id)
+        return item_access_index.has_access(item_id, user_id)
+
+    @staticmethod
+    def has_access_db(item_id: int, user_id: int) -> bool:
+        """
+        Như has_access nhưng đọc thẳng bảng item_access (một query theo item_id, dùng index
+        uq_item_user_access). Dùng cho đường ghi (mượn): chỉ mục trong process có thể chưa thấy
+        thay đổi quyền vừa làm ở worker khác.
+        """
+        restricted, allowed = db.session.query(
+            func.count(ItemAccessModel.id),
+            func.count(case((ItemAccessModel.user_id == int(user_id), 1))),
+        ).filter(ItemAccessModel.item_id == item_id).one()
+        return not restricted or bool(allowed)
+
+    @staticmethod
+    def list_accessible_items(user_id: int) -> List[ItemModel]:
+        """
+        Các item user được dùng: lọc theo chỉ mục nếu đã dựng, ngược lại (hoặc khi mất kênh
+        đồng bộ với worker khác) dùng anti-join SQL
+        """
+        if not resource_versions.is_synced():
+            return item_access_index.accessible_items_query(user_id).all()
+        if not item_access_index.is_warm():
+            items = item_access_index.accessible_items_query(user_id).all()
+            item_access_index.build()
+            return items
+        item_ids = item_access_index.accessible_item_ids(user_id)
+        if not item_ids:
+            return []
+        return ItemModel.query.filter(ItemModel.id.in_(item_ids)).order_by(ItemModel.id).all()
+
     @staticmethod
     def set_item_access(item_id: int, user_ids: List[int]) -> Tuple[bool, Optional[str]]:
+        ok, err, _ = ItemAccessService.set_items_access([item_id], user_ids)
+        if not ok and err and err.startswith('Items not found'):
+            return False, 'Item not found.'
+        return ok, err
+
+    @staticmethod
+    def set_items_access(item_ids: Iterable[int], user_ids: Iterable[int]) \
+            -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Đặt cùng một danh sách user cho nhiều item trong một transaction, chỉ ghi phần chênh lệch:
+        kiểm tra item và user bằng một query IN mỗi loại (user không tồn tại bị bỏ qua như trước),
+        đọc quyền hiện có bằng một query, xóa bằng một DELETE và thêm bằng một INSERT nhiều dòng.
+        Trả về (ok, error, {"items", "granted", "revoked"}).
+        """
         try:
-            # Ensure item exists
-            item = ItemModel.query.get(item_id)
-            if not item:
-                return False, 'Item not found.'
+            item_ids = sorted(set(int(i) for i in item_ids))
+            unique_user_ids = set(int(uid) for uid in user_ids)
+            if not item_ids:
+                return True, None, {"items": 0, "granted": 0, "revoked": 0}
 
-            # Remove existing
-            ItemAccessModel.query.filter_by(item_id=item_id).delete()
+            found = {row.id for row in db.session.query(ItemModel.id).filter(ItemModel.id.in_(item_ids))}
+            missing = [i for i in item_ids if i not in found]
+            if missing:
+                return False, f'Items not found: {missing}', None
 
-            # Insert new unique pairs
-            unique_user_ids = sorted(set(int(uid) for uid in user_ids))
-            for uid in unique_user_ids:
-                # Skip if user not exist
-                if not UserModel.query.get(uid):
-                    continue
-                db.session.add(ItemAccessModel(item_id=item_id, user_id=uid))
+            granted = set()
+            if unique_user_ids:
+                granted = {
+                    row.id for row in db.session.query(UserModel.id).filter(UserModel.id.in_(unique_user_ids))
+                }
+
+            current: Dict[int, set] = {item_id: set() for item_id in item_ids}
+            for row in db.session.query(ItemAccessModel.item_id, ItemAccessModel.user_id) \
+                    .filter(ItemAccessModel.item_id.in_(item_ids)):
+                current[row.item_id].add(row.user_id)
+
+            to_insert = [
+                {"item_id": item_id, "user_id": uid}
+                for item_id in item_ids
+                for uid in sorted(granted - current[item_id])
+            ]
+            revoked = sum(len(users - granted) for users in current.values())
+
+            # Mọi item nhận cùng một tập user nên phần cần xóa gom được trong một câu DELETE
+            if revoked:
+                stmt = delete(ItemAccessModel).where(ItemAccessModel.item_id.in_(item_ids))
+                if granted:
+                    stmt = stmt.where(ItemAccessModel.user_id.not_in(granted))
+                db.session.execute(stmt)
+            if to_insert:
+                db.session.execute(insert(ItemAccessModel), to_insert)
             db.session.commit()
-            return True, None
+
+            for item_id in item_ids:
+                item_access_index.set_item(item_id, granted)
+            resource_versions.bump(access_item_ids=item_ids)
+            return True, None, {"items": len(item_ids), "granted": len(to_insert), "revoked": revoked}
         except SQLAlchemyError as e:
             db.session.rollback()
-            return False, str(e)
+            return False, str(e), None
+
+    @staticmethod
+    def copy_item_access(source_item_id: int, item_ids: Optional[Iterable[int]] = None,
+                         cell_id: Optional[int] = None) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+        """Chép danh sách quyền của một item sang các item khác (item_ids và/hoặc mọi item trong cell_id)"""
+        if not db.session.query(db.exists().where(ItemModel.id == source_item_id)).scalar():
+            return False, 'Item not found.', None
+        targets = set(int(i) for i in (item_ids or []))
+        if cell_id is not None:
+            targets.update(row.id for row in db.session.query(ItemModel.id).filter(ItemModel.cell_id == cell_id))
+        targets.discard(source_item_id)
+        user_ids = [
+            row.user_id for row in
+            db.session.query(ItemAccessModel.user_id).filter(ItemAccessModel.item_id == source_item_id)
+        ]
+        return ItemAccessService.set_items_access(targets, user_ids)
 
     @staticmethod
     def add_user_to_item(item_id: int, user_id: int) -> Tuple[bool, Optional[str]]:
@@ -63,6 +161,8 @@ class ItemAccessService:
                 return True, None
             db.session.add(ItemAccessModel(item_id=item_id, user_id=user_id))
             db.session.commit()
+            item_access_index.add_user(item_id, user_id)
+            resource_versions.bump(access_item_ids=[item_id])
             return True, None
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -76,6 +176,8 @@ class ItemAccessService:
                 return True, None
             db.session.delete(row)
             db.session.commit()
+            item_access_index.remove_user(item_id, user_id)
+            resource_versions.bump(access_item_ids=[item_id])
             return True, None
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -2,6 +2,9 @@
 from app.extensions import db
 from app.models.item_model import ItemModel, ItemStatus
 from sqlalchemy.exc import SQLAlchemyError
+from app.services.item_access_index import item_access_index
+from app.services.dashboard_service import DashboardService
+from app.services.resource_versions import resource_versions
 
 class ItemService:
 
@@ -17,6 +20,9 @@ class ItemService:
             item = ItemModel(**filtered_data)
             db.session.add(item)
             db.session.commit()
+            item_access_index.add_item(item.id)
+            resource_versions.bump('items', access_item_ids=[item.id])
+            DashboardService.invalidate()
             return item, None
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -27,7 +33,10 @@ class ItemService:
         return ItemModel.query.get(item_id)
 
     @staticmethod
-    def get_all_items():
+    def get_all_items(projection=None):
+        """projection (SchemaProjection): trả về tuple đã chiếu thay vì ORM object"""
+        if projection is not None:
+            return projection.query().all()
         return ItemModel.query.all()
 
     @staticmethod
@@ -49,6 +58,8 @@ class ItemService:
                     elif hasattr(item, key):
                         setattr(item, key, value)
                 db.session.commit()
+                resource_versions.bump('items')
+                DashboardService.invalidate()
                 return item, None
             except SQLAlchemyError as e:
                 db.session.rollback()
@@ -68,6 +79,8 @@ class ItemService:
                     return None, 'Item must be borrowed to return.'
                 item.status = ItemStatus(value)
                 db.session.commit()
+                resource_versions.bump('items')
+                DashboardService.invalidate()
                 return item, None
             except SQLAlchemyError as e:
                 db.session.rollback()
@@ -84,6 +97,9 @@ class ItemService:
         try:
             db.session.delete(item)
             db.session.commit()
+            item_access_index.remove_item(item_id)
+            resource_versions.bump('items', access_item_ids=[item_id])
+            DashboardService.invalidate()
             return True, None
         except SQLAlchemyError as e:
             db.session.rollback()
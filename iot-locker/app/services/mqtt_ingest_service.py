@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+import zlib
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentinel để báo worker dừng
+_STOP = object()
+
+
+class MQTTIngestService:
+    """
+    Tầng ingest cho message MQTT.
+    Callback của paho chỉ đẩy message thô vào hàng đợi có giới hạn, còn một pool
+    worker sẽ lấy ra theo micro-batch và gọi handler(batch) với list (topic, payload_bytes).
+    Message được chia shard theo topic nên các message của cùng một cell luôn được
+    xử lý tuần tự, đúng thứ tự nhận.
+    """
+
+    def __init__(self, handler: Optional[Callable[[List[Tuple[str, bytes]]], None]] = None):
+        self.handler = handler
+        self.queue_size = max(1, int(os.getenv('MQTT_INGEST_QUEUE_SIZE', 1000)))
+        self.num_workers = max(1, int(os.getenv('MQTT_INGEST_WORKERS', 2)))
+        self.batch_size = max(1, int(os.getenv('MQTT_INGEST_BATCH_SIZE', 50)))
+        self.batch_wait = float(os.getenv('MQTT_INGEST_BATCH_WAIT_MS', 50)) / 1000.0
+
+        self.queues: List[queue.Queue] = []
+        self.workers: List[threading.Thread] = []
+        self.running = False
+
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def start(self):
+        """Khởi động pool worker (idempotent)"""
+        if self.running:
+            return
+        self.running = True
+        per_worker = max(1, self.queue_size // self.num_workers)
+        self.queues = [queue.Queue(maxsize=per_worker) for _ in range(self.num_workers)]
+        self.workers = []
+        for index, q in enumerate(self.queues):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(q,),
+                name=f"mqtt-ingest-{index}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+        logger.info(
+            f"MQTT ingest started: {self.num_workers} workers, queue {self.queue_size}, "
+            f"batch {self.batch_size}/{int(self.batch_wait * 1000)}ms"
+        )
+
+    def stop(self, timeout: float = 5.0):
+        """Dừng pool worker, xử lý nốt phần message đang có trong hàng đợi"""
+        if not self.running:
+            return
+        self.running = False
+        for q in self.queues:
+            try:
+                q.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+        logger.info("MQTT ingest stopped")
+
+    def submit(self, topic: str, payload: bytes) -> bool:
+        """Đưa message vào hàng đợi. Không bao giờ block thread gọi (network thread của paho)."""
+        if not self.running:
+            return False
+        shard = zlib.crc32(topic.encode()) % len(self.queues)
+        try:
+            self.queues[shard].put_nowait((topic, payload))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.warning(f"MQTT ingest queue full, dropping message on '{topic}'")
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _worker_loop(self, q: queue.Queue):
+        stopping = False
+        while not stopping:
+            try:
+                first = q.get(timeout=0.5)
+            except queue.Empty:
+                if not self.running:
+                    break
+                continue
+            if first is _STOP:
+                break
+
+            # Gom thêm message trong cửa sổ batch_wait
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[str, bytes]]):
+        started = time.perf_counter()
+        ok = True
+        try:
+            if self.handler:
+                self.handler(batch)
+        except Exception as e:
+            ok = False
+            logger.error(f"Error processing MQTT batch of {len(batch)} messages: {e}")
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        with self._stats_lock:
+            self.batches += 1
+            self.processed += len(batch)
+            if not ok:
+                self.failed_batches += 1
+            self.last_batch_ms = elapsed_ms
+            self.total_batch_ms += elapsed_ms
+            if elapsed_ms > self.max_batch_ms:
+                self.max_batch_ms = elapsed_ms
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def get_stats(self) -> dict:
+        """Thống kê hàng đợi và độ trễ xử lý batch"""
+        with self._stats_lock:
+            avg_ms = self.total_batch_ms / self.batches if self.batches else 0.0
+            return {
+                "running": self.running,
+                "workers": self.num_workers,
+                "queue_depth": self.queue_depth(),
+                "queue_capacity": sum(q.maxsize for q in self.queues) or self.queue_size,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "batch_latency_ms": {
+                    "last": round(self.last_batch_ms, 3),
+                    "avg": round(avg_ms, 3),
+                    "max": round(self.max_batch_ms, 3),
+                },
+            }
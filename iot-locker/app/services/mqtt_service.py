@@ -1,15 +1,41 @@
 import os
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 import paho.mqtt.client as mqtt
+from sqlalchemy import insert
 from app.extensions import db
 from app.models.cell_model import CellModel, CellStatus
 from app.models.cell_event_model import CellEventModel, LockerEventType
+from app.services.mqtt_ingest_service import MQTTIngestService
+from app.services.cell_state_cache import cell_state_cache
+from app.services.command_ack_service import command_ack_tracker, EVENT_STATUS
+from app.services.cell_stream_service import cell_stream_broker
+from app.services.resource_versions import resource_versions, RESOURCE_TOPIC
 from datetime import datetime
 from app.utils.timezone_helper import get_vn_utc_now
+from app.utils.metrics import metrics, FAST_BUCKETS
 
 logger = logging.getLogger(__name__)
+# Log từng message MQTT (dày đặc, được sampling qua LOG_SAMPLE); log lệnh/kết nối dùng logger chính
+message_logger = logging.getLogger(f'{__name__}.messages')
+
+MESSAGES_RECEIVED = metrics.counter(
+    'mqtt_messages_received_total', 'MQTT messages received by topic type', ('type',))
+MESSAGES_PUBLISHED = metrics.counter(
+    'mqtt_messages_published_total', 'MQTT messages published by topic type and result', ('type', 'result'))
+CELL_STATUS_SECONDS = metrics.histogram(
+    'mqtt_handle_cell_status_seconds', 'Time spent applying one cell status message', (), FAST_BUCKETS)
+STATUS_BATCH_SECONDS = metrics.histogram(
+    'mqtt_status_batch_seconds', 'Time spent applying one batch of status messages (query + commit)')
+
+
+def topic_type(topic: str) -> str:
+    """locker/cell/<id>/<type> -> <type>; topic khác gom vào 'other' để số nhãn có giới hạn"""
+    parts = topic.split('/')
+    if len(parts) == 4 and parts[0] == 'locker' and parts[1] == 'cell':
+        return parts[3]
+    return 'other'
 
 class MQTTService:
     def __init__(self):
@@ -21,15 +47,20 @@ class MQTTService:
         self.password = os.getenv('MQTT_PASSWORD', '')
         self.keepalive = int(os.getenv('MQTT_KEEPALIVE', 60))
         self.connected = False
+        # Hàng đợi + worker pool xử lý message, tách khỏi network thread của paho
+        self.ingest = MQTTIngestService(self.process_batch)
         
     def on_connect(self, client, userdata, flags, rc):
         """Callback khi kết nối MQTT broker"""
         if rc == 0:
             self.connected = True
             logger.info(f"Connected to MQTT broker at {self.broker_host}:{self.broker_port}")
+            cell_stream_broker.publish("mqtt_status", {"connected": True})
             
             # Subscribe các topic quan trọng
             self.subscribe_topics()
+            # Có thể đã lỡ thông báo đổi dữ liệu khi mất kết nối: bỏ hết ETag cũ
+            resource_versions.resync()
         else:
             self.connected = False
             logger.error(f"Failed to connect to MQTT broker. Code: {rc}")
@@ -38,79 +69,183 @@ class MQTTService:
         """Callback khi mất kết nối"""
         self.connected = False
         logger.warning(f"Disconnected from MQTT broker. Code: {rc}")
+        cell_stream_broker.publish("mqtt_status", {"connected": False})
     
     def on_message(self, client, userdata, msg):
-        """Callback khi nhận message"""
-        try:
-            topic = msg.topic
-            payload = json.loads(msg.payload.decode())
-            logger.info(f"Received message on topic '{topic}': {payload}")
-            
-            # Xử lý message theo topic
-            self.handle_message(topic, payload)
-            
-        except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
+        """Callback khi nhận message - chỉ đẩy vào hàng đợi ingest, không xử lý trên network thread"""
+        MESSAGES_RECEIVED.inc(topic_type(msg.topic))
+        if msg.topic == RESOURCE_TOPIC:
+            # Chỉ tăng bộ đếm phiên bản, xử lý ngay để ETag của worker này hết hạn sớm nhất
+            resource_versions.apply_remote(msg.payload)
+            return
+        self.ingest.submit(msg.topic, msg.payload)
     
-    def handle_message(self, topic: str, payload: Dict[str, Any]):
-        """Xử lý message theo topic"""
+    def process_batch(self, messages: List[Tuple[str, bytes]]):
+        """Xử lý một micro-batch message (chạy trên worker của MQTTIngestService)"""
+        parsed = []
+        for topic, raw_payload in messages:
+            try:
+                payload = json.loads(raw_payload.decode())
+            except (ValueError, UnicodeDecodeError) as e:
+                logger.error(f"Error decoding MQTT message on '{topic}': {e}")
+                continue
+            if not isinstance(payload, dict):
+                logger.warning(f"Ignoring non-object MQTT payload on '{topic}'")
+                continue
+            message_logger.debug(f"Received message on topic '{topic}': {payload}")
+            parsed.append((topic, payload))
+
+        if parsed:
+            self.handle_messages(parsed)
+    
+    def handle_messages(self, parsed: List[Tuple[str, Dict[str, Any]]]):
+        """Xử lý các message đã decode trong một app context"""
+        if not self.app:
+            return
+        with self.app.app_context():
+            status_messages = []
+            for topic, payload in parsed:
+                route = self.parse_topic(topic)
+                if not route:
+                    continue
+                cell_id, message_type = route
+                if message_type == 'status':
+                    status_messages.append((cell_id, payload))
+                elif message_type == 'event':
+                    self.handle_cell_event(cell_id, payload)
+
+            if status_messages:
+                self.handle_status_batch(status_messages)
+    
+    def parse_topic(self, topic: str) -> Optional[Tuple[int, str]]:
+        """Tách topic locker/cell/<id>/<type> thành (cell_id, message_type)"""
         topic_parts = topic.split('/')
-        
         if len(topic_parts) >= 4 and topic_parts[0] == 'locker' and topic_parts[1] == 'cell':
-            cell_id = int(topic_parts[2])
-            message_type = topic_parts[3]
-            
-            if message_type == 'status':
-                self.handle_cell_status(cell_id, payload)
-            elif message_type == 'event':
-                self.handle_cell_event(cell_id, payload)
+            try:
+                return int(topic_parts[2]), topic_parts[3]
+            except ValueError:
+                logger.warning(f"Invalid cell id in topic '{topic}'")
+        return None
+    
+    def handle_message(self, topic: str, payload: Dict[str, Any]):
+        """Xử lý message theo topic"""
+        self.handle_messages([(topic, payload)])
     
-    def handle_cell_status(self, cell_id: int, payload: Dict[str, Any]):
-        """Khi nhận status từ ESP32 (hoặc mqtt-monitor.html), cập nhật trạng thái cell trong DB và ghi log event"""
+    def handle_status_batch(self, status_messages: List[Tuple[int, Dict[str, Any]]]):
+        """
+        Áp dụng một loạt status message: một câu SELECT ... WHERE id IN (...),
+        một lần bulk insert cells_events và một lần commit cho cả batch.
+        Status trùng với trạng thái trong cell_state_cache bị bỏ qua mà không chạm DB.
+        """
+        # Lọc status trùng lặp theo cache, giữ thứ tự trong batch
+        pending = []
+        expected: Dict[int, str] = {}
+        for cell_id, payload in status_messages:
+            new_status = payload.get('status')
+            if new_status not in ('open', 'closed'):
+                message_logger.debug(f"Ignoring invalid status for cell {cell_id}: {new_status}")
+                continue
+            # Status báo về là ack cho lệnh đang chờ (kể cả khi trạng thái không đổi)
+            command_ack_tracker.resolve(cell_id, new_status, payload.get('correlation_id'))
+            current_status = expected[cell_id] if cell_id in expected else cell_state_cache.get_status(cell_id)
+            if current_status == new_status:
+                cell_state_cache.record_duplicate()
+                continue
+            expected[cell_id] = new_status
+            pending.append((cell_id, payload))
+
+        if not pending:
+            return
+
+        with STATUS_BATCH_SECONDS.time():
+            self._apply_status_batch(pending)
+
+    def _apply_status_batch(self, pending: List[Tuple[int, Dict[str, Any]]]):
         try:
-            if self.app:
-                with self.app.app_context():
-                    cell = CellModel.query.get(cell_id)
-                    if not cell:
-                        logger.warning(f"Cell {cell_id} not found in database")
-                        return
-                    new_status = payload.get('status')  # 'open' hoặc 'closed'
-                    current_status = cell.status.value if hasattr(cell.status, 'value') else cell.status
-                    if new_status and new_status != current_status:
-                        # Chuyển đổi string sang enum
-                        cell_status = CellStatus.open if new_status == 'open' else CellStatus.closed
-                        cell.status = cell_status
-                        
-                        if new_status == 'open':
-                            cell.last_open_at = get_vn_utc_now()
-                            event_type = LockerEventType.open
-                        elif new_status == 'closed':
-                            cell.last_close_at = get_vn_utc_now()
-                            event_type = LockerEventType.close
-                        
-                        # Ghi event với event_type là enum
-                        event = CellEventModel(
-                            locker_id=cell_id,
-                            user_id=1,  # Hoặc None nếu không xác định được user
-                            event_type=event_type,
-                            timestamp=get_vn_utc_now()
-                        )
-                        db.session.add(event)
-                        db.session.commit()
-                        logger.info(f"Updated cell {cell_id} status to {new_status} from MQTT")
-                    else:
-                        logger.info(f"Received status for cell {cell_id} but no change: {new_status}")
+            cell_ids = {cell_id for cell_id, _ in pending}
+            cells = {
+                cell.id: cell
+                for cell in CellModel.query.filter(CellModel.id.in_(cell_ids)).all()
+            }
+
+            event_rows = []
+            for cell_id, payload in pending:
+                with CELL_STATUS_SECONDS.time():
+                    event_row = self.handle_cell_status(cell_id, payload, cells.get(cell_id))
+                if event_row:
+                    event_rows.append(event_row)
+
+            # Chụp trạng thái trước commit để cập nhật cache mà không phải refresh từ DB
+            snapshots = [
+                (cell.id, cell.status.value, cell.last_open_at, cell.last_close_at)
+                for cell in cells.values()
+            ]
+            if event_rows:
+                db.session.execute(insert(CellEventModel), event_rows)
+                db.session.commit()
+                cell_state_cache.record_transition(len(event_rows))
+                logger.info(f"Applied {len(event_rows)} cell status changes from MQTT")
+            else:
+                db.session.rollback()
+
+            # Chỉ phát lên stream các cell mà process này thấy trạng thái đổi
+            # (process khác có thể đã ghi DB trước nên không dựa vào event_rows)
+            any_changed = False
+            for cell_id, status, last_open_at, last_close_at in snapshots:
+                previous = cell_state_cache.get_nowait(cell_id)
+                changed = not previous or previous["status"] != status
+                cell_state_cache.set(cell_id, status, last_open_at, last_close_at)
+                if changed:
+                    any_changed = True
+                    cell_stream_broker.publish_cell_state(cell_id, status, last_open_at, last_close_at)
+            if any_changed:
+                # Mọi worker đều nhận status nên không cần phát lại qua RESOURCE_TOPIC
+                resource_versions.bump('cells', broadcast=False)
         except Exception as e:
-            logger.error(f"Error handling status message: {e}")
-            if self.app:
-                with self.app.app_context():
-                    db.session.rollback()
+            logger.error(f"Error handling status batch: {e}")
+            db.session.rollback()
+    
+    def handle_cell_status(self, cell_id: int, payload: Dict[str, Any], cell: Optional[CellModel]) -> Optional[Dict[str, Any]]:
+        """
+        Khi nhận status từ ESP32 (hoặc mqtt-monitor.html), cập nhật trạng thái cell (chưa commit).
+        Trả về dữ liệu event cần ghi log nếu trạng thái thực sự thay đổi.
+        """
+        if not cell:
+            logger.warning(f"Cell {cell_id} not found in database")
+            return None
+        new_status = payload.get('status')  # 'open' hoặc 'closed'
+        current_status = cell.status.value if hasattr(cell.status, 'value') else cell.status
+        if new_status == current_status:
+            message_logger.debug(f"Received status for cell {cell_id} but no change: {new_status}")
+            return None
+
+        now = get_vn_utc_now()
+        if new_status == 'open':
+            cell.status = CellStatus.open
+            cell.last_open_at = now
+            event_type = LockerEventType.open
+        else:
+            cell.status = CellStatus.closed
+            cell.last_close_at = now
+            event_type = LockerEventType.close
+
+        message_logger.debug(f"Updated cell {cell_id} status to {new_status} from MQTT")
+        # Ghi event với event_type là enum
+        return {
+            "locker_id": cell_id,
+            "user_id": 1,  # Hoặc None nếu không xác định được user
+            "event_type": event_type,
+            "timestamp": now,
+        }
     
     def handle_cell_event(self, cell_id: int, payload: Dict[str, Any]):
-        """Log khi nhận event từ ESP32 - chỉ ghi log"""
+        """Log khi nhận event từ ESP32 - chỉ ghi log và ack lệnh đang chờ"""
         try:
-            logger.info(f"Received event from ESP32 cell {cell_id}: {payload}")
+            message_logger.debug(f"Received event from ESP32 cell {cell_id}: {payload}")
             # Chỉ ghi log, không cập nhật database
+            event_status = EVENT_STATUS.get(payload.get('event_type'))
+            if event_status:
+                command_ack_tracker.resolve(cell_id, event_status, payload.get('correlation_id'))
         except Exception as e:
             logger.error(f"Error handling event message: {e}")
     
@@ -119,6 +254,7 @@ class MQTTService:
         topics = [
             ("locker/cell/+/status", 0),  # Trạng thái từ ESP32
             ("locker/cell/+/event", 0),   # Events từ ESP32
+            (RESOURCE_TOPIC, 1),          # Thay đổi dữ liệu từ worker khác (ETag)
         ]
         
         for topic, qos in topics:
@@ -127,28 +263,50 @@ class MQTTService:
     
     def publish_command(self, cell_id: int, command: str, data: Optional[Dict] = None) -> bool:
         """Gửi lệnh điều khiển tới ESP32"""
+        return self.send_command(cell_id, command, data) is not None
+    
+    def send_command(self, cell_id: int, command: str, data: Optional[Dict] = None) -> Optional[str]:
+        """Gửi lệnh điều khiển tới ESP32, trả về correlation_id để theo dõi ack (None nếu lỗi)"""
         if not self.connected:
             logger.error("MQTT client not connected")
-            return False
+            return None
         
         topic = f"locker/cell/{cell_id}/command"
+        pending = command_ack_tracker.register(cell_id, command)
         payload = {
             "action": command,
             "timestamp": get_vn_utc_now().isoformat(),
+            "correlation_id": pending.correlation_id,
             **(data or {})
         }
         
         try:
             result = self.client.publish(topic, json.dumps(payload), qos=1)
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                MESSAGES_PUBLISHED.inc('command', 'ok')
                 logger.info(f"Published command to {topic}: {payload}")
-                return True
+                return pending.correlation_id
             else:
                 logger.error(f"Failed to publish command to {topic}")
-                return False
         except Exception as e:
             logger.error(f"Error publishing command: {e}")
+        MESSAGES_PUBLISHED.inc('command', 'error')
+        command_ack_tracker.discard(pending.correlation_id)
+        return None
+    
+    def publish_event(self, topic: str, payload: Dict[str, Any], qos: int = 1) -> bool:
+        """Publish thông báo (không phải lệnh điều khiển cell) lên một topic bất kỳ"""
+        if not self.connected:
+            logger.debug(f"MQTT client not connected, skipping publish to {topic}")
             return False
+        try:
+            result = self.client.publish(topic, json.dumps(payload), qos=qos)
+            ok = result.rc == mqtt.MQTT_ERR_SUCCESS
+        except Exception as e:
+            logger.error(f"Error publishing to {topic}: {e}")
+            ok = False
+        MESSAGES_PUBLISHED.inc(topic_type(topic), 'ok' if ok else 'error')
+        return ok
     
     def connect(self):
         """Kết nối tới MQTT broker"""
@@ -164,6 +322,9 @@ class MQTTService:
             if self.username and self.password:
                 self.client.username_pw_set(self.username, self.password)
             
+            # Khởi động worker ingest trước khi nhận message
+            self.ingest.start()
+            
             # Kết nối
             self.client.connect(self.broker_host, self.broker_port, self.keepalive)
             
@@ -183,6 +344,22 @@ class MQTTService:
             self.client.loop_stop()
             self.client.disconnect()
             logger.info("MQTT client disconnected")
+        self.ingest.stop()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Trạng thái kết nối broker và thống kê hàng đợi ingest"""
+        return {
+            "connected": self.connected,
+            "broker": f"{self.broker_host}:{self.broker_port}",
+            "ingest": self.ingest.get_stats(),
+        }
 
 # Singleton instance
 mqtt_service = MQTTService()
+
+metrics.gauge('mqtt_broker_connected', 'Whether this process is connected to the MQTT broker') \
+    .set_function(lambda: 1.0 if mqtt_service.connected else 0.0)
+metrics.gauge('mqtt_ingest_queue_depth', 'Messages waiting in the MQTT ingest queues') \
+    .set_function(mqtt_service.ingest.queue_depth)
+
+resource_versions.attach(mqtt_service.publish_event, lambda: mqtt_service.connected)
@@ -0,0 +1,135 @@
+import os
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+from app.extensions import db
+from app.models.borrowings_model import BorrowingModel, BorrowStatus
+from app.models.item_model import ItemModel
+from app.services.mqtt_service import mqtt_service
+from app.services.cell_stream_service import cell_stream_broker
+from app.services.dashboard_service import DashboardService
+from app.utils.timezone_helper import get_vn_utc_now
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_TOPIC = "locker/borrowings/overdue"
+
+
+class OverdueScheduler:
+    """
+    Định kỳ chuyển các borrowing đã quá expected_return_at sang trạng thái overdue.
+    Mỗi tick: SELECT các dòng đến hạn qua index (status, expected_return_at) với
+    FOR UPDATE SKIP LOCKED, một câu UPDATE hàng loạt, rồi phát thông báo MQTT + SSE
+    cho từng borrowing vừa quá hạn. Chi phí tỷ lệ với số dòng đến hạn, không phải kích thước bảng.
+    SKIP LOCKED giúp nhiều worker gunicorn chạy cùng lúc mà không thông báo trùng.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = os.getenv('OVERDUE_SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.interval = max(1.0, float(os.getenv('OVERDUE_SCAN_INTERVAL', 60)))
+        self.batch_size = max(1, int(os.getenv('OVERDUE_BATCH_SIZE', 500)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.ticks = 0
+        self.flipped = 0
+
+    def run_once(self, now=None) -> List[Dict[str, Any]]:
+        """Một tick quét (cần app context). Trả về danh sách borrowing vừa chuyển sang overdue."""
+        now = now or get_vn_utc_now()
+        flipped = []
+        while True:
+            due = (
+                db.session.query(
+                    BorrowingModel.id,
+                    BorrowingModel.user_id,
+                    BorrowingModel.item_id,
+                    BorrowingModel.expected_return_at,
+                )
+                .filter(
+                    BorrowingModel.status == BorrowStatus.borrowing,
+                    BorrowingModel.expected_return_at <= now,
+                )
+                .order_by(BorrowingModel.expected_return_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not due:
+                db.session.rollback()
+                break
+
+            due_ids = [row.id for row in due]
+            db.session.query(BorrowingModel).filter(
+                BorrowingModel.id.in_(due_ids),
+                BorrowingModel.status == BorrowStatus.borrowing,
+            ).update({BorrowingModel.status: BorrowStatus.overdue}, synchronize_session=False)
+            db.session.commit()
+
+            cells = dict(
+                db.session.query(ItemModel.id, ItemModel.cell_id)
+                .filter(ItemModel.id.in_({row.item_id for row in due}))
+                .all()
+            )
+            batch = [{
+                "borrowing_id": row.id,
+                "user_id": row.user_id,
+                "item_id": row.item_id,
+                "cell_id": cells.get(row.item_id),
+                "expected_return_at": row.expected_return_at.isoformat(),
+            } for row in due]
+            flipped.extend(batch)
+            if len(due) < self.batch_size:
+                break
+
+        if flipped:
+            DashboardService.invalidate()
+            for notice in flipped:
+                self.notify(notice)
+            logger.info(f"Marked {len(flipped)} borrowings as overdue")
+        self.ticks += 1
+        self.flipped += len(flipped)
+        return flipped
+
+    def notify(self, notice: Dict[str, Any]):
+        """Thông báo một borrowing vừa quá hạn qua MQTT và stream SSE"""
+        mqtt_service.publish_event(OVERDUE_TOPIC, notice)
+        cell_stream_broker.publish("borrowing_overdue", notice)
+
+    def start(self, app):
+        """Chạy vòng quét trên thread nền (idempotent)"""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self.app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="overdue-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Overdue scheduler started, interval {self.interval:.0f}s")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.run_once()
+            except Exception as e:
+                logger.error(f"Overdue scan failed: {e}")
+            self._stop.wait(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "interval_s": self.interval,
+            "ticks": self.ticks,
+            "flipped": self.flipped,
+        }
+
+
+# Singleton instance
+overdue_scheduler = OverdueScheduler()
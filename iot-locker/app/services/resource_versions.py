@@ -0,0 +1,106 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ('cells', 'items', 'users')
+# Topic để các worker báo cho nhau resource nào vừa đổi
+RESOURCE_TOPIC = os.getenv('RESOURCE_VERSION_TOPIC', 'locker/server/resource-changed')
+
+
+class ResourceVersions:
+    """
+    Số phiên bản của từng danh sách (cells/items/users) dùng làm ETag cho GET có điều kiện.
+    Write path của service gọi bump() sau commit; số được giữ trong process (giống các cache khác):
+    - bump() ở một worker được phát qua RESOURCE_TOPIC để các worker khác bump theo;
+    - status MQTT của cell tới mọi worker nên mỗi worker tự bump, không cần phát lại.
+    ETag gồm token ngẫu nhiên của process nên worker khác / process vừa khởi động lại không bao giờ
+    khớp ETag cũ (chỉ tốn một lần trả 200). Khi RESOURCE_VERSION_SYNC=mqtt (mặc định) mà mất kết nối
+    broker thì không trả ETag (có thể đã lỡ thông báo của worker khác), kết nối lại thì đổi token.
+    RESOURCE_VERSION_SYNC=local: chạy một process, tin số phiên bản cục bộ.
+    Cache khác dùng chung kênh này qua add_listener() (vd. user_cache xóa user theo "user_ids").
+    """
+
+    def __init__(self):
+        self.sync = os.getenv('RESOURCE_VERSION_SYNC', 'mqtt').lower()
+        self.process_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = {resource: 0 for resource in RESOURCES}
+        # Gắn bởi mqtt_service (tránh import vòng): hàm publish và hàm kiểm tra kết nối
+        self._publish: Optional[Callable[[str, Dict[str, Any]], bool]] = None
+        self._connected: Callable[[], bool] = lambda: False
+        self.remote_bumps = 0
+        # callback(payload) cho message từ worker khác, callback(None) khi resync (có thể đã lỡ message)
+        self._listeners: List[Callable[[Optional[Dict[str, Any]]], None]] = []
+
+    def attach(self, publish: Callable[[str, Dict[str, Any]], bool], connected: Callable[[], bool]):
+        self._publish = publish
+        self._connected = connected
+
+    def add_listener(self, callback: Callable[[Optional[Dict[str, Any]]], None]):
+        self._listeners.append(callback)
+
+    def is_synced(self) -> bool:
+        """True nếu chắc chắn đã nhận mọi thông báo thay đổi từ worker khác"""
+        return self.sync != 'mqtt' or self._connected()
+
+    def _notify(self, payload: Optional[Dict[str, Any]]):
+        for callback in self._listeners:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Resource change listener failed: {e}")
+
+    def bump(self, *resources: str, broadcast: bool = True, **details: Any):
+        """Gọi sau khi commit thay đổi một hoặc nhiều danh sách; details đi kèm message (vd. user_ids)"""
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] += 1
+        if broadcast and self.sync == 'mqtt' and self._publish is not None:
+            self._publish(RESOURCE_TOPIC, {"origin": self.process_id, "resources": list(resources), **details})
+
+    def apply_remote(self, raw_payload: bytes):
+        """Message từ RESOURCE_TOPIC (chạy trên network thread của paho, chỉ tăng bộ đếm)"""
+        try:
+            payload = json.loads(raw_payload.decode())
+            if payload.get("origin") == self.process_id:
+                return
+            resources = [r for r in payload.get("resources", []) if r in self._versions]
+        except (ValueError, UnicodeDecodeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid resource change message: {e}")
+            return
+        if resources:
+            self.bump(*resources, broadcast=False)
+            self.remote_bumps += 1
+        self._notify(payload)
+
+    def resync(self):
+        """Đổi token (vd. sau khi kết nối lại broker): mọi ETag đã phát ra không còn khớp"""
+        with self._lock:
+            self._token = uuid.uuid4().hex[:8]
+        self._notify(None)
+
+    def etag(self, resource: str) -> Optional[str]:
+        """ETag hiện tại của danh sách, None nếu không đảm bảo được đã thấy mọi thay đổi"""
+        if not self.is_synced():
+            return None
+        return f"{resource}-{self._token}-{self._versions[resource]}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sync": self.sync,
+                "synced": self.is_synced(),
+                "token": self._token,
+                "versions": dict(self._versions),
+                "remote_bumps": self.remote_bumps,
+            }
+
+
+# Singleton instance
+resource_versions = ResourceVersions()
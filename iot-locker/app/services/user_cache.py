@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+import logging
+from typing import Any, Dict, Optional
+from flask import g, has_app_context
+from app.extensions import db
+from app.models.user_model import UserModel
+from app.services.resource_versions import resource_versions
+
+logger = logging.getLogger(__name__)
+
+
+class CachedUser:
+    """Bản chụp gọn của một user (không gắn với session SQLAlchemy)"""
+
+    __slots__ = ("id", "username", "full_name", "role", "version")
+
+    def __init__(self, id: int, username: str, full_name: str, role: str, version: int):
+        self.id = id
+        self.username = username
+        self.full_name = full_name
+        self.role = role
+        self.version = version
+
+
+def user_version(updated_at) -> int:
+    """Version stamp của user, lấy từ updated_at (đổi mỗi khi user được cập nhật)"""
+    return int(updated_at.timestamp()) if updated_at else 0
+
+
+class UserCache:
+    """
+    Cache user theo id ở hai tầng: trong request (flask.g) và trong process (TTL USER_CACHE_TTL giây).
+    UserService.update_user/delete_user xóa entry sau khi commit và gửi user_ids qua kênh của
+    resource_versions để các worker khác xóa theo. Khi kênh đó mất kết nối (có thể lỡ message)
+    thì bỏ qua tầng process và đọc DB; kết nối lại thì xóa sạch cache. Version stamp được đưa
+    vào token (claim "ver") để role_required nhận ra token cấp trước khi user bị đổi role.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('USER_CACHE_TTL', 30))
+        self._lock = threading.Lock()
+        self._users: Dict[int, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _request_cache(self) -> Optional[Dict[int, Optional[CachedUser]]]:
+        if not has_app_context():
+            return None
+        if 'user_cache' not in g:
+            g.user_cache = {}
+        return g.user_cache
+
+    def get(self, user_id) -> Optional[CachedUser]:
+        """Lấy user theo id: request cache -> process cache -> DB (None nếu không tồn tại)"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        request_cache = self._request_cache()
+        if request_cache is not None and user_id in request_cache:
+            return request_cache[user_id]
+
+        now = time.monotonic()
+        synced = resource_versions.is_synced()
+        with self._lock:
+            entry = self._users.get(user_id) if synced else None
+            if entry and now - entry[1] < self.ttl:
+                self.hits += 1
+                user = entry[0]
+            else:
+                self.misses += 1
+                user = None
+                entry = None
+
+        if entry is None:
+            user = self._load(user_id)
+            if synced:
+                with self._lock:
+                    self._users[user_id] = (user, time.monotonic())
+
+        if request_cache is not None:
+            request_cache[user_id] = user
+        return user
+
+    def _load(self, user_id: int) -> Optional[CachedUser]:
+        row = db.session.query(
+            UserModel.id, UserModel.username, UserModel.full_name, UserModel.role, UserModel.updated_at
+        ).filter(UserModel.id == user_id).first()
+        if not row:
+            return None
+        role = row.role.value if hasattr(row.role, 'value') else row.role
+        return CachedUser(row.id, row.username, row.full_name, role, user_version(row.updated_at))
+
+    def invalidate(self, user_id):
+        """Gọi sau khi commit thay đổi user"""
+        user_id = int(user_id)
+        with self._lock:
+            self._users.pop(user_id, None)
+        request_cache = self._request_cache()
+        if request_cache is not None:
+            request_cache.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def on_remote_change(self, payload: Optional[Dict[str, Any]]):
+        """Message từ worker khác (chạy trên thread của paho); None = có thể đã lỡ message"""
+        if payload is None:
+            self.clear()
+            return
+        user_ids = payload.get("user_ids") or []
+        with self._lock:
+            for user_id in user_ids:
+                try:
+                    self._users.pop(int(user_id), None)
+                except (TypeError, ValueError):
+                    continue
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "ttl_s": self.ttl,
+            }
+
+
+# Singleton instance
+user_cache = UserCache()
+resource_versions.add_listener(user_cache.on_remote_change)
@@ -1,6 +1,10 @@
 from app.extensions import db
 from app.models.user_model import UserModel
 from passlib.hash import pbkdf2_sha256
+from app.services.item_access_index import item_access_index
+from app.services.dashboard_service import DashboardService
+from app.services.user_cache import user_cache
+from app.services.resource_versions import resource_versions
 
 class UserService:
     @staticmethod
@@ -31,6 +35,8 @@ class UserService:
         )
         db.session.add(user)
         db.session.commit()
+        resource_versions.bump('users')
+        DashboardService.invalidate()
         return user
 
     @staticmethod
@@ -58,6 +64,9 @@ class UserService:
         if 'full_name' in data:
             user.full_name = data['full_name']
         db.session.commit()
+        user_cache.invalidate(user_id)
+        # user_ids: worker khác xóa user khỏi user_cache (đổi role / xóa user có hiệu lực ngay)
+        resource_versions.bump('users', user_ids=[int(user_id)])
         return user
 
     @staticmethod
@@ -68,4 +77,8 @@ class UserService:
             return False
         db.session.delete(user)
         db.session.commit()
+        item_access_index.remove_user_everywhere(user_id)
+        user_cache.invalidate(user_id)
+        resource_versions.bump('users', user_ids=[int(user_id)], access_user_ids=[int(user_id)])
+        DashboardService.invalidate()
         return True
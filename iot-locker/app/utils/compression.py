@@ -0,0 +1,79 @@
+import os
+import gzip
+from flask import request
+from app.utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # Brotli là tùy chọn, không có thì chỉ nén gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/csv', 'text/html')
+
+COMPRESSED_RESPONSES = metrics.counter(
+    'http_compressed_responses_total', 'Responses compressed by the app, by encoding', ('encoding',))
+COMPRESSION_SAVED_BYTES = metrics.counter(
+    'http_compression_saved_bytes_total', 'Bytes saved by response compression', ('encoding',))
+
+
+class ResponseCompressor:
+    """
+    Nén response theo Accept-Encoding (br nếu có thư viện brotli, ngược lại gzip) khi body từ
+    COMPRESS_MIN_SIZE byte. Bỏ qua response stream (SSE, export), response đã có Content-Encoding
+    (export ?gzip=1) và 304/204. ETag được chuyển thành weak (W/"...") vì body đã nén khác byte
+    nhưng cùng nội dung; If-None-Match so sánh weak nên conditional GET vẫn khớp.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.min_size = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+        self.gzip_level = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+        self.brotli_quality = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    def choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br'] > 0 and accepted['br'] >= accepted['gzip']:
+            return 'br'
+        if accepted['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def process(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+        compressed = self.compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        COMPRESSED_RESPONSES.inc(encoding)
+        COMPRESSION_SAVED_BYTES.inc(encoding, amount=len(data) - len(compressed))
+        return response
+
+    def install(self, app):
+        """Đăng ký trước các after_request khác để chạy sau cùng (Flask gọi theo thứ tự ngược)"""
+        if not self.enabled:
+            return
+        app.after_request(self.process)
+
+
+# Singleton instance
+response_compressor = ResponseCompressor()
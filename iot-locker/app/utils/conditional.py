@@ -0,0 +1,44 @@
+import zlib
+from functools import wraps
+from flask import request, make_response
+from app.services.resource_versions import resource_versions
+from app.utils.metrics import metrics
+from app.schemas.projection import fields_arg
+
+CONDITIONAL_GETS = metrics.counter(
+    'http_conditional_get_total', 'Conditional GETs on list endpoints by resource and result',
+    ('resource', 'result'))
+
+
+def conditional_get(resource: str):
+    """
+    Decorator cho GET danh sách (đặt sau @jwt_required): gắn ETag theo số phiên bản của resource,
+    If-None-Match khớp -> 304 ngay, không chạy view (không query, không serialize).
+    ETag được lấy trước khi chạy view: nếu dữ liệu đổi giữa chừng, lần sau client vẫn nhận 200.
+    ?fields= đổi nội dung response nên được trộn vào ETag (mỗi tập field một ETag riêng).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            etag = resource_versions.etag(resource)
+            if etag is None:
+                CONDITIONAL_GETS.inc(resource, 'unsynced')
+                return fn(*args, **kwargs)
+            names = fields_arg(request.args)
+            if names:
+                etag = f"{etag}-f{zlib.crc32(','.join(sorted(names)).encode()):08x}"
+            # So sánh weak: response nén mang ETag W/"..." (xem compression.py)
+            if request.if_none_match.contains_weak(etag):
+                CONDITIONAL_GETS.inc(resource, 'not_modified')
+                response = make_response('', 304)
+            else:
+                CONDITIONAL_GETS.inc(resource, 'full')
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Trình duyệt luôn hỏi lại server (dữ liệu theo quyền của token)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,39 @@
+from flask import Response, request, stream_with_context
+from app.services.export_service import ExportService, EXPORT_FORMATS
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_format():
+    """Đọc ?format=ndjson|csv (mặc định ndjson), None nếu không hỗ trợ"""
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+def wants_gzip() -> bool:
+    return request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+
+def streaming_export_response(chunks, fmt: str, basename: str) -> Response:
+    """
+    Trả về response dạng chunked (không có Content-Length) từ generator chunks.
+    Với ?gzip=1 thì nén theo luồng và đặt Content-Encoding: gzip.
+    """
+    headers = {
+        'Content-Disposition': f'attachment; filename="{basename}.{fmt}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    }
+    if wants_gzip():
+        chunks = ExportService.gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    # Giữ app/request context trong suốt quá trình stream để đọc DB bằng server-side cursor
+    return Response(
+        stream_with_context(chunks),
+        mimetype=MIMETYPES[fmt],
+        headers=headers,
+    )
@@ -0,0 +1,191 @@
+import os
+import time
+import random
+import hashlib
+import threading
+import logging
+from datetime import timedelta
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+from flask import request, jsonify, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.idempotency_key_model import IdempotencyKeyModel
+from app.utils.timezone_helper import get_vn_utc_now
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+_KEYS = IdempotencyKeyModel.__table__
+
+
+class IdempotencyCache:
+    """
+    Lưu response của các request ghi có header Idempotency-Key trong bảng idempotency_keys
+    (unique theo user, method, path, key), nên retry / replay outbox về worker nào cũng được dedup.
+    Request đầu tiên INSERT một dòng "đang xử lý" trước khi chạy view; request trùng gặp
+    IntegrityError thì đọc dòng đó: đã xong -> trả lại response đã lưu, chưa xong -> chờ.
+    Key sống IDEMPOTENCY_TTL giây; dòng "đang xử lý" quá IDEMPOTENCY_STALE_AFTER giây (worker chết
+    giữa chừng) được request sau tiếp quản.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('IDEMPOTENCY_TTL', 86400))
+        self.wait_timeout = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 30))
+        self.stale_after = float(os.getenv('IDEMPOTENCY_STALE_AFTER', 300))
+        # Xác suất một request dọn các key hết hạn (tránh cần job riêng)
+        self.purge_probability = float(os.getenv('IDEMPOTENCY_PURGE_PROBABILITY', 0.01))
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.conflicts = 0
+
+    def _incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _load(key: Tuple) -> Optional[Any]:
+        user_id, method, path, idem_key = key
+        return db.session.execute(
+            select(_KEYS.c.id, _KEYS.c.fingerprint, _KEYS.c.status_code, _KEYS.c.body,
+                   _KEYS.c.mimetype, _KEYS.c.created_at)
+            .where(_KEYS.c.user_id == user_id, _KEYS.c.method == method,
+                   _KEYS.c.path == path, _KEYS.c.idem_key == idem_key)
+        ).first()
+
+    def begin(self, key: Tuple, fingerprint: str) -> Tuple[Optional[Any], bool]:
+        """
+        Đăng ký key. Trả về (row, is_owner): is_owner=True nghĩa là request này xử lý thật
+        (row là id của dòng vừa tạo); ngược lại row là dòng của request trước (có thể chưa xong).
+        """
+        if random.random() < self.purge_probability:
+            self.purge_expired()
+        user_id, method, path, idem_key = key
+        now = get_vn_utc_now()
+        for _ in range(2):
+            try:
+                row_id = db.session.execute(insert(_KEYS).values(
+                    user_id=user_id, method=method, path=path, idem_key=idem_key,
+                    fingerprint=fingerprint, created_at=now,
+                )).inserted_primary_key[0]
+                db.session.commit()
+                return row_id, True
+            except IntegrityError:
+                db.session.rollback()
+            row = self._load(key)
+            db.session.rollback()
+            if row is None:
+                continue  # dòng vừa bị xóa (abandon/purge), thử INSERT lại
+            age = (now - row.created_at).total_seconds()
+            expired = row.status_code is not None and age >= self.ttl
+            stale = row.status_code is None and age >= self.stale_after
+            if not (expired or stale):
+                return row, False
+            db.session.execute(delete(_KEYS).where(_KEYS.c.id == row.id))
+            db.session.commit()
+        return self._load(key), False
+
+    def wait(self, key: Tuple) -> Optional[Any]:
+        """Chờ request đầu tiên xong (tối đa IDEMPOTENCY_WAIT_TIMEOUT giây), None nếu hết giờ"""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        while True:
+            # Kết thúc transaction để lần đọc sau thấy dòng mới nhất (REPEATABLE READ)
+            db.session.rollback()
+            row = self._load(key)
+            if row is None or row.status_code is not None:
+                db.session.rollback()
+                return row
+            if time.monotonic() >= deadline:
+                db.session.rollback()
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    @staticmethod
+    def complete(row_id: int, response: Response):
+        db.session.execute(update(_KEYS).where(_KEYS.c.id == row_id).values(
+            status_code=response.status_code, body=response.get_data(), mimetype=response.mimetype,
+        ))
+        db.session.commit()
+
+    @staticmethod
+    def abandon(row_id: int):
+        """View lỗi (exception): bỏ key để client retry được"""
+        db.session.rollback()
+        db.session.execute(delete(_KEYS).where(_KEYS.c.id == row_id))
+        db.session.commit()
+
+    def purge_expired(self):
+        cutoff = get_vn_utc_now() - timedelta(seconds=self.ttl)
+        try:
+            deleted = db.session.execute(delete(_KEYS).where(_KEYS.c.created_at < cutoff)).rowcount
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not purge expired idempotency keys: {e}")
+            return
+        if deleted:
+            logger.info(f"Purged {deleted} expired idempotency keys")
+
+    def get_stats(self) -> Dict[str, Any]:
+        size = db.session.execute(select(func.count()).select_from(_KEYS)).scalar()
+        with self._lock:
+            return {
+                "size": size,
+                "ttl_s": self.ttl,
+                "replays": self.replays,
+                "conflicts": self.conflicts,
+            }
+
+
+# Singleton instance
+idempotency_cache = IdempotencyCache()
+
+
+def idempotent(fn):
+    """
+    Decorator cho endpoint ghi (đặt sau @jwt_required): nếu client gửi Idempotency-Key thì
+    request lặp lại (ở bất kỳ worker nào) trả về nguyên response lần đầu mà không chạy lại view
+    (không đụng DB/MQTT). Cùng key nhưng body khác -> 422; request đầu chưa xong sau
+    IDEMPOTENCY_WAIT_TIMEOUT -> 409.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        idem_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idem_key:
+            return fn(*args, **kwargs)
+        if len(idem_key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} too long"}), 400
+
+        key = (str(get_jwt_identity()), request.method, request.path, idem_key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        row, is_owner = idempotency_cache.begin(key, fingerprint)
+
+        if not is_owner:
+            if row is not None and row.fingerprint != fingerprint:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used with a different request body"}), 422
+            if row is None or row.status_code is None:
+                row = idempotency_cache.wait(key)
+            if row is None or row.status_code is None:
+                idempotency_cache._incr('conflicts')
+                return jsonify({"error": "A request with this Idempotency-Key is still being processed"}), 409
+            idempotency_cache._incr('replays')
+            logger.debug(f"Replaying response for {request.method} {request.path} ({idem_key})")
+            response = Response(row.body, status=row.status_code, mimetype=row.mimetype)
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            idempotency_cache.abandon(row)
+            raise
+        idempotency_cache.complete(row, response)
+        return response
+    return wrapper
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import glob
+import queue
+import atexit
+import logging
+import threading
+from datetime import date
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+# DroppingQueueHandler, SamplingFilter, SizedTimedRotatingFileHandler có bản tương ứng ở kiosk
+# (app/utils/logger.py): backend (image Docker chỉ chứa iot-locker/) và kiosk (chỉ chứa app/) được
+# đóng gói riêng, không có package chung để import, sửa một bên thì sửa cả bên kia.
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler không bao giờ chặn thread gọi log: hàng đợi đầy thì bỏ record và đếm lại"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Chỉ giữ 1/N record DEBUG/INFO của các logger log dày đặc (vd. payload MQTT).
+    WARNING trở lên luôn được giữ. rates: {"app.services.mqtt_service.messages": 10}
+    Chỉ nên trỏ vào logger riêng cho log theo từng message, không vào logger của cả module
+    (sẽ làm mất cả log audit như lệnh gửi tới cell, kết nối broker).
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        if not rate:
+            return True
+        with self._lock:
+            count = self._counters.get(record.name, 0)
+            self._counters[record.name] = count + 1
+        return count % rate == 0
+
+    def _rate_for(self, name: str) -> Optional[int]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return None
+
+
+class SizedTimedRotatingFileHandler(RotatingFileHandler):
+    """
+    Xoay file khi vượt max_bytes hoặc khi sang ngày mới (đánh số app.log.1..N như RotatingFileHandler),
+    giữ tối đa backup_count file và xóa file cũ hơn retention_days ngày.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, retention_days: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=max(1, backup_count),
+                         encoding='utf-8', delay=True)
+        self.retention_days = retention_days
+        if os.path.exists(self.baseFilename):
+            self._day = date.fromtimestamp(os.path.getmtime(self.baseFilename))
+        else:
+            self._day = date.today()
+
+    def shouldRollover(self, record) -> bool:
+        if date.today() != self._day and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self._day = date.today()
+        self._purge_expired()
+
+    def _purge_expired(self):
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for path in glob.glob(f"{glob.escape(self.baseFilename)}.*"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def parse_sample_rates(spec: str) -> Dict[str, int]:
+    """"app.services.mqtt_service=10,paho=5" -> {"app.services.mqtt_service": 10, "paho": 5}"""
+    rates = {}
+    for part in (spec or '').split(','):
+        name, _, rate = part.strip().partition('=')
+        if name and rate.strip().isdigit():
+            rates[name.strip()] = int(rate)
+    return rates
+
+
+def setup_logging(app=None):
+    """
+    Cấu hình logging cho cả process (idempotent): mọi logger ghi vào một hàng đợi có giới hạn,
+    một QueueListener trên thread riêng lo phần I/O (stdout và file xoay vòng nếu đặt LOG_FILE).
+    Thread request / paho / worker chỉ tốn chi phí format + put_nowait.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    formatter = logging.Formatter(LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
+
+    handlers = []
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatter)
+    handlers.append(console)
+
+    log_file = os.getenv('LOG_FILE', '')
+    if log_file:
+        # {pid}: mỗi worker gunicorn một file, tránh nhiều process cùng xoay một file
+        log_file = log_file.replace('{pid}', str(os.getpid()))
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        file_handler = SizedTimedRotatingFileHandler(
+            log_file,
+            max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            backup_count=int(os.getenv('LOG_BACKUP_COUNT', 10)),
+            retention_days=int(os.getenv('LOG_RETENTION_DAYS', 14)),
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(
+        os.getenv('LOG_SAMPLE', 'app.services.mqtt_service.messages=10')
+    )))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    if app is not None:
+        # Log của Flask đi chung pipeline với root
+        app.logger.handlers.clear()
+        app.logger.propagate = True
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Xả hết log còn trong hàng đợi rồi dừng listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
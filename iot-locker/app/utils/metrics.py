@@ -0,0 +1,412 @@
+import os
+import json
+import time
+import hmac
+import uuid
+import atexit
+import logging
+import weakref
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket mặc định (giây) cho độ trễ request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket cho thời gian một câu SQL / một lần xử lý message (giây)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Bucket cho số câu SQL trong một request
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class _ThreadShards:
+    """
+    Mỗi thread ghi vào dict riêng của nó nên inc/observe không cần lock; chỉ lần ghi đầu tiên của
+    một thread (đăng ký shard) và lúc đọc (render) mới lấy lock. Shard của thread đã kết thúc được
+    gộp vào một dict chung để số shard không tăng mãi khi server tạo thread theo request.
+    """
+
+    def __init__(self, merge: Callable[[Dict, Dict], None]):
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[weakref.ref, Dict]] = []
+        self._retired: Dict = {}
+
+    def local(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: Dict = {}
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            alive = []
+            for ref, values in self._shards:
+                thread = ref()
+                if thread is None or not thread.is_alive():
+                    self._merge(self._retired, values)
+                else:
+                    alive.append((ref, values))
+            self._shards = alive
+            # dict.copy() là thao tác nguyên tử dưới GIL, thread chủ vẫn ghi tiếp được
+            return [self._retired.copy()] + [values.copy() for _, values in alive]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Bộ đếm tăng dần, nhãn truyền theo thứ tự labelnames: counter.inc('status')"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards(self._merge)
+
+    @staticmethod
+    def _merge(into: Dict, values: Dict):
+        for key, value in values.items():
+            into[key] = into.get(key, 0.0) + value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        values = self._shards.local()
+        values[labels] = values.get(labels, 0.0) + amount
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        total: Dict = {}
+        for shard in self._shards.snapshot():
+            self._merge(total, shard)
+        return total
+
+    def render(self, values: Optional[Dict] = None) -> List[str]:
+        values = self.collect() if values is None else values
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """Histogram với bucket cố định (đếm không cộng dồn, cộng dồn lúc render)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards(self._merge)
+
+    @staticmethod
+    def _merge(into: Dict, values: Dict):
+        for key, counts in values.items():
+            target = into.get(key)
+            if target is None:
+                into[key] = list(counts)
+            else:
+                for i, count in enumerate(counts):
+                    target[i] += count
+
+    def observe(self, value: float, *labels: str):
+        values = self._shards.local()
+        counts = values.get(labels)
+        if counts is None:
+            # [bucket_0 .. bucket_n, +Inf, sum]
+            counts = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Dùng như context manager: with histogram.time('label'): ..."""
+        return _Timer(self, labels)
+
+    def collect(self) -> Dict[Tuple[str, ...], List[float]]:
+        total: Dict = {}
+        for shard in self._shards.snapshot():
+            self._merge(total, shard)
+        return total
+
+    def render(self, values: Optional[Dict] = None) -> List[str]:
+        values = self.collect() if values is None else values
+        lines = []
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Gauge:
+    """Giá trị tức thời: set() trực tiếp hoặc set_function() để đọc lúc render (vd. trạng thái kết nối)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        if self._function is not None:
+            try:
+                values[()] = float(self._function())
+            except Exception:
+                return []
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+
+class MetricsRegistry:
+    """
+    Registry metric của process, xuất ở /metrics theo text format của Prometheus.
+    Mỗi worker gunicorn có registry riêng, nên khi chạy nhiều worker cần đặt METRICS_MULTIPROC_DIR
+    (thư mục dùng chung, xóa khi khởi động lại server): mỗi worker ghi counter/histogram của mình
+    vào <dir>/<pid>-<id>.json mỗi METRICS_FLUSH_INTERVAL giây và /metrics ở worker nào cũng cộng
+    tất cả các file. File của worker đã chết được giữ lại để counter không bị giảm.
+    Gauge là giá trị tức thời của từng process nên chỉ lấy từ worker trả lời scrape.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.multiproc_dir = os.getenv('METRICS_MULTIPROC_DIR', '')
+        self.flush_interval = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flush_pid: Optional[int] = None
+        self._file_id = uuid.uuid4().hex[:8]
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def _snapshot_path(self) -> str:
+        # pid + id ngẫu nhiên: worker mới trùng pid với worker đã chết không ghi đè file cũ
+        return os.path.join(self.multiproc_dir, f'{os.getpid()}-{self._file_id}.json')
+
+    def _snapshot(self) -> Dict[str, List]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: [[list(key), value] for key, value in metric.collect().items()]
+            for metric in metrics if metric.kind != 'gauge'
+        }
+
+    def flush(self):
+        """Ghi snapshot của process vào METRICS_MULTIPROC_DIR (ghi file tạm rồi rename, không đọc dở)"""
+        if not self.multiproc_dir:
+            return
+        path = self._snapshot_path()
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {path}: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def start_flushing(self):
+        """Chạy thread ghi snapshot định kỳ (gọi trong từng worker; fork sau --preload thì chạy lại)"""
+        if not self.multiproc_dir or self._flush_pid == os.getpid():
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        self._flush_pid = os.getpid()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.flush)
+
+    def _other_snapshots(self) -> List[Dict[str, List]]:
+        own = os.path.basename(self._snapshot_path())
+        snapshots = []
+        try:
+            names = os.listdir(self.multiproc_dir)
+        except OSError as e:
+            logger.warning(f"Could not read metrics dir {self.multiproc_dir}: {e}")
+            return snapshots
+        for name in names:
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # worker đang ghi / file hỏng: bỏ qua lần scrape này
+        return snapshots
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        others = self._other_snapshots() if self.multiproc_dir else []
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            if metric.kind == 'gauge' or not others:
+                lines.extend(metric.render())
+                continue
+            # Process này lấy số mới nhất trong bộ nhớ, các worker khác lấy từ file
+            total = metric.collect()
+            for snapshot in others:
+                metric._merge(total, {tuple(key): value for key, value in snapshot.get(metric.name, [])})
+            lines.extend(metric.render(total))
+        return '\n'.join(lines) + '\n'
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by blueprint',
+    ('blueprint', 'method', 'status'))
+DB_QUERY_SECONDS = metrics.histogram(
+    'db_query_duration_seconds', 'Duration of a single SQL statement', ('operation',), FAST_BUCKETS)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    'db_queries_per_request', 'Number of SQL statements executed by one HTTP request',
+    ('blueprint',), COUNT_BUCKETS)
+DB_SECONDS_PER_REQUEST = metrics.histogram(
+    'db_time_per_request_seconds', 'Total SQL time spent by one HTTP request', ('blueprint',))
+
+
+def _statement_operation(statement: str) -> str:
+    return statement.lstrip()[:6].upper() or 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERY_SECONDS.observe(elapsed, _statement_operation(statement))
+    if has_request_context():
+        totals = g.get('_metrics')
+        if totals is not None:
+            totals[1] += 1
+            totals[2] += elapsed
+
+
+def _observe_request(totals, status: str):
+    blueprint = request.blueprint or 'app'
+    REQUEST_SECONDS.observe(time.perf_counter() - totals[0], blueprint, request.method, status)
+    DB_QUERIES_PER_REQUEST.observe(totals[1], blueprint)
+    DB_SECONDS_PER_REQUEST.observe(totals[2], blueprint)
+
+
+def install_metrics(app, engine):
+    """Gắn hook đo độ trễ request và số câu SQL / request (không làm gì nếu METRICS_ENABLED=false)"""
+    if not metrics.enabled:
+        return
+    metrics.start_flushing()
+    from sqlalchemy import event
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _metrics_start():
+        # [thời điểm bắt đầu, số câu SQL, thời gian SQL]
+        g._metrics = [time.perf_counter(), 0, 0.0]
+
+    @app.after_request
+    def _metrics_observe(response):
+        totals = g.pop('_metrics', None)
+        if totals is not None:
+            _observe_request(totals, f'{response.status_code // 100}xx')
+        return response
+
+    @app.teardown_request
+    def _metrics_observe_error(exc):
+        # after_request bị bỏ qua khi exception không được xử lý (hoặc after_request khác lỗi):
+        # vẫn ghi độ trễ với status 5xx
+        totals = g.pop('_metrics', None)
+        if totals is not None:
+            _observe_request(totals, '5xx')
+
+
+def scrape_authorized() -> bool:
+    """Nếu đặt METRICS_TOKEN thì /metrics yêu cầu header Authorization: Bearer <token>"""
+    token = os.getenv('METRICS_TOKEN', '')
+    if not token:
+        return True
+    supplied = request.headers.get('Authorization', '')
+    return hmac.compare_digest(supplied, f'Bearer {token}')
@@ -0,0 +1,91 @@
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 50))
+MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_LIMIT', 500))
+
+
+class PaginationError(ValueError):
+    """Tham số phân trang/lọc không hợp lệ"""
+
+
+def legacy_lists_enabled() -> bool:
+    """
+    Trong giai đoạn chuyển đổi, request không có limit/cursor vẫn nhận toàn bộ danh sách
+    (dạng mảng như cũ). Đặt LEGACY_UNPAGINATED_LISTS=false để luôn phân trang.
+    """
+    return os.getenv('LEGACY_UNPAGINATED_LISTS', 'true').lower() in ('1', 'true', 'yes')
+
+
+def wants_page(args) -> bool:
+    return 'limit' in args or 'cursor' in args or not legacy_lists_enabled()
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Cursor mờ (base64) chứa khóa (sort_value, id) của dòng cuối trang"""
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise PaginationError('Invalid cursor') from e
+
+
+def parse_limit(args) -> int:
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError) as e:
+        raise PaginationError('Invalid limit') from e
+    if limit < 1:
+        raise PaginationError('Invalid limit')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_datetime_arg(args, name: str) -> Optional[datetime]:
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError as e:
+        raise PaginationError(f'Invalid {name}') from e
+
+
+def parse_int_arg(args, name: str) -> Optional[int]:
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError as e:
+        raise PaginationError(f'Invalid {name}') from e
+
+
+def keyset_page(query, sort_column, id_column, limit: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Phân trang keyset theo (sort_column DESC, id DESC): trang sau chỉ lấy các dòng
+    đứng sau khóa của dòng cuối trang trước, nên chi phí không phụ thuộc vào độ sâu trang.
+    Trả về (các dòng, next_cursor hoặc None nếu đã hết).
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id),
+        ))
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
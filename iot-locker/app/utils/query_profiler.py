@@ -0,0 +1,176 @@
+import os
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+COUNT_HEADER = 'X-Query-Count'
+TIME_HEADER = 'X-Query-Time-Ms'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(statement: str) -> str:
+    """Đưa câu SQL về dạng "shape": bỏ literal/tham số, gom IN (?, ?, ...) thành IN (?)"""
+    shape = _STRING.sub('?', statement)
+    shape = _PARAM.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+class QueryProfile:
+    """Số câu SQL, tổng thời gian và số lần lặp của từng shape trong một request / một khối code"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.shapes: Dict[str, List] = {}  # shape -> [số lần, tổng thời gian]
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_s += elapsed
+        entry = self.shapes.get(statement)
+        if entry is None:
+            self.shapes[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def grouped(self) -> List[Tuple[str, int, float]]:
+        """(shape, số lần, tổng thời gian) gom theo SQL đã chuẩn hóa, nhiều lần nhất trước"""
+        groups: Dict[str, List] = {}
+        for statement, (count, elapsed) in self.shapes.items():
+            entry = groups.setdefault(normalize_sql(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += elapsed
+        return sorted(((shape, c, t) for shape, (c, t) in groups.items()), key=lambda x: -x[1])
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """Các shape chạy từ threshold lần trở lên - dấu hiệu N+1"""
+        return [group for group in self.grouped() if group[1] >= threshold]
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"{self.count} queries in {self.total_s * 1000:.1f} ms"]
+        for shape, count, elapsed in self.grouped()[:limit]:
+            lines.append(f"  {count}x {elapsed * 1000:.1f} ms  {shape[:200]}")
+        return '\n'.join(lines)
+
+
+class QueryProfiler:
+    """
+    Profiler SQL bật theo nhu cầu (QUERY_PROFILER_ENABLED): nghe engine event của SQLAlchemy,
+    gom câu SQL của mỗi request theo shape, gắn header X-Query-Count / X-Query-Time-Ms và
+    log cảnh báo khi một shape lặp từ QUERY_PROFILER_N1_THRESHOLD lần (thường là lazy load từng dòng).
+    profile_queries() dùng được ngoài request (script, test).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('QUERY_PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.threshold = int(os.getenv('QUERY_PROFILER_N1_THRESHOLD', 5))
+        self._local = threading.local()
+        self._install_lock = threading.Lock()
+        self._listening = False
+
+    def _listen(self):
+        with self._install_lock:
+            if self._listening:
+                return
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    def _active_profiles(self) -> List[QueryProfile]:
+        profiles = list(getattr(self._local, 'stack', ()))
+        if has_request_context():
+            profile = g.get('_query_profile')
+            if profile is not None:
+                profiles.append(profile)
+        return profiles
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('profiler_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        for profile in self._active_profiles():
+            profile.record(statement, elapsed)
+
+    @contextmanager
+    def profile_queries(self):
+        """with query_profiler.profile_queries() as profile: ... -> profile.count, profile.summary()"""
+        self._listen()
+        profile = QueryProfile()
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(profile)
+        try:
+            yield profile
+        finally:
+            stack.remove(profile)
+
+    def install(self, app):
+        """Gắn hook cho từng request nếu QUERY_PROFILER_ENABLED=true"""
+        if not self.enabled:
+            return
+        self._listen()
+
+        @app.before_request
+        def _profile_start():
+            g._query_profile = QueryProfile()
+
+        @app.after_request
+        def _profile_report(response):
+            profile = g.pop('_query_profile', None)
+            if profile is None:
+                return response
+            response.headers[COUNT_HEADER] = str(profile.count)
+            response.headers[TIME_HEADER] = f"{profile.total_s * 1000:.1f}"
+            repeated = profile.repeated(self.threshold)
+            if repeated:
+                shape, count, _ = repeated[0]
+                logger.warning(
+                    f"Possible N+1 in {request.method} {request.path}: {profile.count} queries, "
+                    f"{count}x {shape[:200]}"
+                )
+            else:
+                logger.debug(f"{request.method} {request.path}: {profile.summary(limit=3)}")
+            return response
+
+
+# Singleton instance
+query_profiler = QueryProfiler()
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, n_plus_one_threshold: Optional[int] = None):
+    """
+    Báo lỗi (AssertionError) nếu khối code chạy quá max_queries câu SQL hoặc một shape lặp
+    từ n_plus_one_threshold lần trở lên. Dùng trong test qua fixture query_budget (tests/conftest.py):
+        with query_budget(3):
+            client.get('/items/my-accessible', headers=...)
+    """
+    with query_profiler.profile_queries() as profile:
+        yield profile
+    if profile.count > max_queries:
+        raise AssertionError(f"Query budget exceeded ({profile.count} > {max_queries}):\n{profile.summary()}")
+    if n_plus_one_threshold is not None:
+        repeated = profile.repeated(n_plus_one_threshold)
+        if repeated:
+            raise AssertionError(f"Repeated query shape (possible N+1):\n{profile.summary()}")
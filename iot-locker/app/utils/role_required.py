@@ -1,6 +1,7 @@
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
 from flask import jsonify
+from app.services.user_cache import user_cache
 
 def role_required(required_role):
     """
@@ -13,6 +14,13 @@ def role_required(required_role):
             verify_jwt_in_request()
             claims = get_jwt()
             user_role = claims.get("role")
+            # Token có version stamp: nếu user đã bị cập nhật sau khi cấp token thì dùng role hiện tại
+            if "ver" in claims:
+                user = user_cache.get(get_jwt_identity())
+                if user is None:
+                    return jsonify({"error": "User not found"}), 401
+                if user.version != claims["ver"]:
+                    user_role = user.role
             
             if not user_role or (required_role == "admin" and user_role != "admin"):
                 return jsonify({"error": "Permission denied: Admin role required"}), 403
@@ -1,12 +1,14 @@
+from flask import current_app
 from flask_jwt_extended import get_jwt_identity
-from app.models.user_model import UserModel
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from app.services.user_cache import user_cache, user_version
 
 def get_current_user():
-    """Get the current user from JWT token"""
+    """Get the current user from JWT token (CachedUser từ user_cache, không query DB mỗi lần)"""
     try:
         user_id = get_jwt_identity()
         if user_id:
-            return UserModel.query.get(int(user_id))
+            return user_cache.get(user_id)
     except Exception:
         pass
     return None
@@ -14,7 +16,7 @@ def get_current_user():
 def get_current_user_role():
     """Get the current user role from JWT token"""
     user = get_current_user()
-    return user.role.value if user else 'user'
+    return user.role if user else 'user'
 
 def get_current_username():
     """Get the current username from JWT token"""
@@ -23,4 +25,25 @@ def get_current_username():
 
 def is_admin():
     """Check if the current user is admin"""
-    return get_current_user_role() == 'admin'
\ No newline at end of file
+    return get_current_user_role() == 'admin'
+
+def build_token_claims(user):
+    """Claims cho access token: role và version stamp của user (UserModel hoặc CachedUser)"""
+    role = user.role.value if hasattr(user.role, 'value') else user.role
+    version = user.version if hasattr(user, 'version') else user_version(user.updated_at)
+    return {"role": role, "ver": version}
+
+def _stream_token_serializer():
+    # Token riêng cho SSE (salt khác), không dùng được như access token cho API khác
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt='cell-stream')
+
+def create_stream_token(user_id):
+    """Token ngắn hạn cho ?token= của /cells/stream (EventSource không gửi được header)"""
+    return _stream_token_serializer().dumps({"sub": str(user_id)})
+
+def verify_stream_token(token, max_age):
+    """Trả về user id nếu token hợp lệ và chưa quá max_age giây, ngược lại None"""
+    try:
+        return _stream_token_serializer().loads(token, max_age=max_age).get("sub")
+    except (BadSignature, AttributeError):
+        return None
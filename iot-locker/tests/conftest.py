@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Cấu hình phải có trước khi import app (config.py đọc env lúc import).
+# Mặc định SQLite file tạm; đặt TEST_DATABASE_URL=mysql+pymysql://... để chạy với MySQL thật.
+_DB_DIR = tempfile.mkdtemp(prefix='iot-locker-test-')
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL', f'sqlite:///{_DB_DIR}/test.db')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-test-secret-key-0123')
+# Không có broker khi test: trỏ tới cổng đóng, kết nối lỗi ngay
+os.environ['MQTT_BROKER_HOST'] = '127.0.0.1'
+os.environ['MQTT_BROKER_PORT'] = '1'
+os.environ['RESOURCE_VERSION_SYNC'] = 'local'
+os.environ['OVERDUE_SCHEDULER_ENABLED'] = 'false'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_mysql_functions(dbapi_conn, _record):
+    """SQLite không có CONVERT_TZ / UTC_TIMESTAMP (dùng trong timezone_helper.vn_func_now)"""
+    if not type(dbapi_conn).__module__.startswith('sqlite3'):
+        return
+    dbapi_conn.create_function('convert_tz', 3, lambda value, _from, _to: value)
+    dbapi_conn.create_function('utc_timestamp', 0, lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+
+
+@pytest.fixture
+def db(app):
+    """Bảng tạo mới cho mỗi test (cache trong process cũng được xóa)"""
+    from app.extensions import db
+    from app.services.dashboard_service import DashboardService
+    from app.services.item_access_index import item_access_index
+    from app.services.user_cache import user_cache
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        item_access_index.invalidate()
+        user_cache.clear()
+        DashboardService.invalidate()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """auth_headers(user_id, role='user') -> header Authorization với access token"""
+    from flask_jwt_extended import create_access_token
+
+    def make(user_id, role='user'):
+        with app.app_context():
+            token = create_access_token(identity=str(user_id), additional_claims={"role": role})
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail test khi khối code chạy quá số câu SQL cho phép:
+        with query_budget(3) as profile:
+            client.get('/items/my-accessible', headers=...)
+    """
+    from app.utils.query_profiler import assert_query_budget
+    return assert_query_budget
@@ -0,0 +1,62 @@
+import threading
+from datetime import timedelta
+
+from app.models.borrowings_model import BorrowingModel
+from app.models.cell_model import CellModel
+from app.models.item_model import ItemModel, ItemStatus
+from app.models.user_model import UserModel
+from app.services.borrowings_service import BorrowingsService
+from app.utils.timezone_helper import get_vn_utc_now
+
+CONCURRENT_BORROWS = 200
+
+
+def test_parallel_borrows_of_one_item_have_exactly_one_winner(app, db, monkeypatch):
+    # SQLite trả "database is locked" khi ghi đồng thời: cho phép retry nhiều hơn mặc định
+    monkeypatch.setenv('BORROW_MAX_RETRIES', '50')
+    db.session.add(CellModel(name='cell 1'))
+    db.session.add_all([
+        UserModel(username=f'user{i}', password='x', full_name=f'User {i}')
+        for i in range(CONCURRENT_BORROWS)
+    ])
+    db.session.commit()
+    item = ItemModel(name='Multimeter', cell_id=1)
+    db.session.add(item)
+    db.session.commit()
+    item_id = item.id
+    user_ids = [user.id for user in UserModel.query.all()]
+    expected_return_at = get_vn_utc_now() + timedelta(days=1)
+
+    barrier = threading.Barrier(CONCURRENT_BORROWS)
+    results, failures = [], []
+    results_lock = threading.Lock()
+
+    def borrow(user_id):
+        with app.app_context():
+            barrier.wait()
+            try:
+                borrowing, error = BorrowingsService.borrow_item(user_id, item_id, expected_return_at)
+            except Exception as e:
+                with results_lock:
+                    failures.append(e)
+                return
+            finally:
+                db.session.remove()
+            with results_lock:
+                results.append((borrowing is not None, error))
+
+    threads = [threading.Thread(target=borrow, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    assert len(results) == CONCURRENT_BORROWS
+    winners = [error for won, error in results if won]
+    assert len(winners) == 1
+    assert all(error == {"error": "Item not available"} for won, error in results if not won)
+
+    db.session.expire_all()
+    assert BorrowingModel.query.filter_by(item_id=item_id).count() == 1
+    assert db.session.get(ItemModel, item_id).status == ItemStatus.borrowing
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+import pytest
+
+from app.models.borrowings_model import BorrowingModel, BorrowStatus
+from app.models.cell_event_model import CellEventModel, LockerEventType
+from app.models.cell_model import CellModel
+from app.models.item_access_model import ItemAccessModel
+from app.models.item_model import ItemModel
+from app.models.user_model import UserModel
+from app.services.item_access_index import item_access_index
+from app.utils.timezone_helper import get_vn_utc_now
+
+# Số câu SQL không được tăng theo số dòng: đo ở SMALL rồi ở LARGE dòng
+SMALL, LARGE = 3, 30
+
+
+def _seed_users(db, count):
+    db.session.add_all([
+        UserModel(username=f'user{i}', password='x', full_name=f'User {i}') for i in range(count)
+    ])
+    db.session.commit()
+    return [user.id for user in UserModel.query.order_by(UserModel.id)]
+
+
+def _seed_items(db, count, cell_id=1):
+    items = [ItemModel(name=f'Item {i}', cell_id=cell_id) for i in range(count)]
+    db.session.add_all(items)
+    db.session.commit()
+    return [item.id for item in items]
+
+
+@pytest.fixture
+def cell(db):
+    cell = CellModel(name='cell 1')
+    db.session.add(cell)
+    db.session.commit()
+    return cell.id
+
+
+def _count_queries(client, query_budget, url, headers, budget):
+    with query_budget(budget, n_plus_one_threshold=SMALL) as profile:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return profile.count, response.get_json()
+
+
+@pytest.mark.parametrize('warm_index', [False, True])
+def test_my_accessible_items_query_count_is_constant(db, client, cell, auth_headers, query_budget, warm_index):
+    user_id, other_id = _seed_users(db, 2)
+    headers = auth_headers(user_id)
+    counts = []
+    for count in (SMALL, LARGE - SMALL):
+        # Một phần ba không giới hạn, một phần ba cấp cho user, một phần ba cho user khác
+        item_ids = _seed_items(db, count)
+        db.session.add_all([
+            ItemAccessModel(item_id=item_id, user_id=user_id if i % 3 == 1 else other_id)
+            for i, item_id in enumerate(item_ids) if i % 3
+        ])
+        db.session.commit()
+        item_access_index.invalidate()
+        if warm_index:
+            item_access_index.build()
+        queries, body = _count_queries(client, query_budget, '/items/my-accessible', headers, budget=3)
+        counts.append(queries)
+    assert counts[0] == counts[1]
+    assert len(body) == sum((i % 3) != 2 for i in range(SMALL)) + sum((i % 3) != 2 for i in range(LARGE - SMALL))
+
+
+def test_cell_borrowings_query_count_is_constant(db, client, cell, auth_headers, query_budget):
+    user_ids = _seed_users(db, LARGE)
+    headers = auth_headers(user_ids[0])
+    now = get_vn_utc_now()
+    counts, seeded = [], 0
+    for count in (SMALL, LARGE - SMALL):
+        item_ids = _seed_items(db, count)
+        db.session.add_all([
+            BorrowingModel(user_id=user_ids[seeded + i], item_id=item_id, status=BorrowStatus.borrowing,
+                           borrowed_at=now, expected_return_at=now + timedelta(days=1))
+            for i, item_id in enumerate(item_ids)
+        ])
+        db.session.commit()
+        seeded += count
+        queries, body = _count_queries(client, query_budget, f'/cells/{cell}/borrowings', headers, budget=2)
+        assert len(body) == seeded
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+def test_cell_events_query_count_is_constant(db, client, cell, auth_headers, query_budget):
+    user_ids = _seed_users(db, LARGE)
+    headers = auth_headers(user_ids[0], role='admin')
+    counts, seeded = [], 0
+    for count in (SMALL, LARGE - SMALL):
+        db.session.add_all([
+            CellEventModel(locker_id=cell, user_id=user_ids[seeded + i], event_type=LockerEventType.open)
+            for i in range(count)
+        ])
+        db.session.commit()
+        seeded += count
+        queries, body = _count_queries(client, query_budget, f'/cells/{cell}/events', headers, budget=2)
+        assert len(body) == seeded
+        counts.append(queries)
+    assert counts[0] == counts[1]
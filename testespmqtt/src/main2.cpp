@@ -26,19 +26,30 @@ PubSubClient client(espClient);
 
 // Lưu user_id cho từng cell khi nhận lệnh
 int last_user_id = 0;
+// correlation_id của lệnh đang thực hiện, gửi kèm status/event để backend ack lệnh
+String last_correlation_id = "";
 
 // Hàm publish trạng thái cell
 void publishStatus(const char* status) {
-  String payload = String("{\"status\":\"") + status + "\"}";
+  String payload = String("{\"status\":\"") + status + "\"";
+  if (last_correlation_id.length() > 0) {
+    payload += String(",\"correlation_id\":\"") + last_correlation_id + "\"";
+  }
+  payload += "}";
   String topic = String("locker/cell/") + cell_id + "/status";
   client.publish(topic.c_str(), payload.c_str());
 }
 
 // Hàm publish event cell (kèm user_id)
 void publishEvent(const char* event_type) {
-  String payload = String("{\"event_type\":\"") + event_type + "\",\"user_id\":" + last_user_id + "}";
+  String payload = String("{\"event_type\":\"") + event_type + "\",\"user_id\":" + last_user_id;
+  if (last_correlation_id.length() > 0) {
+    payload += String(",\"correlation_id\":\"") + last_correlation_id + "\"";
+  }
+  payload += "}";
   String topic = String("locker/cell/") + cell_id + "/event";
   client.publish(topic.c_str(), payload.c_str());
+  last_correlation_id = ""; // lệnh đã được báo xong
 }
 
 void callback(char* topic, byte* payload, unsigned int length) {
@@ -65,6 +76,7 @@ void callback(char* topic, byte* payload, unsigned int length) {
     String cmdTopic = String("locker/cell/") + cell_id + "/command";
     if (String(topic) == cmdTopic) {
       last_user_id = user_id; // Lưu user_id cho cell này
+      last_correlation_id = String(doc["correlation_id"] | "");
 
       if (action == "open") {
         Serial.println("Opening");